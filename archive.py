@@ -0,0 +1,258 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep, time
+
+import click
+from flask import Blueprint, abort, current_app, request
+
+import events
+from auth import require_authorization
+from caching import touch_board
+from changes import log_tasks
+from group_commit import after_commit, commit, group_commit
+from models import db, ArchivedTask, Board, ChangeLog, Task, TaskCount
+from pagination import page_args, paginate
+from purge import board_or_404
+from query_budget import query_budget
+from serialization import TASK_COLUMNS
+from sharding import each_shard, use_shard
+
+bp = Blueprint('archive', __name__)
+
+# Tasks that sat in ARCHIVE_STATUS for ARCHIVE_AFTER seconds move to
+# archived_task, so task and its indexes only hold what boards show. How long
+# a task sat unchanged is read from its change_log entry. To sync clients an
+# archived task is a deleted one.
+
+
+def archive_chunk(user_id, board_id, status, before, chunk_size):
+    """Move up to ``chunk_size`` of the board's tasks in ``status`` unchanged since ``before`` to the archive.
+
+    Returns their ids; publish them with publish_archived() once committed.
+    """
+    stale = (db.select(Task.id)
+             .join(ChangeLog, (ChangeLog.user_id == Task.board_user_id) & (ChangeLog.board_id == Task.board_id)
+                   & (ChangeLog.task_id == Task.id))
+             .where(Task.board_user_id == user_id, Task.board_id == board_id, Task.status == status,
+                    ChangeLog.changed_at <= before)
+             .order_by(Task.id).limit(chunk_size))
+    # Deleting first takes the write lock, and RETURNING yields exactly the rows it removed.
+    rows = db.session.execute(db.delete(Task)
+                              .where(Task.board_user_id == user_id, Task.board_id == board_id,
+                                     Task.status == status, Task.id.in_(stale))
+                              .returning(*TASK_COLUMNS)
+                              .execution_options(synchronize_session=False)).all()
+    if rows:
+        archived_at = int(time())
+        db.session.execute(db.insert(ArchivedTask), [{**row._asdict(), 'archived_at': archived_at}
+                                                      for row in rows])
+        touch_board(user_id, board_id)
+        log_tasks(user_id, board_id, [row.id for row in rows], deleted=True)
+    return [row.id for row in rows]
+
+
+def publish_archived(user_id, board_id, task_ids):
+    if task_ids:
+        events.publish(user_id, board_id, *[('task.archived', {'id': task_id}) for task_id in task_ids])
+
+
+def archive_board(user_id, board_id, status, before, chunk_size, pause=0.0):
+    """Archive the board's tasks in ``status`` unchanged since ``before``, a chunk per transaction; return how many."""
+    archived = 0
+    while True:
+        task_ids = archive_chunk(user_id, board_id, status, before, chunk_size)
+        db.session.commit()
+        publish_archived(user_id, board_id, task_ids)
+        archived += len(task_ids)
+        if len(task_ids) < chunk_size:
+            return archived
+        sleep(pause)
+
+
+_archiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-archive')
+_pending = set()
+_pending_lock = Lock()
+
+
+def schedule_archive(user_id, board_id, status, before):
+    """Archive the rest of a board in the background, once however often it is requested meanwhile."""
+    app = current_app._get_current_object()
+    key = (user_id, board_id, status)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        with _pending_lock:
+            _pending.discard(key)
+        with app.app_context():
+            use_shard(user_id)
+            try:
+                archive_board(user_id, board_id, status, before, app.config['ARCHIVE_CHUNK'],
+                              app.config['ARCHIVE_PAUSE'])
+            except Exception:
+                app.logger.exception('Could not archive tasks of board %s', board_id)
+
+    _archiver.submit(run)
+
+
+def archive_tasks(status, before, chunk_size, pause=0.0):
+    """Archive on every shard; boards come from task_count, so only ones with tasks in ``status`` are read."""
+    archived = 0
+    for _ in each_shard():
+        boards = db.session.execute(
+            db.select(TaskCount.board_user_id, TaskCount.board_id)
+            .join(Board, (Board.user_id == TaskCount.board_user_id) & (Board.id == TaskCount.board_id))
+            .where(TaskCount.status == status, TaskCount.count > 0, Board.deleted.is_(False))).all()
+        db.session.commit()
+        for user_id, board_id in boards:
+            archived += archive_board(user_id, board_id, status, before, chunk_size, pause)
+    return archived
+
+
+def init_archive(app):
+    @app.cli.command('archive-tasks')
+    @click.option('--status', type=int, help='Status to archive, ARCHIVE_STATUS by default.')
+    @click.option('--older-than', type=int, help='Seconds unchanged, ARCHIVE_AFTER by default.')
+    def archive_tasks_command(status, older_than):
+        """Move tasks left in the done status to the archive."""
+        status = app.config['ARCHIVE_STATUS'] if status is None else status
+        if status is None:
+            raise click.UsageError('ARCHIVE_STATUS is not set and --status is not given')
+        older_than = app.config['ARCHIVE_AFTER'] if older_than is None else older_than
+        archived = archive_tasks(status, int(time()) - older_than, app.config['ARCHIVE_CHUNK'],
+                                 app.config['ARCHIVE_PAUSE'])
+        click.echo(f'Archived {archived} tasks.')
+
+
+@bp.post('/api/boards/<int:board_id>/archive')
+@query_budget(7)
+@group_commit
+def handle_archive_board(board_id):
+    """Перенести в архив старые задачи доски
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: status
+        in: query
+        type: integer
+        description: Статус выполненных задач, по умолчанию из настроек
+      - name: older_than
+        in: query
+        type: integer
+        description: Сколько секунд задача не менялась, по умолчанию из настроек; 0 - все задачи статуса
+    responses:
+      200:
+        description: Задачи перенесены в архив и больше не приходят с доской
+        schema:
+            type: object
+            properties:
+                archived:
+                    type: integer
+      202:
+        description: Перенесена первая часть задач (archived), остальные переносятся в фоне
+      401:
+        description: Неправильный токен
+      400:
+        description: Не задан статус или неверные параметры
+      404:
+        description: Доски не существует
+    """
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
+    status, older_than = current_app.config['ARCHIVE_STATUS'], current_app.config['ARCHIVE_AFTER']
+    if 'status' in request.args:
+        status = request.args.get('status', type=int)
+        if status is None:
+            abort(400, description='status must be an integer')
+    if 'older_than' in request.args:
+        older_than = request.args.get('older_than', type=int)
+        if older_than is None:
+            abort(400, description='older_than must be an integer')
+    if status is None or older_than < 0:
+        abort(400, description='status and a non-negative older_than are required')
+    before, chunk_size = int(time()) - older_than, current_app.config['ARCHIVE_CHUNK']
+    # One chunk per request keeps the writer free; a bigger backlog goes to the background.
+    task_ids = archive_chunk(user_id, board_id, status, before, chunk_size)
+    commit()
+    publish_archived(user_id, board_id, task_ids)
+    if len(task_ids) < chunk_size:
+        return {'archived': len(task_ids)}
+    after_commit(schedule_archive, user_id, board_id, status, before)
+    return {'archived': len(task_ids)}, 202
+
+
+@bp.get('/api/boards/<int:board_id>/archive')
+@query_budget(3)
+def handle_board_archive(board_id):
+    """Получить архивные задачи доски постранично
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+      - name: cursor
+        in: query
+        type: integer
+        description: Значение заголовка X-Next-Cursor предыдущей страницы
+    responses:
+      200:
+        description: Страница архивных задач, упорядоченных по id
+        headers:
+            X-Next-Cursor:
+                type: integer
+                description: Курсор следующей страницы, если она есть
+        schema:
+            type: array
+            items:
+                type: object
+                properties:
+                    id:
+                        type: string
+                    title:
+                        type: string
+                    description:
+                        type: string
+                    status:
+                        type: string
+                    board_id:
+                        type: integer
+                    board_user_id:
+                        type: string
+                        description: id
+                    rank:
+                        type: string
+                    archived_at:
+                        type: integer
+                        description: когда задача перенесена в архив, unix time
+      401:
+        description: Неправильный токен
+      400:
+        description: Неверные limit или cursor
+      404:
+        description: Доски не существует
+    """
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
+    query = db.select(ArchivedTask).where(ArchivedTask.board_user_id == user_id, ArchivedTask.board_id == board_id)
+    tasks, headers = paginate(query, ArchivedTask.id, *page_args())
+    return [task.as_json() for task in tasks], headers
@@ -0,0 +1,252 @@
+"""ASGI serving mode.
+
+    uvicorn asgi:create_asgi_app --factory --workers 4
+
+The read endpoints that clients poll (board list, board detail and board task
+pages) run as native coroutines on an async SQLAlchemy engine (aiosqlite for
+SQLite, psycopg for PostgreSQL), so a slow client or a busy database does not
+hold a thread. Every other route is served by the regular Flask app through a
+WSGI adapter, so routes, validation and response shapes stay the same in both
+modes. The native routes take the rate limit, query budget and metrics of the
+Flask views they stand in for, build their queries and bodies with the same
+helpers and fail with the same werkzeug errors. Needs the packages in
+requirements-asgi.txt.
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from math import ceil
+from time import perf_counter
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import HTTPException, TooManyRequests
+from werkzeug.http import parse_etags
+
+from auth import authorized_or_401, token_cache
+from caching import boards_version_query, cache_headers
+from database import apply_sqlite_pragmas
+from instrumentation import COUNT_BUCKETS
+from main import (EXPOSE_HEADERS, board_tag, board_tasks_query, boards_body, boards_query, boards_tag,
+                  create_app, list_page, wants_stream)
+from models import Board, Task, User
+from pagination import keyset, page, page_args
+from purge import live_or_404
+from query_budget import QueryBudgetExceeded
+from ratelimit import ADDRESS_POLICIES, user_key
+from serialization import BOARD_TAIL, board_head, task_dicts, task_rows, tasks_chunk
+from sharding import shard_engines
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+psycopg'}
+
+# Statements and SQL seconds of the native request being served; Flask's
+# counters live in g, which these requests have none of.
+_usage = ContextVar('usage', default=None)
+
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    usage = _usage.get()
+    if usage is not None:
+        usage['statements'] += 1
+
+
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    # instrumentation.py notes when each statement started while it is enabled.
+    usage, started = _usage.get(), getattr(context, 'statement_started', None)
+    if usage is not None and started is not None:
+        usage['sql'] += perf_counter() - started
+
+
+def async_engine(app, url):
+    engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)),
+                                 **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    if url.get_backend_name() == 'sqlite':
+        apply_sqlite_pragmas(engine.sync_engine, {'foreign_keys': 'ON', **app.config.get('SQLITE_PRAGMAS', {})})
+    event.listen(engine.sync_engine, 'before_cursor_execute', _start_statement)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _end_statement)
+    return engine
+
+
+def create_asgi_app(config=None):
+    flask_app = create_app(config)
+    shards = flask_app.extensions.get('shards')
+    with flask_app.app_context():
+        urls = [engine.url for engine in shard_engines()]
+    engines = [async_engine(flask_app, url) for url in urls]
+    sessionmakers = [async_sessionmaker(engine, expire_on_commit=False) for engine in engines]
+    dumpb = flask_app.json.dumpb
+    config = flask_app.config
+    limiter = flask_app.extensions.get('rate_limit')
+    metrics = flask_app.extensions.get('metrics')
+
+    async def locate(request):
+        """Index of the shard of the request's bearer token; locate() may query the directory, so not on the loop."""
+        parts = request.headers.get('Authorization', '').split()
+        if shards is None or len(parts) != 2:
+            return 0
+        return (await run_in_threadpool(shards.locate, parts[1]))[0]
+
+    def sessions(request):
+        """Session on the shard located for the request."""
+        return sessionmakers[request.state.shard]()
+
+    def json_response(obj, headers=None):
+        return Response(dumpb(obj), media_type='application/json', headers=headers)
+
+    def not_modified(request, tag):
+        if parse_etags(request.headers.get('If-None-Match')).contains_raw(tag):
+            return Response(status_code=304, headers=cache_headers(tag))
+        return None
+
+    async def token_user(request):
+        """Async auth.token_user()."""
+        parts = request.headers.get('Authorization', '').split()
+        if len(parts) != 2:
+            return None
+        token = parts[1]
+        valid = token_cache.get(token)
+        if valid is None:
+            async with sessions(request) as session:
+                valid = await session.get(User, token) is not None
+            token_cache.put(token, valid)
+        return token if valid else None
+
+    def authorize(request):
+        return authorized_or_401(request.state.user_id)
+
+    def error_response(error):
+        """The response Flask makes of a werkzeug HTTPException."""
+        response = error.get_response()
+        return Response(response.get_data(), response.status_code,
+                        headers={key: value for key, value in response.headers if key != 'Content-Length'})
+
+    def native(endpoint, handler):
+        """Serve ``handler`` in place of the Flask view ``endpoint``, with its rate limit, query budget and metrics."""
+        view = flask_app.view_functions[endpoint]
+        rule = next(flask_app.url_map.iter_rules(endpoint)).rule
+        name = getattr(view, 'rate_limit', 'read')
+        policy = config['RATE_LIMITS'].get(name) if limiter is not None else None
+
+        async def limit(request):
+            if policy:
+                key = user_key(None if name in ADDRESS_POLICIES else request.state.user_id, request.client.host)
+                wait = await run_in_threadpool(limiter.take, f'{name}:{key}', policy['rate'], policy['burst'])
+                if wait:
+                    raise TooManyRequests(retry_after=ceil(wait))
+
+        async def serve(request):
+            started = perf_counter()
+            usage = {'statements': 0, 'auth': 0.0, 'sql': 0.0}
+            reset = _usage.set(usage)
+            try:
+                request.state.shard = await locate(request)
+                request.state.user_id = await token_user(request)
+                usage['auth'] = perf_counter() - started
+                await limit(request)
+                response = await handler(request)
+            except HTTPException as error:
+                response = error_response(error)
+            finally:
+                _usage.reset(reset)
+            elapsed = perf_counter() - started
+            if metrics is not None:
+                metrics.increment('http_requests_total', (('endpoint', rule), ('method', request.method),
+                                                          ('status', str(response.status_code))))
+                metrics.observe('http_request_duration_seconds', (('endpoint', rule), ('method', request.method)),
+                                elapsed)
+                for phase in ('auth', 'sql'):
+                    metrics.observe('http_request_phase_seconds', (('endpoint', rule), ('phase', phase)), usage[phase])
+                metrics.observe('http_request_sql_statements', (('endpoint', rule),), usage['statements'],
+                                COUNT_BUCKETS)
+                timings = (('auth', usage['auth']), ('sql', usage['sql']), ('total', elapsed))
+                response.headers['Server-Timing'] = ', '.join(
+                    f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in timings)
+            if config['QUERY_BUDGET_ENFORCE']:
+                response.headers['X-Query-Count'] = str(usage['statements'])
+                budget = getattr(view, 'query_budget', None)
+                if budget is not None and usage['statements'] > budget:
+                    raise QueryBudgetExceeded(f'{endpoint} executed {usage["statements"]} SQL statements, '
+                                              f'budget is {budget}')
+            return response
+
+        return serve
+
+    async def get_board(session, user_id, board_id):
+        return live_or_404(await session.get(Board, (board_id, user_id)))
+
+    async def handle_boards(request):
+        user_id = authorize(request)
+        limit_cursor = list_page(request.query_params)
+        async with sessions(request) as session:
+            tag = boards_tag(user_id, (await session.execute(boards_version_query(user_id))).scalar_one(),
+                             limit_cursor)
+            response = not_modified(request, tag)
+            if response:
+                return response
+            boards = (await session.execute(boards_query(user_id, limit_cursor))).scalars().all()
+        boards, headers = boards_body(boards, limit_cursor)
+        return json_response(boards, {**headers, **cache_headers(tag)})
+
+    async def stream_tasks(request, board, query, chunk_size=1000):
+        """Async serialization.stream_board()."""
+        yield board_head(board, dumpb)
+        first = True
+        async with sessions(request) as session:
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                yield tasks_chunk(rows, first, dumpb)
+                first = False
+        yield BOARD_TAIL
+
+    async def handle_board(request):
+        board_id = request.path_params['board_id']
+        user_id = authorize(request)
+        async with sessions(request) as session:
+            board = await get_board(session, user_id, board_id)
+            tag = board_tag(user_id, board)
+            response = not_modified(request, tag)
+            if response:
+                return response
+            board = board.as_json(without_tasks=True)
+            query = task_rows(user_id, board_id)
+            if wants_stream(request.query_params):
+                return StreamingResponse(stream_tasks(request, board, query), media_type='application/json',
+                                         headers=cache_headers(tag))
+            rows = (await session.execute(query)).all()
+        return json_response({**board, 'tasks': task_dicts(rows)}, cache_headers(tag))
+
+    async def handle_board_tasks(request):
+        board_id = request.path_params['board_id']
+        user_id = authorize(request)
+        async with sessions(request) as session:
+            await get_board(session, user_id, board_id)
+            query = board_tasks_query(user_id, board_id, request.query_params)
+            limit, cursor = page_args(args=request.query_params)
+            rows = (await session.execute(keyset(query, Task.id, limit, cursor))).scalars().all()
+        tasks, headers = page(rows, Task.id, limit)
+        return json_response([task.as_json() for task in tasks], headers)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        for engine in engines:
+            await engine.dispose()
+
+    return Starlette(
+        routes=[
+            Route('/api/boards', native('api.handle_boards', handle_boards), methods=['GET']),
+            Route('/api/boards/{board_id:int}', native('api.handle_board', handle_board), methods=['GET']),
+            Route('/api/boards/{board_id:int}/tasks', native('api.handle_board_tasks', handle_board_tasks),
+                  methods=['GET']),
+            Mount('/', app=WSGIMiddleware(flask_app)),
+        ],
+        middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                               expose_headers=EXPOSE_HEADERS)],
+        lifespan=lifespan,
+    )
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from flask import abort, request
+from sqlalchemy import event
+
+from instrumentation import phase
+from models import db, User
+
+
+class TokenCache:
+    """Bounded LRU cache of token lookups with separate TTLs for hits and misses."""
+
+    def __init__(self, maxsize=100_000, ttl=300.0, negative_ttl=5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token):
+        """Return True/False for a cached valid/invalid token, None on a miss."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            valid, expires = entry
+            if expires < monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return valid
+
+    def put(self, token, valid):
+        ttl = self.ttl if valid else self.negative_ttl
+        with self._lock:
+            self._entries[token] = (valid, monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    token_cache.invalidate(target.id)
+
+
+def token_user():
+    """Return the id of the user owning the bearer token, or None when there is no valid one."""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2:
+        return None
+    token = parts[1]
+    valid = token_cache.get(token)
+    if valid is None:
+        valid = db.session.get(User, token) is not None
+        token_cache.put(token, valid)
+    return token if valid else None
+
+
+def require_authorization() -> str:
+    """Return the id of the user owning the bearer token or abort with 401."""
+    with phase('auth'):
+        return authorized_or_401(token_user())
+
+
+def authorized_or_401(user_id):
+    if user_id is None:
+        abort(401, description='Authorization failed')
+    return user_id
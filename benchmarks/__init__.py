@@ -0,0 +1,13 @@
+def migrated_app(**config):
+    """Create the app with ``config`` overrides and bring its database schema up to date.
+
+    Rate limiting is off unless ``config`` turns it on: benchmarks drive single
+    clients far past the per-client limits.
+    """
+    from main import create_app
+    from migrations import upgrade_all
+
+    app = create_app({'SWAGGER_ENABLED': False, 'RATE_LIMIT_ENABLED': False, **config})
+    with app.app_context():
+        upgrade_all()
+    return app
@@ -0,0 +1,73 @@
+"""Board load time before and after archiving its done tasks.
+
+    python -m benchmarks.archive [tasks] [done percent] [requests]
+
+Seeds a board of ``tasks`` tasks (10000 by default), ``done`` percent of them
+(90 by default) in the done status, and times ``requests`` GET /api/boards/<id>
+(50 by default) before and after ``flask archive-tasks`` moves the done ones to
+the archive. Also reports the size of the response and of the task
+table with its indexes, where SQLite's dbstat is available.
+"""
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import migrated_app
+from models import db
+
+BATCH = 1000
+DONE = 2
+
+
+def seed(client, headers, tasks, done):
+    board_id = client.post('/api/boards/create', headers=headers, json={'name': 'board'}).json['id']
+    for start in range(0, tasks, BATCH):
+        response = client.post(f'/api/boards/{board_id}/tasks/batch', headers=headers, json={'operations': [
+            {'op': 'create', 'title': f'title {index}', 'description': 'description ' * 10,
+             'status': DONE if index % 100 < done else index % DONE}
+            for index in range(start, min(start + BATCH, tasks))]})
+        assert response.status_code == 200, response.status_code
+    return board_id
+
+
+def task_table_size(app):
+    with app.app_context():
+        try:
+            return db.session.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name IN "
+                                           "(SELECT name FROM sqlite_master WHERE tbl_name = 'task')")).scalar()
+        except OperationalError:
+            return None
+
+
+def measure(app, client, headers, board_id, requests):
+    started = perf_counter()
+    for _ in range(requests):
+        response = client.get(f'/api/boards/{board_id}', headers=headers)
+    seconds = (perf_counter() - started) / requests
+    size = task_table_size(app)
+    table = f', task table {size / 1024:8.0f} KiB' if size else ''
+    return f'{seconds * 1000:7.2f} ms per load, {len(response.data) / 1024:8.1f} KiB{table}'
+
+
+def main(tasks, done, requests):
+    app = migrated_app()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+    board_id = seed(client, headers, tasks, done)
+    print(f'before: {measure(app, client, headers, board_id, requests)}')
+    started = perf_counter()
+    result = app.test_cli_runner().invoke(args=['archive-tasks', '--status', str(DONE), '--older-than', '0'])
+    print(f'{result.output.strip().rstrip(".")} in {(perf_counter() - started) * 1000:.0f} ms')
+    print(f' after: {measure(app, client, headers, board_id, requests)}')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [10_000, 90, 50][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/archive.db'
+        main(*args)
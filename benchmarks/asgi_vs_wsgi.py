@@ -0,0 +1,106 @@
+"""Board polling throughput and tail latency of the ASGI mode versus the threaded WSGI server.
+
+    python -m benchmarks.asgi_vs_wsgi [seconds] [concurrency ...]
+
+Both servers run as subprocesses on the same seeded database; every client
+repeatedly fetches one board with its tasks. Needs requirements-asgi.txt and httpx.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+
+import httpx
+
+from benchmarks import migrated_app
+
+SERVERS = {
+    'wsgi': ['flask', '--app', 'main:create_app', 'run', '--with-threads', '--port', '{port}'],
+    'asgi': ['uvicorn', 'asgi:create_asgi_app', '--factory', '--log-level', 'warning', '--port', '{port}'],
+}
+TASKS = 200
+
+
+def seed(url):
+    client = migrated_app(SQLALCHEMY_DATABASE_URI=url).test_client()
+    token = client.post('/api/signup').json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'bench'})
+    task = {'title': 'title', 'description': 'description', 'status': 0}
+    client.post('/api/boards/1/tasks/batch', headers=headers,
+                json={'operations': [{'op': 'create', **task}] * TASKS})
+    return headers
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30.0):
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        try:
+            httpx.get(f'{base_url}/api/boards')
+            return
+        except httpx.TransportError:
+            sleep(0.1)
+    raise RuntimeError(f'{base_url} did not start')
+
+
+async def load(base_url, headers, concurrency, seconds):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        deadline = perf_counter() + seconds
+
+        async def worker():
+            nonlocal errors
+            while perf_counter() < deadline:
+                started = perf_counter()
+                try:
+                    ok = (await client.get('/api/boards/1')).status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = perf_counter() - started
+    latencies.sort()
+    p50, p99 = (latencies[int(len(latencies) * q)] * 1000 if latencies else float('nan') for q in (0.5, 0.99))
+    return len(latencies) / elapsed, p50, p99, errors
+
+
+def main(seconds, concurrencies):
+    with TemporaryDirectory() as workdir:
+        url = f'sqlite:///{workdir}/bench.db'
+        headers = seed(url)
+        env = {**os.environ, 'DATABASE_URL': url, 'FLASK_SWAGGER_ENABLED': 'false',
+               'FLASK_RATE_LIMIT_ENABLED': 'false'}
+        for name, command in SERVERS.items():
+            port = free_port()
+            command = [sys.executable, '-m'] + [part.format(port=port) for part in command]
+            server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                wait_until_up(base_url)
+                for concurrency in concurrencies:
+                    rate, p50, p99, errors = asyncio.run(load(base_url, headers, concurrency, seconds))
+                    print(f'{name} x{concurrency:<5}: {rate:8.0f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  '
+                          f'{errors} errors')
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 10, args[1:] or [100, 500, 1000])
@@ -0,0 +1,48 @@
+"""Authentication latency against growing user tables.
+
+    python -m benchmarks.auth_latency [sizes...]
+"""
+import sys
+from random import sample
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from uuid import uuid4
+
+from flask import Flask
+
+from auth import require_authorization, token_cache
+from models import db, User
+
+LOOKUPS = 2000
+
+
+def measure(app, tokens):
+    started = perf_counter()
+    for token in tokens:
+        with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+            require_authorization()
+    return (perf_counter() - started) / len(tokens) * 1e6
+
+
+def run(size, workdir):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{workdir}/auth_{size}.db'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        tokens = [uuid4().hex for _ in range(size)]
+        for start in range(0, size, 50_000):
+            db.session.execute(db.insert(User), [{'id': t} for t in tokens[start:start + 50_000]])
+        db.session.commit()
+    probe = sample(tokens, min(LOOKUPS, size))
+    token_cache.clear()
+    cold = measure(app, probe)
+    warm = measure(app, probe)
+    print(f'{size:>9} users  cold {cold:8.1f} us/req  cached {warm:8.1f} us/req')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+    with TemporaryDirectory() as workdir:
+        for size in sizes:
+            run(size, workdir)
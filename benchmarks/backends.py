@@ -0,0 +1,79 @@
+"""Every endpoint on SQLite and on PostgreSQL, with a throughput comparison.
+
+    python -m benchmarks.backends [--postgres URL] [--output results.json] [suite options]
+
+For each backend, runs the query_counts check (every endpoint once, answering
+200 within its query budget) and then the benchmark suite, each on a fresh
+database. PostgreSQL is the server at ``--postgres`` (or POSTGRES_URL), an
+administrative URL such as postgresql://postgres@localhost/postgres used to
+create and drop scratch databases. Without one, a throwaway cluster is started
+with the initdb and pg_ctl found on PATH, which refuse to run as root. Needs
+the packages in requirements-postgres.txt.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from tempfile import TemporaryDirectory
+
+from benchmarks import query_counts, suite
+from tests.postgres import Postgres, postgres_server
+
+
+def run_backend(name, new_database, args):
+    print(f'\n== {name}: endpoint check', flush=True)
+    query_counts.main(new_database())
+    print(f'\n== {name}: benchmark suite', flush=True)
+    modes = ['client', 'server'] if args.mode == 'both' else [args.mode]
+    results = []
+    for mode in modes:
+        results += [{'backend': name, **result} for result in suite.run_mode(mode, args, new_database())]
+    return results
+
+
+def report(results):
+    by_backend = {}
+    for result in results:
+        by_backend.setdefault(result['backend'], {})[result['mode'], result['endpoint']] = result
+    backends = list(by_backend)
+    print('\n' + f'{"":>6}  {"":<17}' + ''.join(f'{name:>12}' for name in backends) + '   req/s')
+    for key in by_backend[backends[0]]:
+        row = [by_backend[name].get(key) for name in backends]
+        cells = ''.join(f'{result["throughput"]:12.0f}' if result else f'{"-":>12}' for result in row)
+        ratio = ''
+        if len(row) == 2 and all(row) and row[0]['throughput']:
+            ratio = f'  {row[1]["throughput"] / row[0]["throughput"]:5.2f}x'
+        print(f'{key[0]:>6}  {key[1]:<17}{cells}{ratio}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.backends', description=__doc__.splitlines()[0])
+    parser.add_argument('--postgres', default=os.environ.get('POSTGRES_URL'),
+                        help='administrative URL of a PostgreSQL server')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    suite.workload_arguments(parser).set_defaults(mode='client')
+    args = parser.parse_args(argv)
+
+    results = []
+    with TemporaryDirectory() as workdir:
+        numbers = itertools.count()
+        results += run_backend('sqlite', lambda: f'sqlite:///{workdir}/{next(numbers)}.db', args)
+        with postgres_server(args.postgres, workdir) as admin_url:
+            if admin_url is None:
+                print('\nNo PostgreSQL server given and no initdb on PATH; skipped PostgreSQL.')
+            else:
+                postgres = Postgres(admin_url)
+                try:
+                    results += run_backend('postgresql', postgres.database, args)
+                finally:
+                    postgres.close()
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'options': {key: value for key, value in vars(args).items() if key != 'postgres'},
+                       'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
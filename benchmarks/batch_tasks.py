@@ -0,0 +1,45 @@
+"""Moving cards one request at a time versus one batch request.
+
+    python -m benchmarks.batch_tasks [cards] [rounds]
+"""
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks import migrated_app
+
+
+def main(cards, rounds):
+    app = migrated_app()
+
+    client = app.test_client()
+    token = client.post('/api/signup').json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'bench'})
+    task = {'title': 'title', 'description': 'description', 'status': 0}
+    client.post('/api/boards/1/tasks/batch', headers=headers,
+                json={'operations': [{'op': 'create', **task}] * cards})
+
+    started = perf_counter()
+    for status in range(rounds):
+        for task_id in range(1, cards + 1):
+            client.post(f'/api/boards/1/tasks/{task_id}/edit', headers=headers, json={'status': status + 1})
+    single = (perf_counter() - started) / rounds
+
+    started = perf_counter()
+    for status in range(rounds):
+        operations = [{'op': 'status', 'id': task_id, 'status': status} for task_id in range(1, cards + 1)]
+        response = client.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': operations})
+        assert response.status_code == 200
+    batch = (perf_counter() - started) / rounds
+
+    print(f'moving {cards} cards: {single * 1000:.1f} ms one by one, {batch * 1000:.1f} ms batched '
+          f'({single / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/batch.db'
+        main(*(args + [50, 10][len(args):]))
@@ -0,0 +1,110 @@
+"""Cost of deleting a big board, to its caller and to other writers.
+
+    python -m benchmarks.board_delete [tasks] [writers]
+
+Deletes a board of ``tasks`` tasks (50k by default) in each of four ways:
+loading it and letting the ORM cascade delete every task object (what the
+endpoint used to do), the set-based delete returning the tasks, the same with
+?summary=1, and ?background=1. Meanwhile ``writers`` threads keep creating
+tasks on another board. Reports how long the delete request took, how long
+until the tasks were gone, and the slowest write that overlapped it.
+"""
+import os
+import sys
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from sqlalchemy.orm import selectinload
+
+from benchmarks import migrated_app
+from ids import drop_sequence
+from models import db, Board
+
+BATCH = 1000
+TASK = {'title': 'title', 'description': 'description', 'status': 0}
+
+
+def seed(client, headers, name, tasks):
+    board_id = client.post('/api/boards/create', headers=headers, json={'name': name}).json['id']
+    for start in range(0, tasks, BATCH):
+        response = client.post(f'/api/boards/{board_id}/tasks/batch', headers=headers, json={'operations': [
+            {'op': 'create', 'title': f'title {number}', 'description': 'description', 'status': number % 5}
+            for number in range(start, min(start + BATCH, tasks))]})
+        assert response.status_code == 200, response.status_code
+    return board_id
+
+
+def orm_cascade(app, client, headers, user_id, board_id):
+    with app.app_context():
+        board = db.session.execute(db.select(Board).where(Board.id == board_id, Board.user_id == user_id)
+                                   .options(selectinload(Board.tasks))).scalar_one()
+        db.session.delete(board)
+        drop_sequence(user_id, board_id)
+        db.session.commit()
+
+
+def endpoint(query):
+    def delete(app, client, headers, user_id, board_id):
+        response = client.post(f'/api/boards/{board_id}/delete{query}', headers=headers)
+        assert response.status_code in (200, 202), response.status_code
+    return delete
+
+
+WAYS = {
+    'ORM cascade': orm_cascade,
+    'set-based': endpoint(''),
+    'summary': endpoint('?summary=1'),
+    'background': endpoint('?background=1'),
+}
+
+
+def board_exists(app, user_id, board_id):
+    with app.app_context():
+        return db.session.get(Board, {'id': board_id, 'user_id': user_id}) is not None
+
+
+def main(tasks, writers):
+    app = migrated_app()
+    client = app.test_client()
+    user_id = client.post('/api/signup').json['token']
+    headers = {'Authorization': f'Bearer {user_id}'}
+    other = client.post('/api/boards/create', headers=headers, json={'name': 'other'}).json['id']
+
+    for name, delete in WAYS.items():
+        board_id = seed(client, headers, name, tasks)
+        stop, writes = Event(), []
+
+        def write():
+            writer = app.test_client()
+            while not stop.is_set():
+                started = perf_counter()
+                writer.post(f'/api/boards/{other}/tasks/create', headers=headers, json=TASK)
+                writes.append((started, perf_counter()))
+                sleep(0.01)
+
+        threads = [Thread(target=write) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        sleep(0.2)
+        started = perf_counter()
+        delete(app, client, headers, user_id, board_id)
+        answered = perf_counter()
+        while board_exists(app, user_id, board_id):
+            sleep(0.01)
+        gone = perf_counter()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        overlapping = [end - start for start, end in writes if end > started and start < gone] or [0.0]
+        print(f'{name:>12}: answered in {(answered - started) * 1000:8.1f} ms, '
+              f'tasks gone after {(gone - started) * 1000:8.1f} ms, '
+              f'{len(overlapping):5} writes meanwhile, slowest {max(overlapping) * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [50_000, 2][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/board_delete.db'
+        main(*args)
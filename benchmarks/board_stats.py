@@ -0,0 +1,64 @@
+"""Latency of /api/boards/<id>/stats against counting the tasks of /api/boards/<id>.
+
+    python -m benchmarks.board_stats [tasks] [statuses] [repeat]
+
+Seeds one board with ``tasks`` tasks (100k by default) spread over
+``statuses`` statuses, then times both ways of getting its per-status counts
+and the full recount of ``flask check-stats``.
+"""
+import os
+import sys
+from collections import Counter
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks import migrated_app
+from stats import check_counts
+
+BATCH = 1000
+
+
+def timed(repeat, call):
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        call()
+        timings.append(perf_counter() - started)
+    timings.sort()
+    return f'p50 {timings[len(timings) // 2] * 1000:8.2f} ms  max {timings[-1] * 1000:8.2f} ms'
+
+
+def main(tasks, statuses, repeat):
+    app = migrated_app()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'bench'})
+    started = perf_counter()
+    for start in range(0, tasks, BATCH):
+        response = client.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+            {'op': 'create', 'title': 'title', 'description': 'description', 'status': number % statuses}
+            for number in range(start, min(start + BATCH, tasks))]})
+        assert response.status_code == 200, response.status_code
+    print(f'seeded {tasks} tasks in {perf_counter() - started:.1f} s')
+
+    def stats():
+        return client.get('/api/boards/1/stats', headers=headers).json['statuses']
+
+    def count_board():
+        counts = Counter(str(task['status']) for task in client.get('/api/boards/1', headers=headers).json['tasks'])
+        return dict(counts)
+
+    assert stats() == count_board()
+    print(f'         stats: {timed(repeat, stats)}')
+    print(f'  count board: {timed(repeat, count_board)}')
+    with app.app_context():
+        print(f'check counters: {timed(1, check_counts)}')
+        assert check_counts() == []
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [100_000, 5, 20][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/board_stats.db'
+        main(*args)
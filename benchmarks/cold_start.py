@@ -0,0 +1,26 @@
+"""Worker boot time: a fresh interpreter importing main and calling create_app().
+
+    python -m benchmarks.cold_start [runs]
+"""
+import os
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+
+BOOT = 'from main import create_app; create_app()'
+
+
+def boot_time(runs, env):
+    timings = []
+    for _ in range(runs):
+        started = perf_counter()
+        subprocess.run([sys.executable, '-c', BOOT], env={**os.environ, **env}, check=True)
+        timings.append(perf_counter() - started)
+    return median(timings) * 1000
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name, env in [('swagger on', {}), ('swagger off', {'FLASK_SWAGGER_ENABLED': 'false'})]:
+        print(f'{name:>11}: {boot_time(runs, env):6.0f} ms median boot')
@@ -0,0 +1,88 @@
+"""Write throughput with group commit versus a commit per request.
+
+    python -m benchmarks.group_commit [writers] [seconds]
+
+``writers`` threads create tasks as fast as they can, each as its own user,
+under both commit modes and with synchronous=NORMAL (the default, no fsync
+per commit in WAL mode) and FULL (an fsync per commit). Each configuration
+runs in a fresh subprocess so the app is created with the environment it is
+given.
+"""
+import json
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from benchmarks import migrated_app
+
+CONFIGURATIONS = {
+    'per request, NORMAL': {},
+    'group commit, NORMAL': {'FLASK_GROUP_COMMIT_ENABLED': 'true'},
+    'per request, FULL': {'FLASK_SQLITE_PRAGMAS__synchronous': 'FULL'},
+    'group commit, FULL': {'FLASK_GROUP_COMMIT_ENABLED': 'true', 'FLASK_SQLITE_PRAGMAS__synchronous': 'FULL'},
+}
+TASK = {'title': 'title', 'description': 'description', 'status': 0}
+
+
+def workload(writers, seconds):
+    app = migrated_app()
+    client = app.test_client()
+    headers = []
+    for _ in range(writers):
+        headers.append({'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'})
+        client.post('/api/boards/create', headers=headers[-1], json={'name': 'bench'})
+
+    stop = Event()
+    latencies, errors = [], []
+
+    def loop(header):
+        writer = app.test_client()
+        while not stop.is_set():
+            started = perf_counter()
+            try:
+                ok = writer.post('/api/boards/1/tasks/create', headers=header, json=TASK).status_code == 200
+            except Exception:
+                ok = False
+            (latencies if ok else errors).append(perf_counter() - started)
+
+    threads = [Thread(target=loop, args=(header,)) for header in headers]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    latencies.sort()
+    writers = app.extensions.get('group_commit', {}).values()
+    batches, requests = sum(writer.batches for writer in writers), sum(writer.requests for writer in writers)
+    print(json.dumps({
+        'writes': len(latencies) / elapsed,
+        'errors': len(errors) / elapsed,
+        'p50': latencies[len(latencies) // 2] if latencies else 0,
+        'p99': latencies[int(len(latencies) * 0.99)] if latencies else 0,
+        'batch': requests / batches if batches else 1,
+    }))
+
+
+def main(writers, seconds):
+    for name, overrides in CONFIGURATIONS.items():
+        with TemporaryDirectory() as workdir:
+            env = {**os.environ, **overrides, 'DATABASE_URL': f'sqlite:///{workdir}/group_commit.db'}
+            output = subprocess.run([sys.executable, '-m', __spec__.name, 'run', str(writers), str(seconds)],
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f'{name:>20}: {result["writes"]:7.0f} writes/s {result["errors"]:6.1f} errors/s  '
+                  f'p50 {result["p50"] * 1000:6.1f} ms  p99 {result["p99"] * 1000:7.1f} ms  '
+                  f'{result["batch"]:5.1f} requests per commit')
+
+
+if __name__ == '__main__':
+    run = sys.argv[1:2] == ['run']
+    args = [int(arg) for arg in sys.argv[1 + run:]]
+    args += [16, 5][len(args):]
+    (workload if run else main)(*args)
@@ -0,0 +1,71 @@
+"""Concurrent board/task creation stress test for the id sequences.
+
+    python -m benchmarks.id_allocation [workers] [creates-per-worker]
+
+Every worker is a separate process with its own connection, like a gunicorn
+worker, and they all create boards for the same user and tasks on the same
+board. Fails if any create raises or any id is handed out twice.
+"""
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from flask import Flask
+
+from ids import allocate_ids, start_sequence
+from models import db, Board, Task, User
+
+USER = 'stress'
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    return app
+
+
+def worker(path, creates):
+    app = make_app(path)
+    with app.app_context():
+        for i in range(creates):
+            board_id = allocate_ids(USER)
+            db.session.add(Board(id=board_id, name=f'board {board_id}', user_id=USER))
+            start_sequence(USER, board_id)
+            db.session.add(Task(id=allocate_ids(USER, 1), board_id=1, board_user_id=USER,
+                                title='t', description='d', status=i % 3))
+            db.session.commit()
+
+
+def main(workers, creates):
+    with TemporaryDirectory() as workdir:
+        path = f'{workdir}/ids.db'
+        app = make_app(path)
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(id=USER))
+            start_sequence(USER)
+            db.session.add(Board(id=allocate_ids(USER), name='shared', user_id=USER))
+            start_sequence(USER, 1)
+            db.session.commit()
+
+        started = perf_counter()
+        with ProcessPoolExecutor(workers) as pool:
+            for future in [pool.submit(worker, path, creates) for _ in range(workers)]:
+                future.result()
+        elapsed = perf_counter() - started
+
+        with app.app_context():
+            board_ids = db.session.execute(db.select(Board.id)).scalars().all()
+            task_ids = db.session.execute(db.select(Task.id)).scalars().all()
+        total = workers * creates
+        assert sorted(board_ids) == list(range(1, total + 2)), 'board ids are not unique and dense'
+        assert sorted(task_ids) == list(range(1, total + 1)), 'task ids are not unique and dense'
+        print(f'{workers} workers x {creates} creates: {2 * total / elapsed:.0f} rows/s, no duplicate keys')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [16, 200][len(args):]))
@@ -0,0 +1,65 @@
+"""SQL statements per endpoint against the budgets declared with @query_budget.
+
+    python -m benchmarks.query_counts [database url]
+
+Runs every endpoint once on a scratch database (an empty one at ``database
+url`` if given) with QUERY_BUDGET_ENFORCE on, so a view that goes over its
+budget raises QueryBudgetExceeded here.
+"""
+import sys
+from tempfile import TemporaryDirectory
+
+from auth import token_cache
+from benchmarks import migrated_app
+
+
+def main(url):
+    app = migrated_app(SQLALCHEMY_DATABASE_URI=url)
+
+    app.config.update(TESTING=True, QUERY_BUDGET_ENFORCE=True)
+    client = app.test_client()
+
+    def call(method, url, status=200, **kwargs):
+        token_cache.clear()
+        response = client.open(url, method=method, **kwargs)
+        assert response.status_code == status, (url, response.status_code)
+        print(f'{response.headers["X-Query-Count"]:>3}  {method:4} {url}')
+        return response
+
+    token = call('POST', '/api/signup').json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    task = {'title': 'title', 'description': 'description', 'status': 1}
+    call('POST', '/api/boards/create', headers=headers, json={'name': 'first'})
+    call('POST', '/api/boards/create', headers=headers, json={'name': 'second'})
+    call('POST', '/api/boards/create', headers=headers, json={'name': 'third'})
+    for _ in range(3):
+        call('POST', '/api/boards/1/tasks/create', headers=headers, json=task)
+    call('POST', '/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', **task}, {'op': 'edit', 'id': 1, 'title': 'edited'},
+        {'op': 'status', 'id': 2, 'status': 0}, {'op': 'delete', 'id': 3}]})
+    for _ in range(2):
+        call('POST', '/api/boards/1/tasks/create', headers={**headers, 'Idempotency-Key': 'retried'}, json=task)
+    call('GET', '/api/boards', headers=headers)
+    call('GET', '/api/boards?limit=1', headers=headers)
+    call('GET', '/api/boards/1', headers=headers)
+    call('GET', '/api/boards/1/tasks?status=1&limit=2', headers=headers)
+    call('GET', '/api/tasks/search?q=title&limit=2', headers=headers)
+    call('GET', '/api/boards/stats', headers=headers)
+    call('GET', '/api/boards/1/stats', headers=headers)
+    cursor = call('GET', '/api/sync', headers=headers).json['cursor']
+    call('GET', '/api/sync?limit=1', headers=headers)
+    call('POST', '/api/boards/1/edit', headers=headers, json={'name': 'renamed'})
+    call('POST', '/api/boards/1/tasks/4/move', headers=headers, json={'after_id': 1})
+    call('POST', '/api/boards/1/tasks/1/edit', headers=headers, json={'status': 2})
+    call('POST', '/api/boards/1/archive?status=0&older_than=0', headers=headers)
+    call('GET', '/api/boards/1/archive?limit=1', headers=headers)
+    call('POST', '/api/boards/1/tasks/1/delete', headers=headers)
+    call('POST', '/api/boards/1/delete', headers=headers)
+    call('POST', '/api/boards/2/delete?summary=1', headers=headers)
+    call('POST', '/api/boards/3/delete?background=1', 202, headers=headers)
+    call('GET', f'/api/sync?since={cursor}', headers=headers)
+
+
+if __name__ == '__main__':
+    with TemporaryDirectory() as workdir:
+        main(sys.argv[1] if len(sys.argv) > 1 else f'sqlite:///{workdir}/query_counts.db')
@@ -0,0 +1,74 @@
+"""Cost of the rate limiter and how admission control treats a flooding client.
+
+    python -m benchmarks.rate_limit [seconds] [flooders]
+
+Times MemoryLimiter.take and SQLiteLimiter.take, then runs ``flooders``
+threads sending task writes as fast as they can with one token next to a
+client writing ten times a second with another, and reports the status codes
+and latency each of them got.
+"""
+import os
+import sys
+from collections import Counter
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from benchmarks import migrated_app
+from ratelimit import MemoryLimiter, SQLiteLimiter
+
+TASK = {'title': 'title', 'description': 'description', 'status': 0}
+
+
+def take_cost(limiter, count=20_000):
+    started = perf_counter()
+    for number in range(count):
+        limiter.take(f'key{number % 100}', 1000, 1000)
+    return (perf_counter() - started) / count * 1e6
+
+
+def client_loop(app, headers, stop, results, pause):
+    client = app.test_client()
+    while not stop.is_set():
+        started = perf_counter()
+        response = client.post('/api/boards/1/tasks/create', headers=headers, json=TASK)
+        results.append((response.status_code, perf_counter() - started))
+        if pause:
+            sleep(pause)
+
+
+def report(name, results):
+    codes = Counter(code for code, _ in results)
+    served = sorted(seconds for code, seconds in results if code == 200) or [0.0]
+    print(f'{name:>8}: {dict(codes)}  served p50 {served[len(served) // 2] * 1000:6.1f} ms  '
+          f'p99 {served[int(len(served) * 0.99)] * 1000:6.1f} ms')
+
+
+def main(workdir, seconds, flooders):
+    print(f'  memory take: {take_cost(MemoryLimiter()):6.1f} us')
+    print(f'  sqlite take: {take_cost(SQLiteLimiter(f"{workdir}/limits.db"), 2000):6.1f} us')
+    app = migrated_app(RATE_LIMIT_ENABLED=True)
+    client = app.test_client()
+    tokens = [client.post('/api/signup').json['token'] for _ in range(2)]
+    headers = [{'Authorization': f'Bearer {token}'} for token in tokens]
+    for header in headers:
+        client.post('/api/boards/create', headers=header, json={'name': 'bench'})
+    stop, flood, polite = Event(), [], []
+    threads = [Thread(target=client_loop, args=(app, headers[0], stop, flood, 0)) for _ in range(flooders)]
+    threads.append(Thread(target=client_loop, args=(app, headers[1], stop, polite, 0.1)))
+    for thread in threads:
+        thread.start()
+    sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    report('flooder', flood)
+    report('polite', polite)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [10, 8][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/rate_limit.db'
+        main(workdir, *args)
@@ -0,0 +1,82 @@
+"""Latency of /api/tasks/search over a large task table.
+
+    python -m benchmarks.search [tasks] [users] [repeat]
+
+Seeds ``tasks`` tasks (1M by default) spread over ``users`` users, with titles
+and descriptions drawn from a Zipf-distributed vocabulary, then times rare,
+common, multi-word and prefix queries of one user through the test client.
+"""
+import os
+import random
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks import migrated_app
+from models import db
+
+VOCABULARY = 20_000
+BATCH = 50_000
+QUERIES = {
+    'rare word': 'w19000',
+    'common word': 'w3',
+    'two words': 'w3 w40',
+    'prefix': 'w123*',
+    'no match': 'absent',
+}
+
+
+def words(rng, weights, count):
+    return ' '.join(f'w{index}' for index in rng.choices(range(VOCABULARY), cum_weights=weights, k=count))
+
+
+def seed(app, tasks, users):
+    client = app.test_client()
+    tokens = [client.post('/api/signup').json['token'] for _ in range(users)]
+    for token in tokens:
+        client.post('/api/boards/create', headers={'Authorization': f'Bearer {token}'}, json={'name': 'bench'})
+    rng = random.Random(1)
+    weights, total = [], 0.0
+    for rank in range(1, VOCABULARY + 1):
+        total += 1 / rank
+        weights.append(total)
+    started = perf_counter()
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            for start in range(0, tasks, BATCH):
+                connection.executemany(
+                    'INSERT INTO task (id, title, description, status, board_id, board_user_id) '
+                    'VALUES (?, ?, ?, 0, 1, ?)',
+                    [(number // users + 1, words(rng, weights, 4), words(rng, weights, 12), tokens[number % users])
+                     for number in range(start, min(start + BATCH, tasks))])
+                connection.commit()
+        finally:
+            connection.close()
+    print(f'seeded {tasks} tasks for {users} users in {perf_counter() - started:.1f} s')
+    return tokens[0]
+
+
+def main(tasks, users, repeat):
+    app = migrated_app()
+    token = seed(app, tasks, users)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    for name, q in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            response = client.get('/api/tasks/search', headers=headers, query_string={'q': q, 'limit': 20})
+            timings.append(perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+        timings.sort()
+        print(f'{name:>12} {q!r:>10}: {len(response.json):3} results  '
+              f'p50 {timings[len(timings) // 2] * 1000:7.2f} ms  p99 {timings[int(len(timings) * 0.99)] * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [1_000_000, 100, 50][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/search.db'
+        main(*args)
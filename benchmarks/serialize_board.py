@@ -0,0 +1,69 @@
+"""Board serialisation throughput for hydrated ORM objects versus column rows.
+
+    python -m benchmarks.serialize_board [sizes...]
+"""
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import selectinload
+
+from benchmarks import migrated_app
+from models import db, Board, Task, User
+from serialization import FastJSONProvider, orjson, stream_board, task_dicts, task_rows
+
+USER = 'bench'
+
+
+def seed(app, board_id, size):
+    with app.app_context():
+        # Boards reference their user now that SQLite enforces foreign keys.
+        db.session.merge(User(id=USER))
+        db.session.add(Board(id=board_id, name=f'{size} tasks', user_id=USER))
+        db.session.execute(db.insert(Task), [
+            {'id': i, 'title': f'task {i}', 'description': 'description ' * 5, 'status': i % 4,
+             'board_id': board_id, 'board_user_id': USER} for i in range(1, size + 1)])
+        db.session.commit()
+
+
+def run(app, board_id, size):
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    def orm_stdlib():
+        board = db.session.execute(db.select(Board).where(Board.id == board_id)
+                                   .options(selectinload(Board.tasks))).scalar_one()
+        return stdlib.dumps(board.as_json())
+
+    def rows(provider):
+        board = db.session.get(Board, (board_id, USER)).as_json(without_tasks=True)
+        return provider.dumps({**board, 'tasks': task_dicts(db.session.execute(task_rows(USER, board_id)))})
+
+    def streamed():
+        board = db.session.get(Board, (board_id, USER)).as_json(without_tasks=True)
+        return b''.join(stream_board(board, task_rows(USER, board_id)))
+
+    cases = [('orm + stdlib', orm_stdlib), ('rows + stdlib', lambda: rows(stdlib))]
+    if orjson is not None:
+        cases += [('rows + orjson', lambda: rows(fast)), ('rows + orjson stream', streamed)]
+    for name, case in cases:
+        with app.test_request_context():
+            app.json = fast
+            repeats = max(1, 100_000 // size)
+            started = perf_counter()
+            for _ in range(repeats):
+                case()
+                db.session.expunge_all()
+            elapsed = (perf_counter() - started) / repeats
+        print(f'{size:>7} tasks  {name:<21} {elapsed * 1000:9.2f} ms  {size / elapsed:12,.0f} tasks/s')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 10_000, 100_000]
+    with TemporaryDirectory() as workdir:
+        app = migrated_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{workdir}/serialize.db')
+        for board_id, size in enumerate(sizes, 1):
+            seed(app, board_id, size)
+        for board_id, size in enumerate(sizes, 1):
+            run(app, board_id, size)
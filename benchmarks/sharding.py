@@ -0,0 +1,46 @@
+"""Write throughput against the number of SQLite shards.
+
+    python -m benchmarks.sharding [writers] [seconds] [processes] [shard counts...]
+
+``writers`` threads in each of ``processes`` worker processes create tasks as
+fast as they can, each thread as its own user, with the users spread over 1,
+2, 4 and 8 shards (or the counts given), under synchronous=NORMAL and FULL.
+The workers run the workload of benchmarks.group_commit side by side against
+the same databases, as workers of one deployment would.
+"""
+import json
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+
+from benchmarks import group_commit
+
+
+def run_workers(env, writers, seconds, processes):
+    subprocess.run([sys.executable, '-c', 'from benchmarks import migrated_app; migrated_app()'], env=env, check=True)
+    workers = [subprocess.Popen([sys.executable, '-m', group_commit.__name__, 'run', str(writers), str(seconds)],
+                                env=env, stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+    results = [json.loads(worker.communicate()[0].splitlines()[-1]) for worker in workers]
+    return {'writes': sum(result['writes'] for result in results),
+            'errors': sum(result['errors'] for result in results),
+            'p50': max(result['p50'] for result in results),
+            'p99': max(result['p99'] for result in results)}
+
+
+def main(writers, seconds, processes, counts):
+    for synchronous in ('NORMAL', 'FULL'):
+        for count in counts:
+            with TemporaryDirectory() as workdir:
+                env = {**os.environ, 'DATABASE_URL': f'sqlite:///{workdir}/directory.db',
+                       'FLASK_SHARDS': json.dumps([f'sqlite:///{workdir}/shard{index}.db' for index in range(count)]),
+                       'FLASK_SQLITE_PRAGMAS__synchronous': synchronous}
+                result = run_workers(env, writers, seconds, processes)
+                print(f'{synchronous:>6}, {count} shards: {result["writes"]:7.0f} writes/s '
+                      f'{result["errors"]:6.1f} errors/s  p50 {result["p50"] * 1000:6.1f} ms  '
+                      f'p99 {result["p99"] * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args[:3] + [4, 5, 4][len(args[:3]):]), args[3:] or [1, 2, 4, 8])
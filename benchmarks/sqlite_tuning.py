@@ -0,0 +1,77 @@
+"""Concurrent read/write throughput with the tuned SQLite settings versus the defaults.
+
+    python -m benchmarks.sqlite_tuning [readers] [writers] [seconds]
+
+Each configuration runs in a fresh subprocess so the engine is created with
+the environment it is given.
+"""
+import json
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from benchmarks import migrated_app
+
+CONFIGURATIONS = {
+    'defaults': {'FLASK_SQLITE_PRAGMAS': '{}', 'FLASK_SQLALCHEMY_ENGINE_OPTIONS': '{}'},
+    'tuned': {},
+}
+
+
+def workload(readers, writers, seconds):
+    app = migrated_app()
+
+    client = app.test_client()
+    token = client.post('/api/signup').json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'bench'})
+    task = {'title': 'title', 'description': 'description', 'status': 0}
+    client.post('/api/boards/1/tasks/batch', headers=headers,
+                json={'operations': [{'op': 'create', **task}] * 200})
+
+    stop = Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+
+    def loop(kind, request):
+        while not stop.is_set():
+            try:
+                ok = request().status_code == 200
+            except Exception:
+                ok = False
+            counts[kind if ok else 'errors'] += 1
+
+    threads = [Thread(target=loop, args=('reads', lambda: client.get('/api/boards/1/tasks', headers=headers)))
+               for _ in range(readers)]
+    threads += [Thread(target=loop, args=('writes', lambda: client.post('/api/boards/1/tasks/create',
+                                                                         headers=headers, json=task)))
+                for _ in range(writers)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    print(json.dumps({kind: count / elapsed for kind, count in counts.items()}))
+
+
+def main(readers, writers, seconds):
+    for name, overrides in CONFIGURATIONS.items():
+        with TemporaryDirectory() as workdir:
+            env = {**os.environ, **overrides, 'DATABASE_URL': f'sqlite:///{workdir}/tuning.db'}
+            output = subprocess.run([sys.executable, '-m', __spec__.name, 'run', str(readers), str(writers),
+                                     str(seconds)], env=env, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f'{name:>9}: {result["reads"]:8.0f} reads/s {result["writes"]:8.0f} writes/s '
+                  f'{result["errors"]:6.1f} errors/s')
+
+
+if __name__ == '__main__':
+    run = sys.argv[1:2] == ['run']
+    args = [int(arg) for arg in sys.argv[1 + run:]]
+    args += [8, 4, 5][len(args):]
+    (workload if run else main)(*args)
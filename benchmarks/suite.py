@@ -0,0 +1,303 @@
+"""Throughput and latency percentiles of every API endpoint.
+
+    python -m benchmarks.suite [--mode client|server|both] [--users 10] [--boards 5] [--tasks 200]
+                               [--requests 500] [--concurrency 4] [--output results.json]
+                               [--compare baseline.json]
+
+Seeds a scratch database with ``users`` users owning ``boards`` boards of
+``tasks`` tasks each, then sends ``requests`` requests to every endpoint from
+``concurrency`` threads, either through the Flask test client (``client``) or
+over HTTP to a threaded server on a local port (``server``). Destructive
+endpoints run last. Instrumentation is on, as /metrics is one of the
+endpoints. ``--output`` writes the results as JSON; ``--compare``
+prints the change against such a file from an earlier run.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+
+from werkzeug.serving import make_server
+
+from benchmarks import migrated_app
+
+TASK = {'title': 'title', 'description': 'description', 'status': 0}
+
+
+class Seed:
+    """Tokens of the seeded users and the counters handing out targets to destructive endpoints."""
+
+    def __init__(self, tokens, boards, tasks, cursors):
+        self.tokens = tokens
+        self.boards = boards
+        self.tasks = tasks
+        # /api/sync cursor of each user right after seeding.
+        self.cursors = cursors
+        self.counters = {}
+
+    def user(self, n):
+        return self.tokens[n % len(self.tokens)]
+
+    def board(self, n):
+        return n // len(self.tokens) % self.boards + 1
+
+    def next(self, name):
+        """Return the n-th call of ``name``; ``itertools.count`` is safe to share between threads."""
+        return next(self.counters.setdefault(name, itertools.count()))
+
+
+def delete_task(seed, n):
+    n = seed.next('delete task')
+    user, rest = divmod(n, seed.boards * seed.tasks)
+    board, task = divmod(rest, seed.tasks)
+    return 'POST', f'/api/boards/{board + 1}/tasks/{task + 1}/delete', seed.tokens[user % len(seed.tokens)], None
+
+
+def delete_board(seed, n):
+    n = seed.next('delete board')
+    return 'POST', f'/api/boards/{n // len(seed.tokens) + 1}/delete', seed.user(n), None
+
+
+def import_workspace(seed, n):
+    lines = [{'type': 'board', 'id': 1, 'name': f'imported {n}'}]
+    lines += [{'type': 'task', 'id': task, 'board_id': 1, **TASK} for task in range(1, 21)]
+    return 'POST', '/api/import', seed.user(n), ''.join(json.dumps(line) + '\n' for line in lines).encode()
+
+
+# (name, request factory) in run order; a factory maps the seed and a request number
+# to (method, path, token, body[, headers]): a dict body is sent as JSON, bytes as NDJSON.
+ENDPOINTS = [
+    ('signup', lambda seed, n: ('POST', '/api/signup', None, None)),
+    ('list boards', lambda seed, n: ('GET', '/api/boards', seed.user(n), None)),
+    ('list boards page', lambda seed, n: ('GET', '/api/boards?limit=2', seed.user(n), None)),
+    ('get board', lambda seed, n: ('GET', f'/api/boards/{seed.board(n)}', seed.user(n), None)),
+    ('list tasks', lambda seed, n: ('GET', f'/api/boards/{seed.board(n)}/tasks?limit=50', seed.user(n), None)),
+    ('search tasks', lambda seed, n: ('GET', '/api/tasks/search?q=title&limit=20', seed.user(n), None)),
+    ('board stats', lambda seed, n: ('GET', f'/api/boards/{seed.board(n)}/stats', seed.user(n), None)),
+    ('all boards stats', lambda seed, n: ('GET', '/api/boards/stats', seed.user(n), None)),
+    ('sync', lambda seed, n: ('GET', '/api/sync', seed.user(n), None)),
+    # A Last-Event-ID behind the history gets a reset event and the stream ends instead of staying open.
+    ('board events', lambda seed, n: ('GET', f'/api/boards/{seed.board(n)}/events', seed.user(n), None,
+                                      {'Last-Event-ID': '-1'})),
+    ('export', lambda seed, n: ('GET', '/api/export', seed.user(n), None)),
+    ('metrics', lambda seed, n: ('GET', '/metrics', None, None)),
+    ('create board', lambda seed, n: ('POST', '/api/boards/create', seed.user(n), {'name': f'new board {n}'})),
+    ('edit board', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/edit', seed.user(n),
+                                    {'name': f'renamed {n}'})),
+    ('create task', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/tasks/create', seed.user(n), TASK)),
+    ('edit task', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/tasks/{n % seed.tasks + 1}/edit',
+                                   seed.user(n), {'title': f'edited {n}'})),
+    ('move task', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/tasks/{n % seed.tasks + 1}/move',
+                                   seed.user(n), {'after_id': (n + 1) % seed.tasks + 1})),
+    ('batch tasks', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/tasks/batch', seed.user(n),
+                                     {'operations': [{'op': 'create', **TASK}] * 20})),
+    ('sync delta', lambda seed, n: ('GET', f'/api/sync?since={seed.cursors[seed.user(n)]}&limit=100',
+                                    seed.user(n), None)),
+    ('import', import_workspace),
+    ('delete task', delete_task),
+    ('archive tasks', lambda seed, n: ('POST', f'/api/boards/{seed.board(n)}/archive?status=0&older_than=0',
+                                       seed.user(n), None)),
+    ('list archive', lambda seed, n: ('GET', f'/api/boards/{seed.board(n)}/archive?limit=50', seed.user(n), None)),
+    ('delete board', delete_board),
+]
+
+
+def seed_database(app, users, boards, tasks):
+    client = app.test_client()
+    tokens = []
+    for _ in range(users):
+        token = client.post('/api/signup').json['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        for board in range(boards):
+            client.post('/api/boards/create', headers=headers, json={'name': f'board {board}'})
+            for start in range(0, tasks, 1000):
+                operations = [{'op': 'create', **TASK}] * min(1000, tasks - start)
+                client.post(f'/api/boards/{board + 1}/tasks/batch', headers=headers,
+                            json={'operations': operations})
+        tokens.append(token)
+    cursors = {token: client.get('/api/sync', headers={'Authorization': f'Bearer {token}'}).json['cursor']
+               for token in tokens}
+    return Seed(tokens, boards, tasks, cursors)
+
+
+def test_client_sender(app):
+    client = app.test_client()
+
+    def send(method, path, headers, body):
+        response = client.open(path, method=method, headers=headers, data=body)
+        response.close()
+        return response.status_code
+
+    return send
+
+
+def http_sender(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def send(method, path, headers, body):
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            return None
+
+    return send
+
+
+def measure(make_sender, seed, factory, requests, concurrency):
+    latencies, errors = [], []
+
+    def worker(numbers):
+        send = make_sender()
+        for n in numbers:
+            method, path, token, body, *extra = factory(seed, n)
+            headers = {'Authorization': f'Bearer {token}'} if token else {}
+            headers.update(*extra)
+            if isinstance(body, bytes):
+                headers['Content-Type'] = 'application/x-ndjson'
+            elif body is not None:
+                body = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            started = perf_counter()
+            status = send(method, path, headers, body)
+            elapsed = perf_counter() - started
+            (latencies if status == 200 else errors).append(elapsed)
+
+    threads = [Thread(target=worker, args=(range(offset, requests, concurrency),)) for offset in range(concurrency)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    return summarize(latencies, len(errors), elapsed)
+
+
+def percentile(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] * 1000 if values else None
+
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else None,
+        'p50_ms': percentile(latencies, 0.5),
+        'p90_ms': percentile(latencies, 0.9),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+    }
+
+
+def run_mode(mode, args, url):
+    """Seed the empty database at ``url`` and measure every endpoint in ``mode``."""
+    app = migrated_app(SQLALCHEMY_DATABASE_URI=url, INSTRUMENTATION_ENABLED=True)
+    seed = seed_database(app, args.users, args.boards, args.tasks)
+    server = None
+    if mode == 'server':
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        Thread(target=server.serve_forever, daemon=True).start()
+        make_sender = lambda: http_sender(server.server_port)
+    else:
+        make_sender = lambda: test_client_sender(app)
+    results = []
+    try:
+        for name, factory in ENDPOINTS:
+            requests = args.requests
+            if name == 'delete task':
+                requests = min(requests, args.users * args.boards * args.tasks)
+            elif name == 'delete board':
+                requests = min(requests, args.users * args.boards)
+            result = measure(make_sender, seed, factory, requests, args.concurrency)
+            results.append({'mode': mode, 'endpoint': name, **result})
+            print(format_result(results[-1]), flush=True)
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def format_ms(value):
+    return f'{value:8.2f}' if value is not None else f'{"-":>8}'
+
+
+def format_result(result):
+    return (f'{result["mode"]:>6}  {result["endpoint"]:<17}{result["throughput"]:9.0f} req/s'
+            f'  p50 {format_ms(result["p50_ms"])}  p90 {format_ms(result["p90_ms"])}'
+            f'  p99 {format_ms(result["p99_ms"])} ms  {result["errors"]} errors')
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = {(result['mode'], result['endpoint']): result for result in json.load(file)['results']}
+    print(f'\nChange against {baseline_path}:')
+    for result in results:
+        old = baseline.get((result['mode'], result['endpoint']))
+        if old is None or not old['throughput'] or old['p99_ms'] is None or result['p99_ms'] is None:
+            continue
+        print(f'{result["mode"]:>6}  {result["endpoint"]:<17}'
+              f'throughput {result["throughput"] / old["throughput"] - 1:+7.1%}'
+              f'  p99 {result["p99_ms"] / old["p99_ms"] - 1:+7.1%}')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def workload_arguments(parser):
+    """Add the options sizing the seed data and the load to ``parser``."""
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='both')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--boards', type=int, default=5)
+    parser.add_argument('--tasks', type=int, default=200, help='tasks per board')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=4)
+    return parser
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.splitlines()[0])
+    workload_arguments(parser)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    modes = ['client', 'server'] if args.mode == 'both' else [args.mode]
+    results = []
+    with TemporaryDirectory() as workdir:
+        for mode in modes:
+            results += run_mode(mode, args, f'sqlite:///{workdir}/{mode}.db')
+    if args.output:
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+            'results': results,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+"""Reconnect cost: re-downloading every board against /api/sync.
+
+    python -m benchmarks.sync [boards] [tasks per board] [changes]
+
+Seeds ``boards`` boards of ``tasks`` tasks (10 and 1000 by default), takes a
+sync cursor, then makes ``changes`` edits, creates and deletes spread over the
+boards (100 by default) and reconnects both ways: GET /api/boards and then
+GET /api/boards/<id> for each board, as clients did, and a single
+GET /api/sync?since=<cursor>. Reports the bytes and time of each.
+"""
+import os
+import random
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks import migrated_app
+
+BATCH = 1000
+
+
+def seed(client, headers, boards, tasks):
+    board_ids = []
+    for number in range(boards):
+        board_id = client.post('/api/boards/create', headers=headers, json={'name': f'board {number}'}).json['id']
+        for start in range(0, tasks, BATCH):
+            response = client.post(f'/api/boards/{board_id}/tasks/batch', headers=headers, json={'operations': [
+                {'op': 'create', 'title': f'title {index}', 'description': 'description ' * 10,
+                 'status': index % 5} for index in range(start, min(start + BATCH, tasks))]})
+            assert response.status_code == 200, response.status_code
+        board_ids.append(board_id)
+    return board_ids
+
+
+def change(client, headers, board_ids, tasks, changes):
+    random.seed(0)
+    for number in range(changes):
+        board_id, task_id = random.choice(board_ids), random.randint(1, tasks)
+        kind = number % 3
+        if kind == 0:
+            response = client.post(f'/api/boards/{board_id}/tasks/{task_id}/edit', headers=headers,
+                                   json={'title': f'edited {number}'})
+        elif kind == 1:
+            response = client.post(f'/api/boards/{board_id}/tasks/create', headers=headers,
+                                   json={'title': f'new {number}', 'description': 'description', 'status': 0})
+        else:
+            response = client.post(f'/api/boards/{board_id}/tasks/{task_id}/delete', headers=headers)
+        assert response.status_code in (200, 404), response.status_code
+
+
+def full_download(client, headers):
+    size = 0
+    response = client.get('/api/boards', headers=headers)
+    size += len(response.data)
+    for board in response.json:
+        size += len(client.get(f'/api/boards/{board["id"]}', headers=headers).data)
+    return size
+
+
+def delta(client, headers, cursor):
+    size = 0
+    while True:
+        response = client.get(f'/api/sync?since={cursor}', headers=headers)
+        size += len(response.data)
+        cursor = response.json['cursor']
+        if not response.json['more']:
+            return size
+
+
+def timed(function, *args):
+    started = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - started
+
+
+def main(boards, tasks, changes):
+    app = migrated_app()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+    board_ids = seed(client, headers, boards, tasks)
+    cursor = client.get('/api/sync', headers=headers).json['cursor']
+    change(client, headers, board_ids, tasks, changes)
+    for name, function, args in (('full download', full_download, ()), ('sync', delta, (cursor,))):
+        size, seconds = timed(function, client, headers, *args)
+        print(f'{name:>13}: {size / 1024:10.1f} KiB in {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    args += [10, 1000, 100][len(args):]
+    with TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/sync.db'
+        main(*args)
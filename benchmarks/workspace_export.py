@@ -0,0 +1,77 @@
+"""Export and re-import of a large workspace with a ceiling on Python heap use.
+
+    python -m benchmarks.workspace_export [tasks] [ceiling-mb]
+
+Seeds one user with the given number of tasks spread over ten boards, streams
+/api/export to a file and feeds that file to /api/import for a second user,
+tracing allocations during each phase. Fails if either peak exceeds the ceiling.
+"""
+import sys
+import tracemalloc
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks import migrated_app
+from ids import start_sequence
+from models import db, Board, Task, User
+
+BOARDS = 10
+USER = 'exporter'
+
+
+def seed(app, tasks):
+    with app.app_context():
+        db.session.add(User(id=USER))
+        per_board = tasks // BOARDS
+        for board_id in range(1, BOARDS + 1):
+            db.session.add(Board(id=board_id, name=f'board {board_id}', user_id=USER))
+            start_sequence(USER, board_id, last_id=per_board)
+            for start in range(1, per_board + 1, 50_000):
+                db.session.execute(db.insert(Task), [
+                    {'id': i, 'title': f'task {i}', 'description': 'description', 'status': i % 4,
+                     'board_id': board_id, 'board_user_id': USER}
+                    for i in range(start, min(start + 50_000, per_board + 1))])
+        start_sequence(USER, last_id=BOARDS)
+        db.session.commit()
+
+
+def traced(name, ceiling, run):
+    tracemalloc.start()
+    started = perf_counter()
+    result = run()
+    elapsed = perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    print(f'{name}: {elapsed:6.1f} s, peak {peak:6.1f} MB')
+    assert peak < ceiling, f'{name} peaked at {peak:.1f} MB, ceiling is {ceiling} MB'
+    return result
+
+
+def main(tasks, ceiling, workdir):
+    app = migrated_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{workdir}/workspace.db')
+    seed(app, tasks)
+    client = app.test_client()
+    path = f'{workdir}/export.ndjson'
+
+    def export():
+        response = client.get('/api/export', headers={'Authorization': f'Bearer {USER}'}, buffered=False)
+        with open(path, 'wb') as file:
+            for chunk in response.response:
+                file.write(chunk)
+        response.close()
+
+    def import_():
+        token = client.post('/api/signup').json['token']
+        with open(path, 'rb') as file:
+            return client.post('/api/import', headers={'Authorization': f'Bearer {token}'},
+                               input_stream=file, content_type='application/x-ndjson').json
+
+    traced('export', ceiling, export)
+    result = traced('import', ceiling, import_)
+    assert result['tasks'] == tasks // BOARDS * BOARDS, result
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    with TemporaryDirectory() as workdir:
+        main(*(args + [1_000_000, 64][len(args):]), workdir)
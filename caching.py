@@ -0,0 +1,50 @@
+from hashlib import sha256
+
+from flask import current_app, request
+from werkzeug.http import quote_etag
+
+from models import db, Board, User
+
+
+def etag(user_id, *parts):
+    """Strong ETag of one of ``user_id``'s resources.
+
+    Version counters repeat across accounts, so the tag ends in a hash of the
+    user id (which is also the bearer token, hence not the id itself).
+    """
+    owner = sha256(user_id.encode()).hexdigest()[:16]
+    return quote_etag('-'.join(str(part) for part in (*parts, owner)))
+
+
+def cache_headers(tag):
+    """Headers of a response validated by ``tag``: the same URL has other content under another token."""
+    return {'ETag': tag, 'Vary': 'Authorization'}
+
+
+def not_modified(tag):
+    """Return a 304 response when the client's If-None-Match already holds ``tag``, else None."""
+    if request.if_none_match.contains_raw(tag):
+        response = current_app.response_class(status=304)
+        response.headers.update(cache_headers(tag))
+        return response
+    return None
+
+
+def boards_version_query(user_id):
+    return db.select(User.boards_version).where(User.id == user_id)
+
+
+def boards_version(user_id):
+    return db.session.execute(boards_version_query(user_id)).scalar_one()
+
+
+def touch_boards(user_id):
+    """Invalidate the cached board list of a user; call whenever a board is created, renamed or deleted."""
+    db.session.execute(db.update(User).where(User.id == user_id)
+                       .values(boards_version=User.boards_version + 1))
+
+
+def touch_board(user_id, board_id):
+    """Invalidate the cached detail of a board; call whenever one of its tasks changes."""
+    db.session.execute(db.update(Board).where(Board.user_id == user_id, Board.id == board_id)
+                       .values(version=Board.version + 1))
@@ -0,0 +1,240 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic, time
+
+import click
+from flask import Blueprint, abort, current_app, request
+from sqlalchemy import false, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+
+from auth import require_authorization
+from ids import CHANGES, allocate_ids
+from models import db, Board, ChangeLog, IdSequence, Task, User
+from pagination import MAX_LIMIT
+from query_budget import query_budget
+from serialization import TASK_COLUMNS
+from sharding import each_shard
+
+bp = Blueprint('changes', __name__)
+
+# change_log keeps one entry per board and task of a user: the seq of the last
+# transaction that changed it and whether that deleted it. Seqs come from a
+# per-user IdSequence, whose row lock queues the user's writers, so they
+# commit in seq order and a client asking for what is above its cursor misses
+# nothing. Tombstones are kept SYNC_TOMBSTONE_TTL seconds; compact() then
+# drops them and raises the user's sync_horizon past them, and a cursor below
+# the horizon gets the whole workspace again.
+
+# ChangeLog.task_id of the entry for the board itself.
+BOARD = 0
+
+
+def _upsert(statement, entries=None):
+    """Write entries in place of any older ones for the same rows."""
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'board_id', 'task_id'],
+        set_={'seq': statement.excluded.seq, 'deleted': statement.excluded.deleted,
+              'changed_at': statement.excluded.changed_at}), entries)
+    schedule_compaction()
+
+
+def _insert():
+    return (postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert)(ChangeLog)
+
+
+def _log(user_id, keys, deleted):
+    seq, changed_at = allocate_ids(user_id, CHANGES), int(time())
+    _upsert(_insert(), [{'user_id': user_id, 'board_id': board_id, 'task_id': task_id, 'seq': seq,
+                         'deleted': deleted, 'changed_at': changed_at} for board_id, task_id in keys])
+
+
+def log_boards(user_id, board_ids, deleted=False):
+    """Log that boards were created or renamed, or deleted, in the current transaction."""
+    _log(user_id, [(board_id, BOARD) for board_id in board_ids], deleted)
+
+
+def log_tasks(user_id, board_id, task_ids, deleted=False):
+    """Log that tasks of a board were created or changed, or deleted, in the current transaction."""
+    if task_ids:
+        _log(user_id, [(board_id, task_id) for task_id in task_ids], deleted)
+
+
+def log_board_tasks(user_id, board_ids):
+    """Log every task of the given boards as created, in one statement however many there are."""
+    seq = allocate_ids(user_id, CHANGES)
+    _upsert(_insert().from_select(
+        ['user_id', 'board_id', 'task_id', 'seq', 'deleted', 'changed_at'],
+        db.select(Task.board_user_id, Task.board_id, Task.id, literal(seq), false(), literal(int(time())))
+        .where(Task.board_user_id == user_id, Task.board_id.in_(board_ids))))
+
+
+def log_board_deleted(user_id, board_id):
+    """Log a board's deletion; its tasks' entries go, as clients drop the tasks along with the board."""
+    db.session.execute(db.delete(ChangeLog).where(ChangeLog.user_id == user_id, ChangeLog.board_id == board_id,
+                                                  ChangeLog.task_id != BOARD))
+    log_boards(user_id, [board_id], deleted=True)
+
+
+def compact(before):
+    """Drop tombstones logged before ``before``, a unix time, raising their users' sync_horizon; return how many."""
+    expired = (ChangeLog.deleted.is_(True), ChangeLog.changed_at < before, ChangeLog.user_id == User.id)
+    db.session.execute(db.update(User)
+                       .where(db.select(ChangeLog.seq).where(*expired).exists())
+                       .values(sync_horizon=db.select(func.max(ChangeLog.seq)).where(*expired).scalar_subquery())
+                       .execution_options(synchronize_session=False))
+    dropped = db.session.execute(db.delete(ChangeLog)
+                                 .where(ChangeLog.deleted.is_(True), ChangeLog.changed_at < before)
+                                 .execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return dropped
+
+
+def compact_all(ttl):
+    """Compact every shard; return how many tombstones were dropped."""
+    dropped = 0
+    for _ in each_shard():
+        dropped += compact(int(time()) - ttl)
+    return dropped
+
+
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='change-log-compaction')
+_next_compaction = 0.0
+_next_compaction_lock = Lock()
+
+
+def schedule_compaction():
+    """Compact the change log in the background, at most every SYNC_COMPACT_INTERVAL seconds per process."""
+    global _next_compaction
+    app = current_app._get_current_object()
+    with _next_compaction_lock:
+        if monotonic() < _next_compaction:
+            return
+        _next_compaction = monotonic() + app.config['SYNC_COMPACT_INTERVAL']
+
+    def run():
+        with app.app_context():
+            try:
+                compact_all(app.config['SYNC_TOMBSTONE_TTL'])
+            except Exception:
+                app.logger.exception('Could not compact the change log')
+
+    _compactor.submit(run)
+
+
+def init_changes(app):
+    @app.cli.command('compact-changes')
+    def compact_changes_command():
+        """Drop change log tombstones older than SYNC_TOMBSTONE_TTL."""
+        dropped = compact_all(app.config['SYNC_TOMBSTONE_TTL'])
+        click.echo(f'Dropped {dropped} tombstones.')
+
+
+@bp.get('/api/sync')
+@query_budget(5)
+def handle_sync():
+    """Получить изменения досок и задач с прошлой синхронизации
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: since
+        in: query
+        type: integer
+        required: false
+        description: cursor из прошлого ответа; без него приходят все доски и задачи
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: примерное число изменений в ответе, от 1 до 1000; ответ с reset приходит целиком
+    responses:
+      200:
+        description: Изменения после since
+        schema:
+            type: object
+            properties:
+                cursor:
+                    type: integer
+                    description: since для следующего запроса
+                more:
+                    type: boolean
+                    description: есть ли ещё изменения, запросить сразу с новым cursor
+                reset:
+                    type: boolean
+                    description: пришло всё заново, локальную копию нужно заменить
+                boards:
+                    type: array
+                    description: созданные и изменённые доски, без задач
+                tasks:
+                    type: array
+                    description: созданные и изменённые задания
+                deleted:
+                    type: object
+                    properties:
+                        boards:
+                            type: array
+                            items:
+                                type: integer
+                        tasks:
+                            type: array
+                            description: объекты с board_id и id
+      401:
+        description: Неправильный токен
+      400:
+        description: Некорректный since или limit
+    """
+    user_id = require_authorization()
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', MAX_LIMIT))
+    except ValueError:
+        abort(400, description='Bad since or limit')
+    if since < 0 or not 0 < limit <= MAX_LIMIT:
+        abort(400, description=f'since must not be negative and limit must be between 1 and {MAX_LIMIT}')
+    # Read before the entries, so a cursor never runs ahead of what was sent.
+    horizon, last_seq = db.session.execute(
+        db.select(User.sync_horizon, IdSequence.last_id)
+        .outerjoin(IdSequence, (IdSequence.user_id == User.id) & (IdSequence.board_id == CHANGES))
+        .where(User.id == user_id)).one()
+    # A full answer is not paged: its cursors would fall below the horizon.
+    reset = since == 0 or since < horizon
+    window = [ChangeLog.user_id == user_id]
+    cursor, bounds = last_seq or 0, []
+    if reset:
+        window.append(ChangeLog.deleted.is_(False))
+    else:
+        window.append(ChangeLog.seq > since)
+        bounds = db.session.execute(db.select(ChangeLog.seq).where(*window)
+                                    .order_by(ChangeLog.seq).offset(limit - 1).limit(2)).scalars().all()
+        cursor = max(cursor, since)
+        if bounds:
+            window.append(ChangeLog.seq <= bounds[0])
+            cursor = bounds[0]
+
+    boards, tasks, deleted_boards, deleted_tasks = [], [], [], []
+    for board_id, deleted, name, purging in db.session.execute(
+            db.select(ChangeLog.board_id, ChangeLog.deleted, Board.name, Board.deleted)
+            .outerjoin(Board, (Board.user_id == ChangeLog.user_id) & (Board.id == ChangeLog.board_id))
+            .where(*window, ChangeLog.task_id == BOARD).order_by(ChangeLog.seq, ChangeLog.board_id)):
+        if deleted or name is None or purging:
+            if not reset:
+                deleted_boards.append(board_id)
+        else:
+            boards.append({'id': board_id, 'name': name, 'user_id': user_id})
+    for row in db.session.execute(
+            db.select(ChangeLog.board_id.label('change_board_id'), ChangeLog.task_id, ChangeLog.deleted.label('gone'),
+                      *TASK_COLUMNS)
+            .outerjoin(Task, (Task.board_user_id == ChangeLog.user_id) & (Task.board_id == ChangeLog.board_id)
+                       & (Task.id == ChangeLog.task_id))
+            .where(*window, ChangeLog.task_id != BOARD)
+            .order_by(ChangeLog.seq, ChangeLog.board_id, ChangeLog.task_id)):
+        if row.gone or row.id is None:
+            if not reset:
+                deleted_tasks.append({'board_id': row.change_board_id, 'id': row.task_id})
+        else:
+            tasks.append({column.key: getattr(row, column.key) for column in TASK_COLUMNS})
+    return {'cursor': cursor, 'more': len(bounds) == 2, 'reset': reset, 'boards': boards, 'tasks': tasks,
+            'deleted': {'boards': deleted_boards, 'tasks': deleted_tasks}}
@@ -0,0 +1,154 @@
+import os
+
+# Defaults for app.config; any key can be overridden with a FLASK_-prefixed
+# environment variable holding a JSON value, e.g.
+# FLASK_SQLALCHEMY_ENGINE_OPTIONS__pool_size=20 or FLASK_SQLITE_PRAGMAS='{}'.
+
+# SQLite or PostgreSQL, e.g. postgresql://kanban@db.internal/kanban; a
+# postgresql:// URL uses psycopg 3 from requirements-postgres.txt.
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///project.db')
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_pre_ping': False,
+}
+
+# Added to SQLALCHEMY_ENGINE_OPTIONS on PostgreSQL. They are safe behind
+# pgbouncer in transaction pooling mode: psycopg does not prepare statements
+# on the server, and pooled connections are recycled before the bouncer's
+# idle timeout. Without a bouncer, keep pool_size * workers below
+# max_connections.
+POSTGRES_ENGINE_OPTIONS = {
+    'pool_recycle': 300,
+    'pool_pre_ping': True,
+    'connect_args': {'prepare_threshold': None},
+}
+
+# Per-user sharding, off while empty: a list of database URLs, e.g.
+# ['sqlite:///shard0.db', 'sqlite:///shard1.db']. Each user's data lives in
+# one of them, picked by hashing the bearer token, so users on different shards
+# do not wait on each other's write lock. SQLALCHEMY_DATABASE_URI keeps the
+# shard map, which places users elsewhere after flask shards move; processes
+# route by a copy of it at most SHARD_MAP_TTL seconds old. After changing
+# SHARDS, run flask shards rebalance before serving.
+SHARDS = []
+SHARD_MAP_TTL = 2.0
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and synchronous=NORMAL is durable in WAL mode except for the
+# last transactions before a power loss. foreign_keys is on unless set here.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# flasgger is slow to import and serves /apidocs; production workers can
+# start without it.
+SWAGGER_ENABLED = True
+
+# Flask JSON provider used for responses; serialization.FastJSONProvider uses
+# orjson when it is installed.
+JSON_PROVIDER = 'serialization.FastJSONProvider'
+
+# Pub/sub backend for the board change feed. MemoryBroker only reaches
+# subscribers in the same process; with several workers use a shared backend,
+# e.g. EVENTS_BROKER = 'events.SQLiteBroker' and
+# EVENTS_BROKER_OPTIONS = {'path': '/var/lib/kanban/events.db'}. MemoryBroker
+# keeps the channels of the max_channels (10000) most recently changed boards.
+EVENTS_BROKER = 'events.MemoryBroker'
+EVENTS_BROKER_OPTIONS = {}
+
+# Opt-in request instrumentation: per-endpoint timings of the auth, sql,
+# serialization and commit phases, served at /metrics in the Prometheus text
+# format and per request in a Server-Timing header. Each worker process keeps
+# its own figures.
+INSTRUMENTATION_ENABLED = False
+# Share of instrumented requests run under cProfile, at most one at a time per
+# process; a profile is kept in PROFILE_DIR (instance/profiles by default)
+# when its request took at least PROFILE_SLOW_REQUEST seconds. Open it with
+# python -m pstats or snakeviz. Work done on the group-commit writer thread is
+# not in the profiles.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SLOW_REQUEST = 0.5
+PROFILE_DIR = None
+
+# Token-bucket rate limits per client, keyed by bearer token or, without one,
+# by address. A policy lets a client make ``burst`` requests at once and then
+# ``rate`` per second; views pick one with ratelimit.rate_limit, otherwise
+# 'read' applies to GET and 'write' to everything else. MemoryLimiter counts
+# per worker process; RATE_LIMITER = 'ratelimit.SQLiteLimiter' with
+# RATE_LIMITER_OPTIONS = {'path': '/var/lib/kanban/limits.db'} shares the
+# buckets between workers.
+RATE_LIMIT_ENABLED = True
+RATE_LIMITER = 'ratelimit.MemoryLimiter'
+RATE_LIMITER_OPTIONS = {}
+RATE_LIMITS = {
+    'signup': {'rate': 0.2, 'burst': 20},
+    'read': {'rate': 50, 'burst': 200},
+    'write': {'rate': 20, 'burst': 50},
+}
+# Write requests handled at once per worker; one that waits longer than
+# WRITE_QUEUE_TIMEOUT seconds for a slot gets 503.
+WRITE_CONCURRENCY = 8
+WRITE_QUEUE_TIMEOUT = 0.5
+
+# A POST carrying an Idempotency-Key header that repeats an earlier one from
+# the same client gets the earlier response again and runs nothing, so clients
+# can retry writes after a timeout. MemoryStore recognises repeats per worker
+# process; IDEMPOTENCY_STORE = 'idempotency.SQLiteStore' with
+# IDEMPOTENCY_STORE_OPTIONS = {'path': '/var/lib/kanban/idempotency.db'}
+# shares the responses between workers. Both keep a response for a day by
+# default, set with the 'ttl' option.
+IDEMPOTENCY_ENABLED = True
+IDEMPOTENCY_STORE = 'idempotency.MemoryStore'
+IDEMPOTENCY_STORE_OPTIONS = {}
+
+# Opt-in group commit: write requests run on one writer thread per worker,
+# which commits every batch of them in a single transaction, so a burst of
+# writes pays for one fsync instead of one each. A batch takes what queued
+# while the previous one committed plus what arrives within
+# GROUP_COMMIT_WINDOW seconds, up to GROUP_COMMIT_MAX_BATCH requests; raise
+# WRITE_CONCURRENCY to let bigger batches form. Statements run on the writer
+# are not counted in the request's query budget or sql timing.
+GROUP_COMMIT_ENABLED = False
+GROUP_COMMIT_WINDOW = 0.002
+GROUP_COMMIT_MAX_BATCH = 64
+
+# Boards deleted with ?background=1 disappear at once and their tasks are
+# removed by a background thread, PURGE_CHUNK per transaction with a pause of
+# PURGE_PAUSE seconds between transactions so other writers get their turn.
+# A purge cut short by a restart resumes with the next background delete or
+# with flask purge-boards.
+PURGE_CHUNK = 500
+PURGE_PAUSE = 0.02
+
+# /api/import commits every few thousand tasks, so other writers are not held
+# up for the whole import, and keeps the boards it creates hidden until its
+# last commit. Boards of an import that committed nothing for IMPORT_TIMEOUT
+# seconds, cut short by a restart say, are purged like deleted ones.
+IMPORT_TIMEOUT = 3600
+
+# Tasks left in ARCHIVE_STATUS, the one clients use for done, and unchanged
+# for ARCHIVE_AFTER seconds move to archived_task, out of board loads, search
+# and stats; GET /api/boards/<id>/archive lists them. Archiving runs with
+# flask archive-tasks (from cron, say) and POST /api/boards/<id>/archive,
+# ARCHIVE_CHUNK tasks per transaction with ARCHIVE_PAUSE seconds between
+# them; while ARCHIVE_STATUS is None both need a status given.
+ARCHIVE_STATUS = None
+ARCHIVE_AFTER = 14 * 24 * 3600
+ARCHIVE_CHUNK = 500
+ARCHIVE_PAUSE = 0.02
+
+# /api/sync answers from change_log, which holds one entry per board and task
+# and a tombstone per deleted one. Tombstones are dropped once
+# SYNC_TOMBSTONE_TTL seconds old, by a background thread at most every
+# SYNC_COMPACT_INTERVAL seconds per worker or by flask compact-changes; a
+# client that has not synced since then gets its whole workspace again.
+SYNC_TOMBSTONE_TTL = 30 * 24 * 3600
+SYNC_COMPACT_INTERVAL = 3600
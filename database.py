@@ -0,0 +1,42 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+from sharding import shard_key
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA name = value`` for every item of ``pragmas`` on each new connection of ``engine``."""
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def engine_url(url):
+    """Return ``url`` with psycopg 3 as the driver of a bare postgresql:// URL."""
+    url = make_url(url)
+    if url.drivername == 'postgresql':
+        # psycopg 3 is the one driver used for both the sync and the async engine.
+        url = url.set(drivername='postgresql+psycopg')
+    return url.render_as_string(hide_password=False)
+
+
+def init_database(app):
+    """Bind ``db`` to the app, with an engine per shard in SHARDS, and configure them for the backend in use."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = engine_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}),
+                                      **{shard_key(index): engine_url(url)
+                                         for index, url in enumerate(app.config['SHARDS'])}}
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'postgresql':
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+                                                   **app.config['POSTGRES_ENGINE_OPTIONS']}
+    db.init_app(app)
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            # Deleting a board relies on the foreign key to cascade to its tasks.
+            apply_sqlite_pragmas(engine, {'foreign_keys': 'ON', **app.config.get('SQLITE_PRAGMAS', {})})
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+from collections import OrderedDict, deque, namedtuple
+from threading import Condition, local
+from time import monotonic, sleep
+
+from flask import Blueprint, current_app, request
+from werkzeug.utils import import_string
+
+from auth import require_authorization
+from group_commit import after_commit
+from models import db
+from purge import board_or_404
+
+Event = namedtuple('Event', 'id kind data')
+
+bp = Blueprint('events', __name__)
+
+
+class MemoryBroker:
+    """In-process broker keeping the last ``history`` events of every channel.
+
+    Only subscribers in the same process see the events, so it suits a single
+    worker. Past ``max_channels`` the channel published to longest ago is
+    dropped; a subscriber that may have missed its events gets a reset, as
+    after a pruned history.
+    """
+
+    def __init__(self, history=256, max_channels=10_000):
+        self.history = history
+        self.max_channels = max_channels
+        self._channels: OrderedDict[str, deque] = OrderedDict()
+        # Newest event id each channel has lost; channels created later start at _forgotten.
+        self._evicted = {}
+        self._forgotten = 0
+        self._last_id = 0
+        self._changed = Condition()
+
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, channel, events):
+        with self._changed:
+            queue = self._channels.get(channel)
+            if queue is None:
+                queue = self._channels[channel] = deque()
+                self._evicted[channel] = self._forgotten
+            self._channels.move_to_end(channel)
+            for kind, data in events:
+                self._last_id += 1
+                queue.append(Event(self._last_id, kind, data))
+                if len(queue) > self.history:
+                    self._evicted[channel] = queue.popleft().id
+            while len(self._channels) > self.max_channels:
+                dropped, queue = self._channels.popitem(last=False)
+                lost = self._evicted.pop(dropped)
+                self._forgotten = max(self._forgotten, queue[-1].id if queue else lost)
+            self._changed.notify_all()
+
+    def read(self, channel, after, timeout):
+        """Wait up to ``timeout`` seconds for events newer than ``after``.
+
+        Returns None when some of them were already dropped from the history.
+        """
+        deadline = monotonic() + timeout
+        with self._changed:
+            while True:
+                if self._evicted.get(channel, self._forgotten) > after:
+                    return None
+                events = [event for event in self._channels.get(channel, ()) if event.id > after]
+                remaining = deadline - monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._changed.wait(remaining)
+
+
+class SQLiteBroker:
+    """Broker backed by a shared SQLite file, a local stand-in for a network pub/sub.
+
+    Every worker pointing at the same ``path`` sees every event; subscribers poll
+    for new rows every ``poll_interval`` seconds. Only the newest ``history``
+    events are kept.
+    """
+
+    def __init__(self, path, history=10_000, poll_interval=0.2):
+        self.path = path
+        self.history = history
+        self.poll_interval = poll_interval
+        self._local = local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS event ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+                               'kind TEXT NOT NULL, data TEXT NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_event_channel_id ON event (channel, id)')
+
+    def _connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection.execute('PRAGMA journal_mode = WAL')
+        return self._local.connection
+
+    def last_id(self):
+        return self._connection().execute('SELECT coalesce(max(id), 0) FROM event').fetchone()[0]
+
+    def publish(self, channel, events):
+        with self._connection() as connection:
+            connection.executemany('INSERT INTO event (channel, kind, data) VALUES (?, ?, ?)',
+                                   [(channel, kind, json.dumps(data)) for kind, data in events])
+            connection.execute('DELETE FROM event WHERE id <= (SELECT max(id) FROM event) - ?', (self.history,))
+
+    def read(self, channel, after, timeout):
+        deadline = monotonic() + timeout
+        connection = self._connection()
+        while True:
+            # Ids are contiguous, so a gap right after ``after`` means pruned events.
+            oldest = connection.execute('SELECT min(id) FROM event').fetchone()[0]
+            if oldest is not None and oldest > after + 1:
+                return None
+            rows = connection.execute('SELECT id, kind, data FROM event WHERE channel = ? AND id > ? ORDER BY id',
+                                      (channel, after)).fetchall()
+            if rows or monotonic() >= deadline:
+                return [Event(id, kind, json.loads(data)) for id, kind, data in rows]
+            sleep(self.poll_interval)
+
+
+def init_events(app):
+    broker_class = import_string(app.config['EVENTS_BROKER'])
+    app.extensions['events'] = broker_class(**app.config['EVENTS_BROKER_OPTIONS'])
+
+
+def board_channel(user_id, board_id):
+    return f'{user_id}/{board_id}'
+
+
+def publish(user_id, board_id, *events):
+    """Publish ``(kind, data)`` deltas of a board; call after commit(), they go out once it is durable.
+
+    A broker failure is logged rather than turned into an error response.
+    """
+    after_commit(_publish, user_id, board_id, events)
+
+
+def _publish(user_id, board_id, events):
+    try:
+        current_app.extensions['events'].publish(board_channel(user_id, board_id), events)
+    except Exception:
+        current_app.logger.exception('Could not publish events of board %s', board_id)
+
+
+def sse_stream(broker, channel, after, dumps, keepalive=15.0):
+    """Yield server-sent events of ``channel`` after id ``after`` until the board is deleted."""
+    yield 'retry: 3000\n\n'
+    while True:
+        events = broker.read(channel, after, keepalive)
+        if events is None:
+            yield f'id: {broker.last_id()}\nevent: reset\ndata: {{}}\n\n'
+            return
+        if not events:
+            yield ': keepalive\n\n'
+        for event in events:
+            yield f'id: {event.id}\nevent: {event.kind}\ndata: {dumps(event.data)}\n\n'
+            after = event.id
+            if event.kind == 'board.deleted':
+                return
+
+
+@bp.get('/api/boards/<int:board_id>/events')
+def handle_board_events(board_id):
+    """Поток изменений доски (Server-Sent Events)
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        description: id последнего полученного события, чтобы продолжить с него
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: >
+            События task.created, task.updated, task.deleted, task.archived (data — задание или {"id"}),
+            board.updated, board.deleted (data — доска без задач).
+            Событие reset означает, что часть событий потеряна и доску нужно загрузить заново
+      401:
+        description: Неправильный токен
+      404:
+        description: Доски не существует
+    """
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
+    db.session.close()
+    broker = current_app.extensions['events']
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = broker.last_id()
+    stream = sse_stream(broker, board_channel(user_id, board_id), after, current_app.json.dumps)
+    return current_app.response_class(stream, mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
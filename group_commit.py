@@ -0,0 +1,137 @@
+from concurrent.futures import Future
+from functools import wraps
+from queue import Empty, SimpleQueue
+from threading import Thread, local
+from time import monotonic
+
+from flask import copy_current_request_context, current_app, g
+
+from models import db
+
+# Set in the writer thread while it runs one request of a batch.
+_batch = local()
+
+
+def commit():
+    """Commit the request's changes.
+
+    Inside a group-commit batch the changes are only flushed; the writer
+    commits them together with the rest of the batch.
+    """
+    if getattr(_batch, 'callbacks', None) is None:
+        db.session.commit()
+    else:
+        db.session.flush()
+
+
+def after_commit(callback, *args):
+    """Call ``callback(*args)`` once the request's changes are committed, right away outside a batch."""
+    callbacks = getattr(_batch, 'callbacks', None)
+    if callbacks is None:
+        callback(*args)
+    else:
+        callbacks.append((callback, args))
+
+
+class GroupCommitWriter:
+    """Single thread running write requests, committing each batch of them in one transaction.
+
+    A batch is whatever was queued while the previous one committed, plus what
+    arrives within ``window`` seconds of its first request, up to
+    ``max_batch`` requests. Every request runs under its own savepoint, so one
+    that fails is rolled back alone. With SHARDS each shard has its own writer.
+    """
+
+    def __init__(self, app, window=0.002, max_batch=64, shard=None):
+        self.app = app
+        self.shard = shard
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = self.requests = 0
+        self._queue = SimpleQueue()
+        self._thread = Thread(target=self._run, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        """Queue ``job`` and return a future of its (result, after-commit callbacks)."""
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - monotonic())))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self.batches += 1
+            self.requests += len(batch)
+            with self.app.app_context():
+                g.shard = self.shard
+                try:
+                    self._write(batch)
+                except Exception as exc:
+                    self.app.logger.exception('Group commit of %s requests failed', len(batch))
+                    for job, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+
+    def _write(self, batch):
+        if db.engine.dialect.name == 'sqlite':
+            # Take the write lock up front; a SAVEPOINT opening the transaction
+            # would make the first RELEASE a COMMIT.
+            db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+        done = []
+        for job, future in batch:
+            # Every request starts with an empty identity map, as it would with a
+            # session of its own: set-based statements, such as delete_board()'s,
+            # leave objects an earlier request loaded looking alive.
+            db.session.expunge_all()
+            _batch.callbacks = []
+            try:
+                with db.session.begin_nested():
+                    result = job()
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                done.append((future, (result, _batch.callbacks)))
+            finally:
+                _batch.callbacks = None
+        db.session.commit()
+        for future, result in done:
+            future.set_result(result)
+
+
+def group_commit(view):
+    """Run a write view on the group-commit writer when GROUP_COMMIT_ENABLED is set.
+
+    The view commits with commit() and defers side effects that need its
+    changes committed with after_commit(). With SHARDS, a request not yet
+    routed to a shard, such as signup, commits on its own.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        writer = current_app.extensions.get('group_commit', {}).get(g.get('shard'))
+        if writer is None:
+            return view(*args, **kwargs)
+        job = copy_current_request_context(lambda: view(*args, **kwargs))
+        result, callbacks = writer.submit(job).result()
+        for callback, callback_args in callbacks:
+            callback(*callback_args)
+        return result
+    return wrapper
+
+
+def init_group_commit(app):
+    if app.config['GROUP_COMMIT_ENABLED']:
+        shards = app.extensions.get('shards')
+        app.extensions['group_commit'] = {
+            shard: GroupCommitWriter(app, app.config['GROUP_COMMIT_WINDOW'], app.config['GROUP_COMMIT_MAX_BATCH'], shard)
+            for shard in (shards.engines if shards is not None else [None])}
@@ -0,0 +1,179 @@
+import sqlite3
+from collections import OrderedDict, namedtuple
+from hashlib import sha256
+from threading import Lock, local
+from time import time
+
+from flask import current_app, g, request
+from werkzeug.exceptions import BadRequest, Conflict, UnprocessableEntity
+from werkzeug.utils import import_string
+
+from ratelimit import client_key
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Answers a retry may get differently: a concurrent move, a rate limit.
+UNKEPT_STATUSES = (409, 429)
+
+# status is None while the first request with the key is still running.
+Kept = namedtuple('Kept', 'fingerprint status content_type body')
+
+
+class MemoryStore:
+    """Responses of one process, the ``maxsize`` most recent kept for ``ttl`` seconds.
+
+    Only repeats reaching the same worker are recognised, so it suits a single worker.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=24 * 3600, running_ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.running_ttl = running_ttl
+        self._entries: OrderedDict[str, tuple[Kept, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def begin(self, key, fingerprint):
+        """Return what is kept for ``key``, or None after claiming it for a request about to run."""
+        now = time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            self._entries[key] = (Kept(fingerprint, None, None, None), now + self.running_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return None
+
+    def finish(self, key, kept):
+        with self._lock:
+            self._entries[key] = (kept, time() + self.ttl)
+
+    def release(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore:
+    """Responses in a shared SQLite file, a local stand-in for a network store.
+
+    Every worker pointing at the same ``path`` recognises the same keys. The
+    file is apart from the app's database, so a repeat never waits on its
+    write lock. Rows past ``ttl`` seconds, or beyond the ``maxsize`` newest,
+    are deleted every ``prune_every`` requests.
+    """
+
+    def __init__(self, path, maxsize=1_000_000, ttl=24 * 3600, running_ttl=60, prune_every=1000):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.running_ttl = running_ttl
+        self.prune_every = prune_every
+        self._local = local()
+        self._connection().execute('CREATE TABLE IF NOT EXISTS response ('
+                                   'key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status INTEGER, '
+                                   'content_type TEXT, body BLOB, expires REAL NOT NULL)')
+        self._connection().execute('CREATE INDEX IF NOT EXISTS ix_response_expires ON response (expires)')
+
+    def _connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection.execute('PRAGMA journal_mode = WAL')
+            self._local.begins = 0
+        return self._local.connection
+
+    def begin(self, key, fingerprint):
+        connection = self._connection()
+        now = time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT fingerprint, status, content_type, body FROM response '
+                                     'WHERE key = ? AND expires > ?', (key, now)).fetchone()
+            if row is None:
+                connection.execute('INSERT OR REPLACE INTO response (key, fingerprint, expires) VALUES (?, ?, ?)',
+                                   (key, fingerprint, now + self.running_ttl))
+            self._local.begins += 1
+            if self._local.begins % self.prune_every == 0:
+                connection.execute('DELETE FROM response WHERE expires <= ?', (now,))
+                connection.execute('DELETE FROM response WHERE key IN (SELECT key FROM response '
+                                   'ORDER BY expires DESC LIMIT -1 OFFSET ?)', (self.maxsize,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return Kept(*row) if row is not None else None
+
+    def finish(self, key, kept):
+        self._connection().execute(
+            'UPDATE response SET status = ?, content_type = ?, body = ?, expires = ? WHERE key = ?',
+            (kept.status, kept.content_type, kept.body, time() + self.ttl, key))
+
+    def release(self, key):
+        self._connection().execute('DELETE FROM response WHERE key = ? AND status IS NULL', (key,))
+
+
+def fingerprint():
+    """Hash of what makes a request the same request again.
+
+    Streamed bodies (an NDJSON import) are left out, as reading them here
+    would leave nothing for the view.
+    """
+    digest = sha256(f'{request.method} {request.full_path}'.encode())
+    if request.is_json or request.mimetype == 'application/x-www-form-urlencoded':
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def init_idempotency(app):
+    """Answer a repeated POST carrying the Idempotency-Key of an earlier one with that one's response.
+
+    The first response to a key is kept unless a retry could be answered
+    otherwise (UNKEPT_STATUSES and 5xx). A repeat arriving while the first
+    request still runs gets 409, one with a different method, path or body
+    422. Call before init_rate_limit(), so that repeats take no write slot.
+    """
+    if not app.config['IDEMPOTENCY_ENABLED']:
+        return
+    store = import_string(app.config['IDEMPOTENCY_STORE'])(**app.config['IDEMPOTENCY_STORE_OPTIONS'])
+    app.extensions['idempotency'] = store
+
+    @app.before_request
+    def replay_response():
+        key = request.headers.get(HEADER)
+        if key is None or request.method != 'POST' or request.endpoint is None:
+            return
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            raise BadRequest(description=f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters')
+        key, request_fingerprint = f'{client_key()}:{key}', fingerprint()
+        kept = store.begin(key, request_fingerprint)
+        if kept is None:
+            g.idempotency_key = (key, request_fingerprint)
+            return
+        if kept.fingerprint != request_fingerprint:
+            raise UnprocessableEntity(description=f'{HEADER} was used for a different request')
+        if kept.status is None:
+            raise Conflict(description=f'A request with this {HEADER} is in progress')
+        response = current_app.response_class(kept.body, kept.status, content_type=kept.content_type)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    @app.after_request
+    def keep_response(response):
+        pending = g.pop('idempotency_key', None)
+        if pending is not None:
+            key, request_fingerprint = pending
+            # Errors from abort() count as streamed too, but their bodies are small.
+            streamed = response.is_streamed and response.status_code < 400
+            if response.status_code >= 500 or response.status_code in UNKEPT_STATUSES or streamed:
+                store.release(key)
+            else:
+                store.finish(key, Kept(request_fingerprint, response.status_code, response.content_type,
+                                       response.get_data()))
+        return response
+
+    @app.teardown_request
+    def release_key(exc):
+        # Reached with the key still claimed only when no response was made.
+        pending = g.pop('idempotency_key', None)
+        if pending is not None:
+            store.release(pending[0])
@@ -0,0 +1,59 @@
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Board, ChangeLog, Task, IdSequence
+
+# IdSequence.board_id of the per-user sequence that numbers boards; task
+# sequences use the id of the board they number.
+BOARDS = 0
+# IdSequence.board_id of the per-user sequence that numbers change_log
+# entries, see changes.py.
+CHANGES = -1
+
+
+def _current_max(user_id, board_id):
+    if board_id == BOARDS:
+        query = db.select(func.max(Board.id)).where(Board.user_id == user_id)
+    elif board_id == CHANGES:
+        query = db.select(func.max(ChangeLog.seq)).where(ChangeLog.user_id == user_id)
+    else:
+        query = db.select(func.max(Task.id)).where(Task.board_user_id == user_id, Task.board_id == board_id)
+    return db.session.execute(query).scalar() or 0
+
+
+def allocate_ids(user_id, board_id=BOARDS, count=1) -> int:
+    """Reserve ``count`` consecutive ids and return the first one.
+
+    The counter row is bumped with a single UPDATE in the caller's transaction,
+    so its row lock (the database write lock on SQLite) serialises concurrent
+    allocations of the same sequence and the reserved ids are released again
+    if the transaction rolls back.
+    """
+    key = (IdSequence.user_id == user_id) & (IdSequence.board_id == board_id)
+    last = db.session.execute(
+        db.update(IdSequence).where(key)
+        .values(last_id=IdSequence.last_id + count)
+        .returning(IdSequence.last_id)
+    ).scalar()
+    if last is None:
+        # Sequences created before this table existed start after the ids in use.
+        insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+        last = db.session.execute(
+            insert(IdSequence)
+            .values(user_id=user_id, board_id=board_id, last_id=_current_max(user_id, board_id) + count)
+            .on_conflict_do_update(index_elements=['user_id', 'board_id'],
+                                   set_={'last_id': IdSequence.last_id + count})
+            .returning(IdSequence.last_id)
+        ).scalar_one()
+    return last - count + 1
+
+
+def start_sequence(user_id, board_id=BOARDS, last_id=0):
+    # Executed right away rather than added to the session: the pending user
+    # it references is flushed first, which the unit of work would not order.
+    db.session.execute(db.insert(IdSequence).values(user_id=user_id, board_id=board_id, last_id=last_id))
+
+
+def drop_sequence(user_id, board_id):
+    db.session.execute(db.delete(IdSequence).where(IdSequence.user_id == user_id,
+                                                  IdSequence.board_id == board_id))
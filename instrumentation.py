@@ -0,0 +1,237 @@
+import cProfile
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from random import random
+from threading import Lock
+from time import perf_counter, strftime
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+PHASES = ('auth', 'sql', 'serialization', 'commit')
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Held while a sampled request runs under cProfile: from Python 3.12 only one
+# profiler can be active per process, and on older ones overlapping profiles
+# would only blur each other.
+_profiling = Lock()
+
+METRICS_HELP = {
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time from routing to the response being built.'),
+    'http_request_phase_seconds': ('histogram', 'Time spent in one phase of a request; sql overlaps the others.'),
+    'http_request_sql_statements': ('histogram', 'SQL statements executed per request.'),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket', (*labels, ('le', str(bound))), cumulative
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, cumulative
+
+
+class Metrics:
+    """Counters and histograms of one process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = defaultdict(int)
+        self._histograms = {}
+
+    def increment(self, name, labels):
+        with self._lock:
+            self._counters[name, labels] += 1
+
+    def observe(self, name, labels, value, buckets=SECONDS_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[name, labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self):
+        samples = defaultdict(list)
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                samples[name].append((name, labels, value))
+            for (name, labels), histogram in self._histograms.items():
+                samples[name].extend(histogram.samples(name, labels))
+        lines = []
+        for name in sorted(samples):
+            kind, description = METRICS_HELP[name]
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            for sample, labels, value in samples[name]:
+                rendered = ','.join(f'{key}="{escape_label(label)}"' for key, label in labels)
+                lines.append(f'{sample}{{{rendered}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _instrumented():
+    return has_request_context() and g.get('phases') is not None
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to phase ``name`` of the current request.
+
+    Does nothing when the request is not instrumented or is already inside ``name``.
+    """
+    if not _instrumented() or name in g.active_phases:
+        yield
+        return
+    g.active_phases.add(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        g.phases[name] += perf_counter() - started
+        g.active_phases.discard(name)
+
+
+def timed(name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+# The start time lives on the statement's execution context: a statement that
+# fails never reaches after_cursor_execute and leaves nothing behind.
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.statement_started = perf_counter()
+
+
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'statement_started', None)
+    if started is not None and _instrumented():
+        g.phases['sql'] += perf_counter() - started
+
+
+def _start_commit(session):
+    if _instrumented():
+        g.commit_started = perf_counter()
+
+
+def _end_commit(session):
+    if _instrumented() and g.get('commit_started') is not None:
+        g.phases['commit'] += perf_counter() - g.pop('commit_started')
+
+
+def _listen():
+    if event.contains(Engine, 'before_cursor_execute', _start_statement):
+        return
+    event.listen(Engine, 'before_cursor_execute', _start_statement)
+    event.listen(Engine, 'after_cursor_execute', _end_statement)
+    event.listen(Session, 'before_commit', _start_commit)
+    event.listen(Session, 'after_commit', _end_commit)
+    event.listen(Session, 'after_rollback', _end_commit)
+
+
+def init_instrumentation(app):
+    """Time every request by phase and serve the figures at /metrics when INSTRUMENTATION_ENABLED is set.
+
+    Call before the other init_ hooks, so that requests they answer early,
+    such as 429s and 503s, are counted too. A PROFILE_SAMPLE_RATE share of
+    requests also runs under cProfile, one at a time; a request sampled while
+    another is being profiled is not. The profile is written to PROFILE_DIR
+    when the request took at least PROFILE_SLOW_REQUEST seconds. A view run by
+    the group-commit writer executes on that thread, so its profile shows the
+    request waiting for the writer rather than the view's own work.
+    """
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+    _listen()
+    metrics = app.extensions['metrics'] = Metrics()
+    for method in ('response', 'dumps', 'dumpb'):
+        if hasattr(app.json, method):
+            setattr(app.json, method, timed('serialization', getattr(app.json, method)))
+    profile_dir = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+
+    @app.before_request
+    def start_instrumentation():
+        g.phases = dict.fromkeys(PHASES, 0.0)
+        g.active_phases = set()
+        g.request_started = perf_counter()
+        if random() < current_app.config['PROFILE_SAMPLE_RATE'] and _profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler, not one of ours, is active in this process.
+                _profiling.release()
+                return
+            g.profiler = profiler
+
+    @app.after_request
+    def record_instrumentation(response):
+        if g.get('phases') is None:
+            return response
+        elapsed = perf_counter() - g.request_started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.increment('http_requests_total',
+                          (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+        metrics.observe('http_request_duration_seconds', (('endpoint', endpoint), ('method', request.method)), elapsed)
+        for name, seconds in g.phases.items():
+            metrics.observe('http_request_phase_seconds', (('endpoint', endpoint), ('phase', name)), seconds)
+        metrics.observe('http_request_sql_statements', (('endpoint', endpoint),), g.get('query_count', 0),
+                        COUNT_BUCKETS)
+        response.headers['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.2f}' for name, seconds in (*g.phases.items(), ('total', elapsed)))
+        g.phases = None
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # Here rather than in after_request, which a request that raised may never reach.
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+        finally:
+            _profiling.release()
+        elapsed = perf_counter() - g.request_started
+        if elapsed >= current_app.config['PROFILE_SLOW_REQUEST']:
+            name = f'{strftime("%Y%m%d-%H%M%S")}-{request.endpoint or "unmatched"}-{elapsed * 1000:.0f}ms.prof'
+            try:
+                os.makedirs(profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(profile_dir, name))
+            except OSError:
+                current_app.logger.exception('Could not write profile %s', name)
+
+    @app.get('/metrics')
+    def handle_metrics():
+        """Метрики сервера в формате Prometheus
+        ---
+        produces:
+          - text/plain
+        responses:
+          200:
+            description: Счётчики и гистограммы времени запросов по эндпоинтам и фазам
+        """
+        return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,46 +1,139 @@
-from flask import Flask, abort, request
-from pathlib import Path
+from flask import Blueprint, Flask, abort, current_app, request, stream_with_context
 from models import db, Board, User, Task
+from database import init_database
+from sharding import init_sharding, use_shard
+from migrations import init_migrations, upgrade_all
+from auth import require_authorization
+from ids import CHANGES, allocate_ids, start_sequence
+from pagination import keyset, page, page_args, paginate
+from query_budget import query_budget, init_query_budget
+from ratelimit import rate_limit, init_rate_limit
+from idempotency import init_idempotency
+from group_commit import after_commit, commit, group_commit, init_group_commit
+from instrumentation import init_instrumentation
+from serialization import stream_board, task_dicts, task_rows
+from caching import cache_headers, etag, not_modified, boards_version, touch_board, touch_boards
+from ranks import MAX_RANK_LENGTH, last_rank, last_ranks, rank_after, rank_between, schedule_rebalance
+from purge import board_or_404, delete_board, init_purge, live_boards, schedule_purge, tombstone_board
+from changes import init_changes, log_board_deleted, log_boards, log_tasks
+import archive
+import changes
+import events
+import search
+import stats
+import workspace
 from werkzeug.security import generate_password_hash, check_password_hash
 from uuid import uuid4
+from werkzeug.utils import import_string
 from flask_cors import CORS
-from flasgger import Swagger
 
-app = Flask(__name__)
-swagger = Swagger(app)
-CORS(app)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///project.db"
-db.init_app(app)
+bp = Blueprint('api', __name__)
+# Response headers browsers may read cross-origin; asgi.py exposes the same ones.
+EXPOSE_HEADERS = ['X-Next-Cursor', 'ETag', 'Idempotent-Replayed']
+
+
+# Queries and responses of the board reads, shared with the native routes of asgi.py.
+
+def list_page(args):
+    """``(limit, cursor)`` of a paginated board list request, () for the whole list."""
+    return page_args(args=args) if 'limit' in args or 'cursor' in args else ()
+
+
+def boards_tag(user_id, version, limit_cursor):
+    return etag(user_id, 'boards', version, *limit_cursor)
+
+
+def boards_query(user_id, limit_cursor):
+    query = live_boards(user_id)
+    return keyset(query, Board.id, *limit_cursor) if limit_cursor else query.order_by(Board.id)
+
+
+def boards_body(boards, limit_cursor):
+    """Body and paging headers of a board list, ``boards`` being the rows of boards_query()."""
+    headers = {}
+    if limit_cursor:
+        boards, headers = page(boards, Board.id, limit_cursor[0])
+    return [board.as_json(without_tasks=True) for board in boards], headers
+
+
+def board_tag(user_id, board):
+    return etag(user_id, 'board', board.id, board.version)
 
-if not Path('project.db').is_file():
-    with app.app_context():
-        db.create_all()
 
+def wants_stream(args):
+    return args.get('stream') in ('1', 'true')
 
-def require_authorization():
-    token: str = request.headers.get('Authorization', '').split()[1]
-    users = db.session.execute(db.select(User)).scalars()
-    for user in users:
-        if user.id == token:
-            return user
-    abort(401, description='Authorization failed')
 
+def board_tasks_query(user_id, board_id, args):
+    """Query of a board's tasks, only those in the column the ``status`` argument names if it is given."""
+    query = db.select(Task).where(Task.board_user_id == user_id, Task.board_id == board_id)
+    if 'status' in args:
+        try:
+            query = query.where(Task.status == int(args['status']))
+        except ValueError:
+            abort(400, description='status must be an integer')
+    return query
 
-@app.post('/api/signup')
+
+def create_app(config=None):
+    """Build the application. ``config`` overrides config.py and FLASK_* environment variables."""
+    app = Flask(__name__)
+    app.config.from_object('config')
+    app.config.from_prefixed_env()
+    app.config.from_mapping(config or {})
+    app.json = import_string(app.config['JSON_PROVIDER'])(app)
+    CORS(app, expose_headers=EXPOSE_HEADERS)
+    if app.config['SWAGGER_ENABLED']:
+        from flasgger import Swagger
+        Swagger(app)
+    init_database(app)
+    init_instrumentation(app)
+    init_sharding(app)
+    init_migrations(app)
+    search.init_search(app)
+    stats.init_stats(app)
+    init_query_budget(app)
+    init_idempotency(app)
+    init_rate_limit(app)
+    init_group_commit(app)
+    init_purge(app)
+    init_changes(app)
+    archive.init_archive(app)
+    events.init_events(app)
+    app.register_blueprint(bp)
+    app.register_blueprint(workspace.bp)
+    app.register_blueprint(events.bp)
+    app.register_blueprint(search.bp)
+    app.register_blueprint(stats.bp)
+    app.register_blueprint(changes.bp)
+    app.register_blueprint(archive.bp)
+    return app
+
+
+@bp.post('/api/signup')
+@query_budget(3)
+@rate_limit('signup')
+@group_commit
 def handle_signup() -> dict:
     """Получить токен
     ---
     responses:
       200:
         description: Токен успешно получен
+      429:
+        description: Слишком много регистраций с этого адреса, повторить через Retry-After секунд
     """
     user_id = uuid4().hex
+    use_shard(user_id)
     db.session.add(User(id=user_id))
-    db.session.commit()
+    start_sequence(user_id)
+    start_sequence(user_id, CHANGES)
+    commit()
     return {'token': user_id}
 
 
-@app.get('/api/boards')
+@bp.get('/api/boards')
+@query_budget(3)
 def handle_boards():
     """Получить список всех досок
     ---
@@ -50,9 +143,25 @@ def handle_boards():
         type: string
         required: true
         default: Bearer
+      - name: If-None-Match
+        in: header
+        type: string
+        description: ETag из предыдущего ответа
+      - name: limit
+        in: query
+        type: integer
+        description: Размер страницы (если не задан вместе с cursor, возвращаются все доски)
+      - name: cursor
+        in: query
+        type: integer
+        description: Значение заголовка X-Next-Cursor предыдущей страницы
     responses:
       200:
         description: Список всех досок
+        headers:
+            X-Next-Cursor:
+                type: integer
+                description: Курсор следующей страницы, если она есть
         schema:
             type:
                 array
@@ -83,13 +192,25 @@ def handle_boards():
                     #             board_user_id:
                     #                 type: string
                     #                 description: id
+      304:
+        description: Не изменилось с переданного ETag
       401:
         description: Неправильный токен
+      400:
+        description: Неверные limit или cursor
     """
-    user = require_authorization()
-    return [board.as_json(without_tasks=True) for board in user.boards]
+    user_id = require_authorization()
+    limit_cursor = list_page(request.args)
+    tag = boards_tag(user_id, boards_version(user_id), limit_cursor)
+    response = not_modified(tag)
+    if response:
+        return response
+    boards, headers = boards_body(db.session.execute(boards_query(user_id, limit_cursor)).scalars().all(),
+                                  limit_cursor)
+    return boards, {**headers, **cache_headers(tag)}
 
-@app.get('/api/boards/<int:board_id>')
+@bp.get('/api/boards/<int:board_id>')
+@query_budget(3)
 def handle_board(board_id):
     """Получить доску с задачами
     ---
@@ -103,6 +224,14 @@ def handle_board(board_id):
         in: path
         type: integer
         required: true
+      - name: If-None-Match
+        in: header
+        type: string
+        description: ETag из предыдущего ответа
+      - name: stream
+        in: query
+        type: boolean
+        description: Отдавать массив задач потоком, не собирая весь ответ в памяти
     responses:
       200:
         description: Доска с задачами
@@ -133,16 +262,101 @@ def handle_board(board_id):
                             board_user_id:
                                 type: string
                                 description: id
+                            rank:
+                                type: string
+                                description: позиция в колонке статуса, по ней задачи сортируются
+      304:
+        description: Не изменилось с переданного ETag
       401:
         description: Неправильный токен
       404:
         description: Доски не существует
     """
-    user = require_authorization()
-    board = db.get_or_404(Board, {'id': board_id, 'user_id': user.id})
-    return board.as_json()
+    user_id = require_authorization()
+    board = board_or_404(user_id, board_id)
+    tag = board_tag(user_id, board)
+    response = not_modified(tag)
+    if response:
+        return response
+    board = board.as_json(without_tasks=True)
+    query = task_rows(user_id, board_id)
+    if wants_stream(request.args):
+        response = current_app.response_class(stream_with_context(stream_board(board, query)),
+                                              mimetype='application/json')
+        response.headers.update(cache_headers(tag))
+        return response
+    return {**board, 'tasks': task_dicts(db.session.execute(query))}, cache_headers(tag)
+
+@bp.get('/api/boards/<int:board_id>/tasks')
+@query_budget(3)
+def handle_board_tasks(board_id):
+    """Получить задачи доски постранично
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: status
+        in: query
+        type: integer
+        description: Вернуть только задачи с этим статусом
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+      - name: cursor
+        in: query
+        type: integer
+        description: Значение заголовка X-Next-Cursor предыдущей страницы
+    responses:
+      200:
+        description: Страница задач, упорядоченных по id
+        headers:
+            X-Next-Cursor:
+                type: integer
+                description: Курсор следующей страницы, если она есть
+        schema:
+            type: array
+            items:
+                type: object
+                properties:
+                    id:
+                        type: string
+                    title:
+                        type: string
+                    description:
+                        type: string
+                    status:
+                        type: string
+                    board_id:
+                        type: integer
+                    board_user_id:
+                        type: string
+                        description: id
+                    rank:
+                        type: string
+                        description: позиция в колонке статуса, по ней задачи сортируются
+      401:
+        description: Неправильный токен
+      400:
+        description: Неверные status, limit или cursor
+      404:
+        description: Доски не существует
+    """
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
+    tasks, headers = paginate(board_tasks_query(user_id, board_id, request.args), Task.id, *page_args())
+    return [task.as_json() for task in tasks], headers
 
-@app.post('/api/boards/create')
+@bp.post('/api/boards/create')
+@query_budget(8)
+@group_commit
 def handle_create_board():
     """Создать новую доску
     ---
@@ -190,26 +404,36 @@ def handle_create_board():
                             board_user_id:
                                 type: string
                                 description: id
+                            rank:
+                                type: string
+                                description: позиция в колонке статуса, по ней задачи сортируются
       401:
         description: Неправильный токен
       400:
         description: Если доска с таким именем уже есть
     """
     name = request.get_json().get('name', '')
-    user = require_authorization()
-    if not name or name in [board.name for board in user.boards]:
+    user_id = require_authorization()
+    if not name or db.session.execute(
+            live_boards(user_id).with_only_columns(Board.id).where(Board.name == name)).first():
         abort(400)
     board = Board(
         name=name,
-        user_id=user.id,
-        id=max([board.id for board in user.boards]) + 1 if [board.id for board in user.boards] else 1
+        user_id=user_id,
+        id=allocate_ids(user_id),
+        tasks=[]
     )
     db.session.add(board)
-    db.session.commit()
+    start_sequence(user_id, board.id)
+    touch_boards(user_id)
+    log_boards(user_id, [board.id])
+    commit()
     return board.as_json()
 
 
-@app.post('/api/boards/<int:board_id>/edit')
+@bp.post('/api/boards/<int:board_id>/edit')
+@query_budget(7)
+@group_commit
 def handle_edit_board(board_id):
     """Изменить существующую доску
     ---
@@ -261,6 +485,9 @@ def handle_edit_board(board_id):
                             board_user_id:
                                 type: string
                                 description: id
+                            rank:
+                                type: string
+                                description: позиция в колонке статуса, по ней задачи сортируются
       401:
         description: Неправильный токен
       400:
@@ -268,17 +495,25 @@ def handle_edit_board(board_id):
       404:
         description: Если доски не существует
     """
-    user = require_authorization()
+    user_id = require_authorization()
     name = request.get_json().get('name', '')
-    board = db.get_or_404(Board, {'id': board_id, 'user_id': user.id})
+    board = board_or_404(user_id, board_id)
     if not name or name == board.name:
         abort(400, description='Name is not provided or empty or repeating')
     board.name = name
-    db.session.commit()
-    return board.as_json()
+    board.version = Board.version + 1
+    tasks = task_dicts(db.session.execute(task_rows(user_id, board_id)))
+    touch_boards(user_id)
+    log_boards(user_id, [board_id])
+    commit()
+    summary = board.as_json(without_tasks=True)
+    events.publish(user_id, board_id, ('board.updated', summary))
+    return {**summary, 'tasks': tasks}
 
 
-@app.post('/api/boards/<int:board_id>/delete')
+@bp.post('/api/boards/<int:board_id>/delete')
+@query_budget(10)
+@group_commit
 def handle_delete_board(board_id):
     """Удалить существующую доску
     ---
@@ -292,9 +527,17 @@ def handle_delete_board(board_id):
         in: path
         type: integer
         required: true
+      - name: summary
+        in: query
+        type: boolean
+        description: Вернуть только доску, без списка удаленных задач
+      - name: background
+        in: query
+        type: boolean
+        description: Сразу скрыть доску и удалять ее задачи в фоне, частями; ответ 202 без задач
     responses:
       200:
-        description: удаленная доска
+        description: удаленная доска; с summary без tasks
         schema:
             type: object
             properties:
@@ -322,19 +565,41 @@ def handle_delete_board(board_id):
                             board_user_id:
                                 type: string
                                 description: id
+                            rank:
+                                type: string
+                                description: позиция в колонке статуса, по ней задачи сортируются
+      202:
+        description: доска скрыта, задачи удаляются в фоне (с background)
       401:
         description: Неправильный токен
       404:
         description: Если доски не существует
     """
-    user = require_authorization()
-    board = db.get_or_404(Board, {'id': board_id, 'user_id': user.id})
-    db.session.delete(board)
-    db.session.commit()
-    return board.as_json()
+    user_id = require_authorization()
+    board = board_or_404(user_id, board_id)
+    summary = board.as_json(without_tasks=True)
+    if request.args.get('background') in ('1', 'true'):
+        tombstone_board(board)
+        touch_boards(user_id)
+        log_board_deleted(user_id, board_id)
+        commit()
+        after_commit(schedule_purge)
+        events.publish(user_id, board_id, ('board.deleted', summary))
+        return summary, 202
+    response = summary
+    if request.args.get('summary') not in ('1', 'true'):
+        response = {**summary, 'tasks': task_dicts(db.session.execute(task_rows(user_id, board_id)))}
+    delete_board(user_id, board_id)
+    touch_boards(user_id)
+    log_board_deleted(user_id, board_id)
+    commit()
+    events.publish(user_id, board_id, ('board.deleted', summary))
+    return response
 
 
-@app.post('/api/boards/<int:board_id>/tasks/create')
+@bp.post('/api/boards/<int:board_id>/tasks/create')
+@query_budget(8)
+@group_commit
 def handle_create_task(board_id):
     """Создать задание
     ---
@@ -379,13 +644,16 @@ def handle_create_task(board_id):
                 board_user_id:
                     type: string
                     description: id
+                rank:
+                    type: string
+                    description: позиция в колонке статуса, по ней задачи сортируются
       401:
         description: Неправильный токен
       400:
         description: Если не задано какое-то из полей task`а
     """
-    user = require_authorization()
-    board = db.get_or_404(Board, {'id': board_id, 'user_id': user.id})
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
     title = request.get_json().get('title', '')
     description = request.get_json().get('description', '')
     status = request.get_json().get('status', '')
@@ -396,15 +664,21 @@ def handle_create_task(board_id):
         description=description,
         status=status,
         board_id=board_id,
-        id=max([tsk.id for tsk in board.tasks]) + 1 if board.tasks else 1,
-        board_user_id=user.id
+        id=allocate_ids(user_id, board_id),
+        board_user_id=user_id,
+        rank=rank_after(last_rank(user_id, board_id, status)),
     )
     db.session.add(task)
-    db.session.commit()
+    touch_board(user_id, board_id)
+    log_tasks(user_id, board_id, [task.id])
+    commit()
+    events.publish(user_id, board_id, ('task.created', task.as_json()))
     return task.as_json()
 
 
-@app.post('/api/boards/<int:board_id>/tasks/<int:task_id>/edit')
+@bp.post('/api/boards/<int:board_id>/tasks/<int:task_id>/edit')
+@query_budget(8)
+@group_commit
 def handle_edit_task(board_id, task_id):
     """Изменить задание
     ---
@@ -453,6 +727,9 @@ def handle_edit_task(board_id, task_id):
                 board_user_id:
                     type: string
                     description: id
+                rank:
+                    type: string
+                    description: позиция в колонке статуса, по ней задачи сортируются
       401:
         description: Неправильный токен
       400:
@@ -460,24 +737,32 @@ def handle_edit_task(board_id, task_id):
       404:
         description: Если задания не существует
     """
-    user = require_authorization()
+    user_id = require_authorization()
     title = request.get_json().get('title', '')
     description = request.get_json().get('description', '')
     status = request.get_json().get('status', '')
     if not (title or description or status):
         abort(400)
-    task = db.get_or_404(Task, {'id': task_id, 'board_id': board_id, 'board_user_id': user.id})
+    board_or_404(user_id, board_id)
+    task = db.get_or_404(Task, {'id': task_id, 'board_id': board_id, 'board_user_id': user_id})
     if title:
         task.title = title
     if description:
         task.description = description
-    if status:
+    if status and status != task.status:
+        # A task changing columns goes to the end of the new one, as a created task does.
+        task.rank = rank_after(last_rank(user_id, board_id, status))
         task.status = status
-    db.session.commit()
+    touch_board(user_id, board_id)
+    log_tasks(user_id, board_id, [task_id])
+    commit()
+    events.publish(user_id, board_id, ('task.updated', task.as_json()))
     return task.as_json()
 
 
-@app.post('/api/boards/<int:board_id>/tasks/<int:task_id>/delete')
+@bp.post('/api/boards/<int:board_id>/tasks/<int:task_id>/delete')
+@query_budget(7)
+@group_commit
 def handle_delete_task(board_id, task_id):
     """Удалить задание
     ---
@@ -514,16 +799,294 @@ def handle_delete_task(board_id, task_id):
                 board_user_id:
                     type: string
                     description: id
+                rank:
+                    type: string
+                    description: позиция в колонке статуса, по ней задачи сортируются
       401:
         description: Неправильный токен
       404:
         description: Если задания не существует
     """
-    user = require_authorization()
-    task = db.get_or_404(Task, {'id': task_id, 'board_id': board_id, 'board_user_id': user.id})
+    user_id = require_authorization()
+    board_or_404(user_id, board_id)
+    task = db.get_or_404(Task, {'id': task_id, 'board_id': board_id, 'board_user_id': user_id})
     db.session.delete(task)
-    db.session.commit()
+    touch_board(user_id, board_id)
+    log_tasks(user_id, board_id, [task_id], deleted=True)
+    commit()
+    events.publish(user_id, board_id, ('task.deleted', {'id': task_id}))
+    return task.as_json()
+
+
+@bp.post('/api/boards/<int:board_id>/tasks/<int:task_id>/move')
+@query_budget(9)
+@group_commit
+def handle_move_task(board_id, task_id):
+    """Переместить задание в колонке статуса или в другую колонку
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: task_id
+        in: path
+        type: integer
+        required: true
+      - name: json_body
+        in: body
+        type: object
+        schema:
+            properties:
+                status:
+                    type: integer
+                    description: Колонка, куда переместить; по умолчанию текущая
+                after_id:
+                    type: integer
+                    description: Задание той же колонки, после которого встать
+                before_id:
+                    type: integer
+                    description: Задание той же колонки, перед которым встать
+        description: Без after_id и before_id задание встаёт в конец колонки
+    responses:
+      200:
+        description: перемещённое задание
+        schema:
+            type: object
+            properties:
+                id:
+                    type: string
+                title:
+                    type: string
+                description:
+                    type: string
+                status:
+                    type: string
+                board_id:
+                    type: integer
+                board_user_id:
+                    type: string
+                    description: id
+                rank:
+                    type: string
+                    description: позиция в колонке статуса, по ней задачи сортируются
+      401:
+        description: Неправильный токен
+      400:
+        description: Если соседнее задание не из этой колонки
+      404:
+        description: Если задания не существует
+      409:
+        description: Соседние задания стоят не в этом порядке; нужно перечитать доску
+    """
+    user_id = require_authorization()
+    data = request.get_json(silent=True) or {}
+    board_or_404(user_id, board_id)
+    task = db.get_or_404(Task, {'id': task_id, 'board_id': board_id, 'board_user_id': user_id})
+    status = data.get('status', task.status)
+    after_id, before_id = data.get('after_id'), data.get('before_id')
+    if not all(isinstance(value, int) for value in (status, after_id or 0, before_id or 0)) or (
+            after_id and after_id == before_id):
+        abort(400)
+    column = ((Task.board_user_id == user_id) & (Task.board_id == board_id)
+              & (Task.status == status) & (Task.id != task_id))
+    neighbours = {}
+    if after_id or before_id:
+        neighbours = dict(db.session.execute(
+            db.select(Task.id, Task.rank).where(column, Task.id.in_({after_id, before_id} - {None}))).all())
+        if any(neighbour and neighbour not in neighbours for neighbour in (after_id, before_id)):
+            abort(400, description='Neighbour task is not in the target column')
+    lower, upper = neighbours.get(after_id), neighbours.get(before_id)
+    if after_id and not before_id:
+        upper = db.session.execute(db.select(db.func.min(Task.rank)).where(column, Task.rank > lower)).scalar()
+    elif before_id and not after_id:
+        lower = db.session.execute(db.select(db.func.max(Task.rank)).where(column, Task.rank < upper)).scalar()
+    elif not after_id:
+        lower = db.session.execute(db.select(db.func.max(Task.rank)).where(column)).scalar()
+    if lower is not None and upper is not None and lower >= upper:
+        # Equal ranks come from concurrent moves; spacing the column out again resolves them.
+        schedule_rebalance(user_id, board_id, status)
+        abort(409)
+    task.status = status
+    task.rank = rank_between(lower, upper)
+    touch_board(user_id, board_id)
+    log_tasks(user_id, board_id, [task_id])
+    commit()
+    events.publish(user_id, board_id, ('task.updated', task.as_json()))
+    if len(task.rank) > MAX_RANK_LENGTH:
+        schedule_rebalance(user_id, board_id, status)
     return task.as_json()
 
+MAX_BATCH_OPERATIONS = 1000
+
+
+@bp.post('/api/boards/<int:board_id>/tasks/batch')
+@query_budget(13)
+@group_commit
+def handle_batch_tasks(board_id):
+    """Применить пакет операций над заданиями доски одной транзакцией
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: json_body
+        in: body
+        type: object
+        required: true
+        schema:
+            properties:
+                operations:
+                    type: array
+                    description: create (title, description, status), edit (id и поля), status (id, status), delete (id)
+                    items:
+                        type: object
+                        properties:
+                            op:
+                                type: string
+                                enum: [create, edit, status, delete]
+                            id:
+                                type: integer
+                            title:
+                                type: string
+                            description:
+                                type: string
+                            status:
+                                type: integer
+    responses:
+      200:
+        description: Результаты операций в том же порядке (для delete — удаленное задание)
+        schema:
+            type: array
+            items:
+                type: object
+                properties:
+                    id:
+                        type: string
+                    title:
+                        type: string
+                    description:
+                        type: string
+                    status:
+                        type: string
+                    board_id:
+                        type: integer
+                    board_user_id:
+                        type: string
+                        description: id
+                    rank:
+                        type: string
+                        description: позиция в колонке статуса, по ней задачи сортируются
+      401:
+        description: Неправильный токен
+      400:
+        description: Если какая-то операция некорректна; ни одна операция не применяется
+      404:
+        description: Если доски или какого-то из заданий не существует
+    """
+    user_id = require_authorization()
+    operations = request.get_json().get('operations')
+    if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH_OPERATIONS:
+        abort(400, description=f'operations must be a list of 1 to {MAX_BATCH_OPERATIONS} items')
+    board_or_404(user_id, board_id)
+
+    touched = set()
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in ('create', 'edit', 'status', 'delete'):
+            abort(400, description='Unknown operation')
+        if operation['op'] == 'create':
+            if not (operation.get('title') and operation.get('description')
+                    and isinstance(operation.get('status'), int)):
+                abort(400)
+        elif not isinstance(operation.get('id'), int):
+            abort(400, description='Operation id is not provided')
+        else:
+            touched.add(operation['id'])
+            if operation['op'] == 'edit' and not (operation.get('title') or operation.get('description')
+                                                  or operation.get('status')):
+                abort(400)
+            if operation['op'] == 'status' and not isinstance(operation.get('status'), int):
+                abort(400)
+
+    scope = (Task.board_user_id == user_id) & (Task.board_id == board_id)
+    tasks = {}
+    if touched:
+        rows = db.session.execute(db.select(Task.id, Task.title, Task.description, Task.status, Task.rank)
+                                  .where(scope, Task.id.in_(touched))).all()
+        tasks = {row.id: {**row._asdict(), 'board_id': board_id, 'board_user_id': user_id} for row in rows}
+        if len(tasks) != len(touched):
+            abort(404)
+
+    creates = [operation for operation in operations if operation['op'] == 'create']
+    next_id = allocate_ids(user_id, board_id, count=len(creates)) if creates else None
+    # Created tasks and tasks changing columns go to the end of their column.
+    statuses = {operation['status'] for operation in operations
+                if operation['op'] in ('create', 'status') or operation['op'] == 'edit' and operation.get('status')}
+    ranks = last_ranks(user_id, board_id, statuses) if statuses else {}
+    created, edited, deleted, results = [], set(), set(), []
+
+    def change_status(task, status):
+        if status != task['status']:
+            ranks[status] = rank_after(ranks.get(status))
+            task['status'], task['rank'] = status, ranks[status]
+
+    for operation in operations:
+        if operation['op'] == 'create':
+            ranks[operation['status']] = rank_after(ranks.get(operation['status']))
+            task = {'id': next_id, 'title': operation['title'], 'description': operation['description'],
+                    'status': operation['status'], 'board_id': board_id, 'board_user_id': user_id,
+                    'rank': ranks[operation['status']]}
+            next_id += 1
+            created.append(task)
+            results.append(dict(task))
+            continue
+        if operation['id'] in deleted:
+            abort(400, description='Task is deleted earlier in the batch')
+        task = tasks[operation['id']]
+        if operation['op'] == 'delete':
+            deleted.add(task['id'])
+        elif operation['op'] == 'status':
+            change_status(task, operation['status'])
+            edited.add(task['id'])
+        else:
+            for field in ('title', 'description'):
+                if operation.get(field):
+                    task[field] = operation[field]
+            if operation.get('status'):
+                change_status(task, operation['status'])
+            edited.add(task['id'])
+        results.append(dict(task))
+
+    if created:
+        db.session.execute(db.insert(Task), created)
+    if edited - deleted:
+        db.session.execute(db.update(Task), [tasks[task_id] for task_id in edited - deleted])
+    if deleted:
+        db.session.execute(db.delete(Task).where(scope, Task.id.in_(deleted)))
+    touch_board(user_id, board_id)
+    log_tasks(user_id, board_id, [task['id'] for task in created] + sorted(edited - deleted))
+    log_tasks(user_id, board_id, sorted(deleted), deleted=True)
+    commit()
+    kinds = {'create': 'task.created', 'edit': 'task.updated', 'status': 'task.updated', 'delete': 'task.deleted'}
+    events.publish(user_id, board_id, *[
+        (kinds[operation['op']], {'id': result['id']} if operation['op'] == 'delete' else result)
+        for operation, result in zip(operations, results)])
+    return results
+
+
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        upgrade_all()
     app.run(debug=True)
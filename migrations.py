@@ -0,0 +1,349 @@
+import click
+from sqlalchemy import text
+
+from models import db
+
+# Triggers on task, kept here so that rebuilding the table can recreate them.
+# These first ones call search_terms(), registered by search.py; they were
+# replaced by SQLITE_TASK_SEARCH_TRIGGERS, which need no application function.
+SQLITE_TASK_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts (rowid, title, description)
+        VALUES (new.rowid, search_terms(new.board_user_id, new.title),
+                search_terms(new.board_user_id, new.description));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, search_terms(old.board_user_id, old.title),
+                search_terms(old.board_user_id, old.description));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, search_terms(old.board_user_id, old.title),
+                search_terms(old.board_user_id, old.description));
+        INSERT INTO task_fts (rowid, title, description)
+        VALUES (new.rowid, search_terms(new.board_user_id, new.title),
+                search_terms(new.board_user_id, new.description));
+    END""",
+]
+SQLITE_TASK_SEARCH_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts (rowid, title, description, owner)
+        VALUES (new.rowid, new.title, new.description, hex(new.board_user_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description, owner)
+        VALUES ('delete', old.rowid, old.title, old.description, hex(old.board_user_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description, owner)
+        VALUES ('delete', old.rowid, old.title, old.description, hex(old.board_user_id));
+        INSERT INTO task_fts (rowid, title, description, owner)
+        VALUES (new.rowid, new.title, new.description, hex(new.board_user_id));
+    END""",
+]
+SQLITE_TASK_COUNT_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS task_count_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_count (board_user_id, board_id, status, count)
+        VALUES (new.board_user_id, new.board_id, new.status, 1)
+        ON CONFLICT (board_user_id, board_id, status) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_count_delete AFTER DELETE ON task BEGIN
+        UPDATE task_count SET count = count - 1
+        WHERE board_user_id = old.board_user_id AND board_id = old.board_id AND status = old.status;
+        DELETE FROM task_count
+        WHERE board_user_id = old.board_user_id AND board_id = old.board_id AND status = old.status
+          AND count <= 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_count_update AFTER UPDATE OF status, board_id, board_user_id ON task
+    WHEN old.status IS NOT new.status OR old.board_id IS NOT new.board_id
+      OR old.board_user_id IS NOT new.board_user_id BEGIN
+        UPDATE task_count SET count = count - 1
+        WHERE board_user_id = old.board_user_id AND board_id = old.board_id AND status = old.status;
+        DELETE FROM task_count
+        WHERE board_user_id = old.board_user_id AND board_id = old.board_id AND status = old.status
+          AND count <= 0;
+        INSERT INTO task_count (board_user_id, board_id, status, count)
+        VALUES (new.board_user_id, new.board_id, new.status, 1)
+        ON CONFLICT (board_user_id, board_id, status) DO UPDATE SET count = count + 1;
+    END""",
+]
+
+# Ordered schema changes; a database at version N has had the first N applied.
+# Never edit an entry once it has shipped, append a new one instead. An entry
+# holds either statements for every backend or a dict of them per dialect.
+MIGRATIONS = [
+    ('create user, board and task tables', [
+        '''CREATE TABLE IF NOT EXISTS "user" (
+            id VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS board (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            user_id VARCHAR NOT NULL,
+            PRIMARY KEY (id, user_id),
+            FOREIGN KEY (user_id) REFERENCES "user" (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS task (
+            id INTEGER NOT NULL,
+            title VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            status INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            board_user_id VARCHAR NOT NULL,
+            PRIMARY KEY (id, board_id, board_user_id),
+            FOREIGN KEY (board_id, board_user_id) REFERENCES board (id, user_id)
+        )''',
+    ]),
+    ('add id sequences and listing indexes', [
+        '''CREATE TABLE IF NOT EXISTS id_sequence (
+            user_id VARCHAR NOT NULL,
+            board_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, board_id),
+            FOREIGN KEY (user_id) REFERENCES "user" (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS ix_board_user_id_id ON board (user_id, id)',
+        'CREATE INDEX IF NOT EXISTS ix_task_board_id ON task (board_user_id, board_id, id)',
+        'CREATE INDEX IF NOT EXISTS ix_task_board_status_id ON task (board_user_id, board_id, status, id)',
+    ]),
+    ('add version counters for ETags', [
+        'ALTER TABLE "user" ADD COLUMN boards_version INTEGER NOT NULL DEFAULT 1',
+        'ALTER TABLE board ADD COLUMN version INTEGER NOT NULL DEFAULT 1',
+    ]),
+    ('add full-text search over tasks', {'sqlite': [
+        # Contentless index over task, keyed by its rowid. The search_terms()
+        # function registered by search.py prefixes every word with the owner's
+        # id, so each user gets their own terms and a query only reads the
+        # postings of that user's tasks.
+        """CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+            title, description,
+            content='', tokenize="unicode61 remove_diacritics 2 tokenchars '_'"
+        )""",
+        *SQLITE_TASK_FTS_TRIGGERS,
+        """INSERT INTO task_fts (rowid, title, description)
+        SELECT rowid, search_terms(board_user_id, title), search_terms(board_user_id, description) FROM task""",
+    ], 'postgresql': [
+        # Titles weigh as A and descriptions as B; PostgreSQL keeps the column
+        # up to date itself.
+        """ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', description), 'B')
+        ) STORED""",
+        'CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING gin (search_vector)',
+    ]}),
+    ('add task ranks for ordering within a status column', {'sqlite': [
+        "ALTER TABLE task ADD COLUMN rank VARCHAR NOT NULL DEFAULT ''",
+        # Existing tasks keep their id order; see ranks.py for the format.
+        """UPDATE task SET rank = printf('V%07d1', numbered.position)
+        FROM (SELECT rowid AS task_rowid,
+                     row_number() OVER (PARTITION BY board_user_id, board_id, status ORDER BY id) AS position
+              FROM task) AS numbered
+        WHERE task.rowid = numbered.task_rowid""",
+        'CREATE INDEX IF NOT EXISTS ix_task_board_status_rank ON task (board_user_id, board_id, status, rank)',
+    ], 'postgresql': [
+        # Ranks compare bytewise, which on PostgreSQL takes the C collation.
+        """ALTER TABLE task ADD COLUMN rank VARCHAR COLLATE "C" NOT NULL DEFAULT ''""",
+        """UPDATE task SET rank = 'V' || lpad(numbered.position::text, 7, '0') || '1'
+        FROM (SELECT id, board_id, board_user_id,
+                     row_number() OVER (PARTITION BY board_user_id, board_id, status ORDER BY id) AS position
+              FROM task) AS numbered
+        WHERE task.id = numbered.id AND task.board_id = numbered.board_id
+          AND task.board_user_id = numbered.board_user_id""",
+        'CREATE INDEX IF NOT EXISTS ix_task_board_status_rank ON task (board_user_id, board_id, status, rank)',
+    ]}),
+    ('add per-status task counters for board statistics', {'sqlite': [
+        '''CREATE TABLE IF NOT EXISTS task_count (
+            board_user_id VARCHAR NOT NULL,
+            board_id INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (board_user_id, board_id, status)
+        )''',
+        # The triggers update the counters in the transaction that changes the
+        # task, whichever code path does it; rows that drop to zero are removed.
+        *SQLITE_TASK_COUNT_TRIGGERS,
+        '''INSERT INTO task_count (board_user_id, board_id, status, count)
+        SELECT board_user_id, board_id, status, count(*) FROM task GROUP BY board_user_id, board_id, status''',
+    ], 'postgresql': [
+        '''CREATE TABLE IF NOT EXISTS task_count (
+            board_user_id VARCHAR NOT NULL,
+            board_id INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (board_user_id, board_id, status)
+        )''',
+        """CREATE OR REPLACE FUNCTION task_count_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE task_count SET count = count - 1
+                WHERE board_user_id = OLD.board_user_id AND board_id = OLD.board_id AND status = OLD.status;
+                DELETE FROM task_count
+                WHERE board_user_id = OLD.board_user_id AND board_id = OLD.board_id AND status = OLD.status
+                  AND count <= 0;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO task_count (board_user_id, board_id, status, count)
+                VALUES (NEW.board_user_id, NEW.board_id, NEW.status, 1)
+                ON CONFLICT (board_user_id, board_id, status) DO UPDATE SET count = task_count.count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$""",
+        """CREATE OR REPLACE TRIGGER task_count_insert_delete AFTER INSERT OR DELETE ON task
+        FOR EACH ROW EXECUTE FUNCTION task_count_change()""",
+        """CREATE OR REPLACE TRIGGER task_count_update AFTER UPDATE OF status, board_id, board_user_id ON task
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.board_id IS DISTINCT FROM NEW.board_id
+                           OR OLD.board_user_id IS DISTINCT FROM NEW.board_user_id)
+        EXECUTE FUNCTION task_count_change()""",
+        '''INSERT INTO task_count (board_user_id, board_id, status, count)
+        SELECT board_user_id, board_id, status, count(*) FROM task GROUP BY board_user_id, board_id, status''',
+    ]}),
+    ('cascade board deletes to tasks and add board tombstones', {'sqlite': [
+        'ALTER TABLE board ADD COLUMN deleted BOOLEAN NOT NULL DEFAULT 0',
+        # Tasks whose board is gone could not be copied under the new foreign
+        # key; the triggers drop their search entries and counters.
+        '''DELETE FROM task
+        WHERE NOT EXISTS (SELECT 1 FROM board WHERE board.id = task.board_id AND board.user_id = task.board_user_id)''',
+        # SQLite cannot change a foreign key in place, so task is rebuilt. Rows
+        # keep their rowid, which task_fts is keyed by.
+        '''CREATE TABLE task_new (
+            id INTEGER NOT NULL,
+            title VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            status INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            board_user_id VARCHAR NOT NULL,
+            rank VARCHAR NOT NULL DEFAULT '',
+            PRIMARY KEY (id, board_id, board_user_id),
+            FOREIGN KEY (board_id, board_user_id) REFERENCES board (id, user_id) ON DELETE CASCADE
+        )''',
+        '''INSERT INTO task_new (rowid, id, title, description, status, board_id, board_user_id, rank)
+        SELECT rowid, id, title, description, status, board_id, board_user_id, rank FROM task''',
+        'DROP TABLE task',
+        'ALTER TABLE task_new RENAME TO task',
+        'CREATE INDEX ix_task_board_id ON task (board_user_id, board_id, id)',
+        'CREATE INDEX ix_task_board_status_id ON task (board_user_id, board_id, status, id)',
+        'CREATE INDEX ix_task_board_status_rank ON task (board_user_id, board_id, status, rank)',
+        *SQLITE_TASK_FTS_TRIGGERS,
+        *SQLITE_TASK_COUNT_TRIGGERS,
+    ], 'postgresql': [
+        'ALTER TABLE board ADD COLUMN deleted BOOLEAN NOT NULL DEFAULT false',
+        '''ALTER TABLE task DROP CONSTRAINT task_board_id_board_user_id_fkey,
+        ADD CONSTRAINT task_board_id_board_user_id_fkey FOREIGN KEY (board_id, board_user_id)
+            REFERENCES board (id, user_id) ON DELETE CASCADE''',
+    ]}),
+    ('add the shard map', [
+        # Only read in the directory database, see sharding.py.
+        '''CREATE TABLE IF NOT EXISTS user_shard (
+            user_id VARCHAR NOT NULL,
+            shard INTEGER NOT NULL,
+            moving BOOLEAN NOT NULL DEFAULT FALSE,
+            revision INTEGER NOT NULL,
+            PRIMARY KEY (user_id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS ix_user_shard_revision ON user_shard (revision)',
+    ]),
+    ('add the change log for delta sync', [
+        '''CREATE TABLE change_log (
+            user_id VARCHAR NOT NULL,
+            board_id INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            deleted BOOLEAN NOT NULL DEFAULT FALSE,
+            changed_at BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, board_id, task_id)
+        )''',
+        'CREATE INDEX ix_change_log_user_id_seq ON change_log (user_id, seq)',
+        'CREATE INDEX ix_change_log_tombstones ON change_log (changed_at) WHERE deleted',
+        'ALTER TABLE "user" ADD COLUMN sync_horizon INTEGER NOT NULL DEFAULT 0',
+        # Everything that exists is logged as of the first change, so a first
+        # sync returns it; tombstoned boards are logged as deleted.
+        '''INSERT INTO change_log (user_id, board_id, task_id, seq, deleted)
+        SELECT user_id, id, 0, 1, deleted FROM board''',
+        '''INSERT INTO change_log (user_id, board_id, task_id, seq, deleted)
+        SELECT task.board_user_id, task.board_id, task.id, 1, FALSE FROM task
+        JOIN board ON board.id = task.board_id AND board.user_id = task.board_user_id
+        WHERE NOT board.deleted''',
+        '''INSERT INTO id_sequence (user_id, board_id, last_id)
+        SELECT DISTINCT user_id, -1, 1 FROM change_log''',
+    ]),
+    ('add the archive of old tasks', [
+        # Keyed board first, so an archive pages by id within its board.
+        '''CREATE TABLE archived_task (
+            board_user_id VARCHAR NOT NULL,
+            board_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            title VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            status INTEGER NOT NULL,
+            rank VARCHAR NOT NULL DEFAULT '',
+            archived_at BIGINT NOT NULL,
+            PRIMARY KEY (board_user_id, board_id, id),
+            FOREIGN KEY (board_id, board_user_id) REFERENCES board (id, user_id) ON DELETE CASCADE
+        )''',
+    ]),
+    ('mark boards being imported', [
+        'ALTER TABLE board ADD COLUMN importing_since BIGINT',
+    ]),
+    ('index task search by owner in SQL', {'sqlite': [
+        # The owner becomes a column of task_fts holding the hex of the user id,
+        # one token whatever the id, so the triggers are plain SQL and any
+        # connection can write to task.
+        'DROP TRIGGER task_fts_insert',
+        'DROP TRIGGER task_fts_delete',
+        'DROP TRIGGER task_fts_update',
+        'DROP TABLE task_fts',
+        """CREATE VIRTUAL TABLE task_fts USING fts5(
+            title, description, owner,
+            content='', tokenize="unicode61 remove_diacritics 2"
+        )""",
+        *SQLITE_TASK_SEARCH_TRIGGERS,
+        """INSERT INTO task_fts (rowid, title, description, owner)
+        SELECT rowid, title, description, hex(board_user_id) FROM task""",
+    ], 'postgresql': []}),
+]
+
+# Arbitrary key of the PostgreSQL advisory lock held while migrating.
+SCHEMA_LOCK = 4_242_001
+
+
+def upgrade(engine):
+    """Apply pending migrations in one transaction and return the resulting version.
+
+    On SQLite the transaction starts with BEGIN IMMEDIATE and on PostgreSQL it
+    takes an advisory lock, so workers that boot together queue up behind the
+    first one instead of racing on the DDL.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        elif engine.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': SCHEMA_LOCK})
+        connection.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        version = connection.execute(text('SELECT version FROM schema_version')).scalar()
+        if version is None:
+            version = 0
+            connection.execute(text('INSERT INTO schema_version (version) VALUES (0)'))
+        for description, statements in MIGRATIONS[version:]:
+            if isinstance(statements, dict):
+                statements = statements[engine.dialect.name]
+            for statement in statements:
+                connection.execute(text(statement))
+            version += 1
+        connection.execute(text('UPDATE schema_version SET version = :version'), {'version': version})
+        connection.commit()
+    return version
+
+
+def upgrade_all():
+    """Upgrade the app's database and every shard in SHARDS; return the lowest resulting version."""
+    return min(upgrade(engine) for engine in db.engines.values())
+
+
+def init_migrations(app):
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Bring the database schema up to date."""
+        version = upgrade_all()
+        click.echo(f'Database schema is at version {version} of {len(MIGRATIONS)}.')
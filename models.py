@@ -1,23 +1,44 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, ForeignKeyConstraint
-from typing import List
+from sqlalchemy import BigInteger, Boolean, String, Integer, ForeignKey, ForeignKeyConstraint, Index
+from typing import List, Optional
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 # from flask_marshmallow import Marshmallow
 
 class Base(DeclarativeBase):
   pass
 
-db = SQLAlchemy(model_class=Base)
+class ShardSession(Session):
+    """Session running every statement on the engine in ``g.shard`` when one is set, see sharding.py."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('shard') is not None:
+            return g.shard
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(model_class=Base, session_options={'expire_on_commit': False, 'class_': ShardSession})
 
 class User(db.Model):
     id: Mapped[str] = mapped_column(String, primary_key=True)
-    boards: Mapped[List['Board']] = relationship()
+    boards_version: Mapped[int] = mapped_column(Integer, default=1)
+    # /api/sync cursors below this missed compacted tombstones, see changes.py.
+    sync_horizon: Mapped[int] = mapped_column(Integer, default=0)
+    boards: Mapped[List['Board']] = relationship(lazy='raise_on_sql')
 
 class Board(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String)
     user_id: Mapped[str] = mapped_column(ForeignKey('user.id'), primary_key=True)
-    tasks: Mapped[List['Task']] = relationship(cascade="all, delete-orphan")
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    # Set while purge.py removes the tasks of a board deleted in the background.
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Unix time of the last chunk workspace.py committed to a board it is still
+    # importing; the board stays deleted until the import finishes.
+    importing_since: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    tasks: Mapped[List['Task']] = relationship(cascade="all, delete-orphan", passive_deletes=True,
+                                               lazy='raise_on_sql')
+    __table_args__ = (Index('ix_board_user_id_id', user_id, id),)
 
     def as_json(self, without_tasks=False):
         return {
@@ -38,8 +59,37 @@ class Task(db.Model):
     status: Mapped[int] = mapped_column(Integer)
     board_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     board_user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    rank: Mapped[str] = mapped_column(String, default='')
+    __table_args__ = (ForeignKeyConstraint([board_id, board_user_id],
+                                           [Board.id, Board.user_id], ondelete='CASCADE'),
+                      Index('ix_task_board_id', board_user_id, board_id, id),
+                      Index('ix_task_board_status_id', board_user_id, board_id, status, id),
+                      Index('ix_task_board_status_rank', board_user_id, board_id, status, rank),
+                      {})
+    def as_json(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'status': self.status,
+            'board_id': self.board_id,
+            'board_user_id': self.board_user_id,
+            'rank': self.rank,
+        }
+
+class ArchivedTask(db.Model):
+    """A task moved out of task by archive.py, kept out of board loads, search and stats."""
+    board_user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    board_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String)
+    description: Mapped[str] = mapped_column(String)
+    status: Mapped[int] = mapped_column(Integer)
+    rank: Mapped[str] = mapped_column(String, default='')
+    # Unix time.
+    archived_at: Mapped[int] = mapped_column(BigInteger)
     __table_args__ = (ForeignKeyConstraint([board_id, board_user_id],
-                                           [Board.id, Board.user_id]),
+                                           [Board.id, Board.user_id], ondelete='CASCADE'),
                       {})
     def as_json(self):
         return {
@@ -48,9 +98,45 @@ class Task(db.Model):
             'description': self.description,
             'status': self.status,
             'board_id': self.board_id,
-            'board_user_id': self.board_user_id
+            'board_user_id': self.board_user_id,
+            'rank': self.rank,
+            'archived_at': self.archived_at,
         }
 
+class TaskCount(db.Model):
+    """Number of a board's tasks in one status, kept up to date by triggers on task."""
+    board_user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    board_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+class IdSequence(db.Model):
+    user_id: Mapped[str] = mapped_column(ForeignKey('user.id'), primary_key=True)
+    board_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_id: Mapped[int] = mapped_column(Integer, default=0)
+
+class ChangeLog(db.Model):
+    """Last change to one of a user's boards or tasks, for /api/sync; see changes.py."""
+    user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    board_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # 0 for the board itself.
+    task_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer)
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Unix time, used to expire tombstones.
+    changed_at: Mapped[int] = mapped_column(BigInteger, default=0)
+    __table_args__ = (Index('ix_change_log_user_id_seq', user_id, seq),
+                      Index('ix_change_log_tombstones', changed_at,
+                            sqlite_where=deleted.is_(True), postgresql_where=deleted.is_(True)))
+
+class UserShard(db.Model):
+    """Shard of a user placed off the one their id hashes to; lives in the directory database."""
+    user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer)
+    moving: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Increases with every change, so processes can fetch only what changed.
+    revision: Mapped[int] = mapped_column(Integer, index=True)
+
 # class UserSchema(ma.SQLAlchemyAutoSchema):
 #     class Meta:
 #         model = User
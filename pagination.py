@@ -0,0 +1,41 @@
+from flask import abort, request
+
+from models import db
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def parse_page(args, default_limit=DEFAULT_LIMIT):
+    """Return ``(limit, cursor)`` from a query-string mapping, raising ValueError on bad values."""
+    limit = int(args.get('limit', default_limit))
+    cursor = int(args.get('cursor', 0))
+    if not 0 < limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit, cursor
+
+
+def page_args(default_limit=DEFAULT_LIMIT, args=None):
+    """Read ``limit`` and ``cursor`` from the query string, or the mapping ``args``, aborting with 400 on bad values."""
+    try:
+        return parse_page(request.args if args is None else args, default_limit)
+    except ValueError as error:
+        abort(400, description=f'Bad limit or cursor: {error}')
+
+
+def keyset(query, key, limit, cursor):
+    """Restrict ``query`` to the page after ``cursor``, with one extra row to detect a next page."""
+    return query.where(key > cursor).order_by(key).limit(limit + 1)
+
+
+def page(rows, key, limit):
+    """Trim a :func:`keyset` result to ``limit`` rows and build the headers pointing at the next page."""
+    if len(rows) <= limit:
+        return rows, {}
+    rows = rows[:limit]
+    return rows, {'X-Next-Cursor': str(getattr(rows[-1], key.key))}
+
+
+def paginate(query, key, limit, cursor):
+    """Return one keyset page of ``query`` ordered by ``key`` and the headers pointing at the next one."""
+    return page(db.session.execute(keyset(query, key, limit, cursor)).scalars().all(), key, limit)
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep, time
+
+import click
+from flask import abort, current_app
+
+from ids import drop_sequence
+from models import db, ArchivedTask, Board, Task
+from sharding import each_shard
+
+# A board deleted in the background keeps its row, flagged deleted, until its
+# tasks are gone; board_or_404() and live_boards() hide it meanwhile. Boards
+# being imported are flagged deleted as well, and left alone by the purge
+# unless their import stalled, see workspace.py.
+
+
+def board_or_404(user_id, board_id):
+    return live_or_404(db.session.get(Board, {'id': board_id, 'user_id': user_id}))
+
+
+def live_or_404(board):
+    """Return ``board`` unless it is missing or being purged, in which case abort with 404."""
+    if board is None or board.deleted:
+        abort(404)
+    return board
+
+
+def live_boards(user_id):
+    """Query of the user's boards that are not being purged."""
+    return db.select(Board).where(Board.user_id == user_id, Board.deleted.is_(False))
+
+
+def purged_board_ids(user_id):
+    """Subquery of the ids of the user's boards being purged, to leave their tasks out."""
+    return db.select(Board.id).where(Board.user_id == user_id, Board.deleted.is_(True))
+
+
+def delete_board(user_id, board_id):
+    """Delete a board in one statement; the database cascades it to the tasks."""
+    db.session.execute(db.delete(Board).where(Board.user_id == user_id, Board.id == board_id)
+                       .execution_options(synchronize_session=False))
+    drop_sequence(user_id, board_id)
+
+
+def tombstone_board(board):
+    """Hide a board at once and leave its tasks to purge_boards()."""
+    board.deleted = True
+    drop_sequence(board.user_id, board.id)
+
+
+def purge_board(user_id, board_id, chunk_size, pause=0.0):
+    """Delete a tombstoned board's tasks ``chunk_size`` at a time, each chunk committed on its own, then the board."""
+    for model in (Task, ArchivedTask):
+        scope = (model.board_user_id == user_id, model.board_id == board_id)
+        while True:
+            chunk = db.select(model.id).where(*scope).order_by(model.id).limit(chunk_size)
+            deleted = db.session.execute(db.delete(model).where(*scope, model.id.in_(chunk))
+                                         .execution_options(synchronize_session=False)).rowcount
+            db.session.commit()
+            if deleted < chunk_size:
+                break
+            sleep(pause)
+    db.session.execute(db.delete(Board).where(Board.user_id == user_id, Board.id == board_id,
+                                              Board.deleted.is_(True))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def purge_boards(chunk_size, pause=0.0, import_timeout=None):
+    """Purge every tombstoned board on every shard, including ones tombstoned meanwhile; return how many.
+
+    Given ``import_timeout``, boards being imported are only purged once
+    their import committed nothing for that many seconds.
+    """
+    purged = 0
+    for _ in each_shard():
+        while True:
+            purgeable = [Board.deleted.is_(True)]
+            if import_timeout is not None:
+                purgeable.append(Board.importing_since.is_(None) | (Board.importing_since < time() - import_timeout))
+            board = db.session.execute(db.select(Board.user_id, Board.id).where(*purgeable).limit(1)).first()
+            db.session.commit()
+            if board is None:
+                break
+            purge_board(*board, chunk_size, pause)
+            purged += 1
+    return purged
+
+
+_purger = ThreadPoolExecutor(max_workers=1, thread_name_prefix='board-purge')
+_pending = False
+_pending_lock = Lock()
+
+
+def schedule_purge():
+    """Purge tombstoned boards in the background, in one run however often it is requested meanwhile."""
+    global _pending
+    app = current_app._get_current_object()
+    with _pending_lock:
+        if _pending:
+            return
+        _pending = True
+
+    def run():
+        global _pending
+        with _pending_lock:
+            _pending = False
+        with app.app_context():
+            try:
+                purge_boards(app.config['PURGE_CHUNK'], app.config['PURGE_PAUSE'], app.config['IMPORT_TIMEOUT'])
+            except Exception:
+                app.logger.exception('Could not purge deleted boards')
+
+    _purger.submit(run)
+
+
+def init_purge(app):
+    @app.cli.command('purge-boards')
+    def purge_boards_command():
+        """Finish purging boards deleted in the background."""
+        purged = purge_boards(app.config['PURGE_CHUNK'], import_timeout=app.config['IMPORT_TIMEOUT'])
+        click.echo(f'Purged {purged} boards.')
@@ -0,0 +1,39 @@
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may execute per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # Periodic housekeeping opts out with the skip_query_budget execution option.
+    if has_app_context() and not conn.get_execution_options().get('skip_query_budget'):
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_budget(app):
+    """Check every request against its view's budget when QUERY_BUDGET_ENFORCE is set."""
+    app.config.setdefault('QUERY_BUDGET_ENFORCE', False)
+
+    @app.after_request
+    def check_query_budget(response):
+        if not current_app.config['QUERY_BUDGET_ENFORCE'] or request.endpoint is None:
+            return response
+        view = current_app.view_functions[request.endpoint]
+        budget = getattr(view, 'query_budget', None)
+        count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        if budget is not None and count > budget:
+            raise QueryBudgetExceeded(f'{request.endpoint} executed {count} SQL statements, budget is {budget}')
+        return response
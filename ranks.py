@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import func
+
+from caching import touch_board
+from changes import log_tasks
+from models import db, Task
+from sharding import use_shard
+
+# Ranks are strings over DIGITS compared bytewise, so a task can always be
+# placed between two others by writing only its own rank. No rank ends in
+# DIGITS[0]: nothing would fit between 'V' and 'V0'.
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+MIDDLE = DIGITS[BASE // 2]
+# Appends count up in the last of WIDTH digits, so a column can take millions
+# of new tasks before its ranks get longer.
+WIDTH = 4
+# A move producing a longer rank schedules a rebalance of its column.
+MAX_RANK_LENGTH = 16
+
+
+def is_rank(value):
+    return isinstance(value, str) and value != '' and value[-1] != DIGITS[0] and all(c in DIGITS for c in value)
+
+
+def _encode(digits):
+    return ''.join(DIGITS[digit] for digit in digits).rstrip(DIGITS[0])
+
+
+def rank_after(rank):
+    """Return a rank greater than ``rank`` for the end of a column."""
+    if rank is None:
+        return MIDDLE
+    digits = [DIGITS.index(c) for c in rank.ljust(WIDTH, DIGITS[0])]
+    position = len(digits) - 1
+    while position >= 0 and digits[position] == BASE - 1:
+        digits[position] = 0
+        position -= 1
+    if position < 0:
+        return rank + MIDDLE
+    digits[position] += 1
+    return _encode(digits)
+
+
+def rank_before(rank):
+    """Return a rank less than ``rank`` for the top of a column."""
+    digits = [DIGITS.index(c) for c in rank.ljust(WIDTH, DIGITS[0])]
+    position = len(digits) - 1
+    while position >= 0 and digits[position] == 0:
+        digits[position] = BASE - 1
+        position -= 1
+    if position >= 0:
+        digits[position] -= 1
+        before = _encode(digits)
+        if before:
+            return before
+    return _midpoint('', rank)
+
+
+def _midpoint(lower, upper):
+    """Shortest rank strictly between ``lower`` (may be empty) and ``upper`` (None for no bound)."""
+    if upper is not None:
+        prefix = 0
+        while (lower[prefix] if prefix < len(lower) else DIGITS[0]) == upper[prefix]:
+            prefix += 1
+        if prefix:
+            return upper[:prefix] + _midpoint(lower[prefix:], upper[prefix:])
+    low = DIGITS.index(lower[0]) if lower else 0
+    high = DIGITS.index(upper[0]) if upper is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high + 1) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[:1]
+    return DIGITS[low] + _midpoint(lower[1:], None)
+
+
+def rank_between(lower, upper):
+    """Return a rank between two neighbours; either may be None at the edge of a column."""
+    if upper is None:
+        return rank_after(lower)
+    if lower is None:
+        return rank_before(upper)
+    if lower >= upper:
+        raise ValueError(f'{lower!r} is not below {upper!r}')
+    return _midpoint(lower, upper)
+
+
+def spaced_ranks(count):
+    """``count`` increasing ranks of equal length, evenly spread so each gap fits BASE more."""
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for number in range(step, step * (count + 1), step):
+        digits = []
+        for _ in range(width):
+            number, digit = divmod(number, BASE)
+            digits.append(digit)
+        ranks.append(_encode(reversed(digits)))
+    return ranks
+
+
+def last_rank(user_id, board_id, status):
+    """Highest rank in a status column of the board, or None when the column is empty."""
+    return db.session.execute(
+        db.select(func.max(Task.rank))
+        .where(Task.board_user_id == user_id, Task.board_id == board_id, Task.status == status)).scalar()
+
+
+def last_ranks(user_id, board_id, statuses):
+    """Highest rank of each of the board's status columns in ``statuses``."""
+    return dict(db.session.execute(
+        db.select(Task.status, func.max(Task.rank))
+        .where(Task.board_user_id == user_id, Task.board_id == board_id, Task.status.in_(statuses))
+        .group_by(Task.status)).all())
+
+
+def rebalance(user_id, board_id, status):
+    """Rewrite the ranks of one column with short, evenly spaced ones, keeping its order.
+
+    The board version is bumped first, so the transaction holds the write lock
+    while it reads the column and no concurrent move is lost.
+    """
+    touch_board(user_id, board_id)
+    ids = db.session.execute(
+        db.select(Task.id)
+        .where(Task.board_user_id == user_id, Task.board_id == board_id, Task.status == status)
+        .order_by(Task.rank, Task.id)).scalars().all()
+    if ids:
+        db.session.execute(db.update(Task), [
+            {'id': task_id, 'board_id': board_id, 'board_user_id': user_id, 'rank': rank}
+            for task_id, rank in zip(ids, spaced_ranks(len(ids)))])
+        log_tasks(user_id, board_id, ids)
+    db.session.commit()
+
+
+_rebalancer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rank-rebalance')
+_pending = set()
+_pending_lock = Lock()
+
+
+def schedule_rebalance(user_id, board_id, status):
+    """Rebalance a column in the background, once however often it is requested meanwhile."""
+    app = current_app._get_current_object()
+    key = (user_id, board_id, status)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        with _pending_lock:
+            _pending.discard(key)
+        with app.app_context():
+            use_shard(user_id)
+            try:
+                rebalance(user_id, board_id, status)
+            except Exception:
+                app.logger.exception('Could not rebalance ranks of board %s', board_id)
+
+    _rebalancer.submit(run)
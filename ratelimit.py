@@ -0,0 +1,157 @@
+import sqlite3
+from collections import OrderedDict
+from math import ceil
+from threading import BoundedSemaphore, Lock, local
+from time import monotonic, time
+
+from flask import current_app, g, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+from werkzeug.utils import import_string
+
+from auth import token_user
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Policies counted per client address whatever token is sent, so that each new
+# account does not come with a fresh bucket.
+ADDRESS_POLICIES = ('signup',)
+
+
+def refill(tokens, updated, now, rate, burst):
+    """Tokens in a bucket last left with ``tokens`` at ``updated``, refilled at ``rate`` per second."""
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def spend(tokens, rate, cost):
+    """Return (tokens left, seconds to wait); a request that has to wait takes nothing."""
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryLimiter:
+    """Token buckets of one process, the ``maxsize`` most recently used ones kept.
+
+    Every worker counts on its own, so with N workers a client gets up to N
+    times the configured rate.
+    """
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Take ``cost`` tokens from the bucket of ``key``; return 0 or the seconds until they are there."""
+        now = monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, wait = spend(refill(tokens, updated, now, rate, burst), rate, cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteLimiter:
+    """Token buckets in a shared SQLite file, a local stand-in for a network store.
+
+    Every worker pointing at the same ``path`` draws from the same buckets.
+    Buckets idle for ``expire`` seconds are full again and get deleted.
+    """
+
+    def __init__(self, path, expire=3600, prune_every=1000):
+        self.path = path
+        self.expire = expire
+        self.prune_every = prune_every
+        self._local = local()
+        self._connection().execute('CREATE TABLE IF NOT EXISTS bucket ('
+                                   'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection.execute('PRAGMA journal_mode = WAL')
+            self._local.takes = 0
+        return self._local.connection
+
+    def take(self, key, rate, burst, cost=1):
+        connection = self._connection()
+        now = time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row or (burst, now)
+            tokens, wait = spend(refill(tokens, updated, now, rate, burst), rate, cost)
+            connection.execute('INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                               'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                               (key, tokens, now))
+            self._local.takes += 1
+            if self._local.takes % self.prune_every == 0:
+                connection.execute('DELETE FROM bucket WHERE updated < ?', (now - self.expire,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+def rate_limit(policy):
+    """Apply the RATE_LIMITS ``policy`` to a view instead of the read or write one."""
+    def decorator(view):
+        view.rate_limit = policy
+        return view
+    return decorator
+
+
+def client_key():
+    """The user of a valid bearer token, or the client address.
+
+    Missing and invalid tokens share the address, so made-up tokens get no
+    bucket of their own and cannot push real ones out of the limiter.
+    """
+    return user_key(token_user(), request.remote_addr)
+
+
+def user_key(user_id, address):
+    """Bucket suffix of a request by ``user_id`` (None without a valid token) from ``address``."""
+    return f'token:{user_id}' if user_id is not None else f'ip:{address}'
+
+
+def init_rate_limit(app):
+    """Reject requests over their token-bucket policy with 429 and writes over WRITE_CONCURRENCY with 503.
+
+    A view's policy is set with @rate_limit, otherwise it is 'read' for GET,
+    HEAD and OPTIONS and 'write' for the other methods.
+    """
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    limiter = import_string(app.config['RATE_LIMITER'])(**app.config['RATE_LIMITER_OPTIONS'])
+    policies = app.config['RATE_LIMITS']
+    writers = BoundedSemaphore(app.config['WRITE_CONCURRENCY'])
+    app.extensions['rate_limit'] = limiter
+
+    @app.before_request
+    def admit_request():
+        if request.endpoint is None:
+            return
+        view = current_app.view_functions[request.endpoint]
+        write = request.method not in SAFE_METHODS
+        name = getattr(view, 'rate_limit', 'write' if write else 'read')
+        policy = policies.get(name)
+        if policy:
+            key = user_key(None, request.remote_addr) if name in ADDRESS_POLICIES else client_key()
+            wait = limiter.take(f'{name}:{key}', policy['rate'], policy['burst'])
+            if wait:
+                raise TooManyRequests(retry_after=ceil(wait))
+        if write:
+            # Writes queue on SQLite's single writer anyway; past the cap a
+            # request fails fast instead of holding a connection while it waits.
+            if not writers.acquire(timeout=current_app.config['WRITE_QUEUE_TIMEOUT']):
+                raise ServiceUnavailable(retry_after=1)
+            g.write_slot = True
+
+    @app.teardown_request
+    def release_write_slot(exc):
+        if g.pop('write_slot', False):
+            writers.release()
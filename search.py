@@ -0,0 +1,249 @@
+import re
+
+import click
+from flask import Blueprint, abort, request
+from sqlalchemy import Double, case, column, event, func, literal_column, table, text, tuple_
+
+from auth import require_authorization
+from models import db, Task
+from pagination import page_args
+from purge import purged_board_ids
+from query_budget import query_budget
+from serialization import TASK_COLUMNS, task_dicts
+from sharding import each_shard
+
+bp = Blueprint('search', __name__)
+
+# On SQLite task_fts is a contentless FTS5 index over task keyed by task's
+# rowid and kept in sync by the triggers created in migrations.py; its owner
+# column holds hex(board_user_id). On PostgreSQL task has a generated
+# search_vector column with a GIN index.
+task_fts = table('task_fts', column('rowid'))
+search_vector = literal_column('task.search_vector')
+WORD = re.compile(r'[^\W_]+')
+TERM = re.compile(r'([^\W_]+)(\*?)')
+# Weights of the title and description columns.
+RANK_WEIGHTS = (10.0, 1.0)
+
+
+def user_scope(user_id):
+    """Term prefix of a user's words; ids from signup are hex, anything else is hex-encoded."""
+    return user_id if user_id.isalnum() else user_id.encode().hex()
+
+
+def search_terms(user_id, text):
+    """Indexed form of ``text`` in the first task_fts: each word becomes one ``<user>_<word>`` token.
+
+    Only the triggers of the migrations before 'index task search by owner in
+    SQL' call it, so a fresh database still migrates.
+    """
+    if text is None:
+        return None
+    scope = user_scope(user_id)
+    return ' '.join(f'{scope}_{word}' for word in WORD.findall(text))
+
+
+def match_expression(user_id, q, columns='{title description}'):
+    """Build an FTS5 query matching every word of ``q`` in the ``columns`` of the user's tasks.
+
+    Only word characters are kept, so user input can never be FTS5 syntax;
+    a trailing ``*`` makes a word a prefix. Returns None when ``q`` has no words.
+    """
+    terms = ' '.join(f'"{word}"{star}' for word, star in TERM.findall(q))
+    if not terms:
+        return None
+    # FTS5 advances the word postings to the owner's rowids, so a query reads
+    # little more than the user's own tasks.
+    return f'owner : "{user_id.encode().hex()}" AND {columns} : ({terms})'
+
+
+def tsquery_expression(q):
+    """The PostgreSQL counterpart of match_expression(), for to_tsquery('simple', ...)."""
+    terms = ' & '.join(f'{word}:*' if star else word for word, star in TERM.findall(q))
+    return terms or None
+
+
+def fts5_matches(user_id, q, board_id):
+    """Subquery of the user's tasks matching ``q`` with a ``score``, lower is better, or None when ``q`` has no words."""
+    expression = match_expression(user_id, q)
+    if expression is None:
+        return None
+    fts = literal_column('task_fts')
+    # Each word found in the title or the description adds that column's
+    # weight. Unlike bm25, the score depends on the task alone, so writes to
+    # other tasks cannot reorder the pages a cursor walks through.
+    def found(term, name):
+        rowids = db.select(task_fts.c.rowid).correlate(None).where(
+            fts.op('MATCH')(match_expression(user_id, term, name)))
+        return task_fts.c.rowid.in_(rowids)
+
+    score = sum(case((found(word + star, name), weight), else_=0.0)
+                for word, star in TERM.findall(q) for name, weight in zip(('title', 'description'), RANK_WEIGHTS))
+    matches = (db.select(*TASK_COLUMNS, (-score).label('score'))
+               .select_from(task_fts).join(Task, literal_column('task.rowid') == task_fts.c.rowid)
+               # The owner column already selects the user's rows; the owner check guards it.
+               .where(fts.op('MATCH')(expression), Task.board_user_id == user_id,
+                      Task.board_id.not_in(purged_board_ids(user_id))))
+    if board_id is not None:
+        matches = matches.where(Task.board_id == board_id)
+    return matches.subquery()
+
+
+def tsvector_matches(user_id, q, board_id):
+    """PostgreSQL version of fts5_matches(), scored by ts_rank negated."""
+    expression = tsquery_expression(q)
+    if expression is None:
+        return None
+    query = func.to_tsquery('simple', expression)
+    title, description = RANK_WEIGHTS
+    # ts_rank takes the weights of the D, C, B and A labels, each at most 1.
+    weights = literal_column(f"'{{0, 0, {description / title}, 1}}'::float4[]")
+    # ts_rank is a real; as a double its text form, and so the cursor, is exact.
+    score = db.cast(-func.ts_rank(weights, search_vector, query), Double)
+    matches = (db.select(*TASK_COLUMNS, score.label('score'))
+               .where(Task.board_user_id == user_id, search_vector.op('@@')(query),
+                      Task.board_id.not_in(purged_board_ids(user_id))))
+    if board_id is not None:
+        matches = matches.where(Task.board_id == board_id)
+    return matches.subquery()
+
+
+def ranked_page(matches, limit, after=None):
+    """Query of the ``limit`` best ``matches`` after the ``(score, board_id, id)`` of ``after``, plus one more."""
+    key = (matches.c.score, matches.c.board_id, matches.c.id)
+    query = db.select(*(matches.c[column.key] for column in TASK_COLUMNS), matches.c.score)
+    if after is not None:
+        query = query.where(tuple_(*key) > tuple_(*after))
+    return query.order_by(*key).limit(limit + 1)
+
+
+def parse_cursor(cursor):
+    """Return the ``(score, board_id, id)`` encoded in an X-Next-Cursor, raising ValueError on anything else."""
+    score, board_id, task_id = cursor.split(',')
+    return float(score), int(board_id), int(task_id)
+
+
+def register_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function('search_terms', 2, search_terms, deterministic=True)
+
+
+def rebuild_index():
+    """Rebuild task_fts from task; needed after a VACUUM, which may renumber the rowids.
+
+    PostgreSQL maintains search_vector itself, so there is nothing to rebuild.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.session.execute(text("INSERT INTO task_fts (task_fts) VALUES ('delete-all')"))
+    db.session.execute(text(
+        'INSERT INTO task_fts (rowid, title, description, owner) '
+        'SELECT rowid, title, description, hex(board_user_id) FROM task'))
+    db.session.commit()
+
+
+def init_search(app):
+    """Provide search_terms() to the SQLite connections the early migrations run on."""
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', register_functions)
+
+    @app.cli.command('reindex-search')
+    def reindex_search_command():
+        """Rebuild the full-text index of tasks."""
+        for _ in each_shard():
+            rebuild_index()
+        click.echo('Task search index rebuilt.')
+
+
+@bp.get('/api/tasks/search')
+@query_budget(2)
+def handle_search_tasks():
+    """Найти задачи пользователя по названию и описанию
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: >
+            Слова, которые должны встречаться в названии или описании задачи.
+            Слово со звёздочкой на конце ищется как префикс, например "молок*"
+      - name: board_id
+        in: query
+        type: integer
+        description: Искать только в этой доске
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+      - name: cursor
+        in: query
+        type: string
+        description: Значение заголовка X-Next-Cursor предыдущей страницы
+    responses:
+      200:
+        description: >
+            Страница задач, самые подходящие первыми (совпадения в названии важнее).
+            Ранжируются все совпадения; следующая страница продолжается после
+            последней задачи предыдущей, так что записи между запросами её не сдвигают
+        headers:
+            X-Next-Cursor:
+                type: string
+                description: Курсор следующей страницы, если она есть
+        schema:
+            type: array
+            items:
+                type: object
+                properties:
+                    id:
+                        type: string
+                    title:
+                        type: string
+                    description:
+                        type: string
+                    status:
+                        type: string
+                    board_id:
+                        type: integer
+                    board_user_id:
+                        type: string
+                    rank:
+                        type: string
+                        description: позиция в колонке статуса, по ней задачи сортируются
+      400:
+        description: Пустой запрос или неправильные limit, cursor, board_id
+      401:
+        description: Неправильный токен
+    """
+    user_id = require_authorization()
+    args = request.args.copy()
+    cursor = args.pop('cursor', None)
+    limit, _ = page_args(args=args)
+    board_id = None
+    if 'board_id' in args:
+        board_id = args.get('board_id', type=int)
+        if board_id is None:
+            abort(400)
+    try:
+        after = None if cursor is None else parse_cursor(cursor)
+    except ValueError:
+        abort(400, description='Bad cursor')
+    matches = fts5_matches if db.engine.dialect.name == 'sqlite' else tsvector_matches
+    matches = matches(user_id, args.get('q', ''), board_id)
+    if matches is None:
+        abort(400)
+    # Every match is scored; the page resumes after the previous one's last
+    # task, so tasks written meanwhile do not shift it.
+    tasks = task_dicts(db.session.execute(ranked_page(matches, limit, after)))
+    scores = [task.pop('score') for task in tasks]
+    if len(tasks) <= limit:
+        return tasks
+    last = tasks[limit - 1]
+    return tasks[:limit], {'X-Next-Cursor': f'{scores[limit - 1]!r},{last["board_id"]},{last["id"]}'}
@@ -0,0 +1,83 @@
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+from models import db, Task
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TASK_COLUMNS = (Task.id, Task.title, Task.description, Task.status, Task.board_id, Task.board_user_id, Task.rank)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encodes with orjson when it is installed and with the stdlib json module otherwise.
+
+    Keys are emitted in insertion order; the models already build them in a stable one.
+    """
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def dumpb(self, obj):
+        if orjson is None:
+            return super().dumps(obj, separators=(',', ':')).encode()
+        return orjson.dumps(obj, default=self.default)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=option),
+                                        mimetype=self.mimetype)
+
+
+def task_rows(user_id, board_id):
+    """Column-only query for a board's tasks, cheaper than hydrating Task objects."""
+    return (db.select(*TASK_COLUMNS)
+            .where(Task.board_user_id == user_id, Task.board_id == board_id)
+            .order_by(Task.id))
+
+
+def task_dicts(rows):
+    return [row._asdict() for row in rows]
+
+
+def dumpb(obj):
+    json = current_app.json
+    return json.dumpb(obj) if hasattr(json, 'dumpb') else json.dumps(obj).encode()
+
+
+# A streamed board is board_head(), then a tasks_chunk() per partition of rows, then BOARD_TAIL.
+BOARD_TAIL = b']}\n'
+
+
+def board_head(board, encode=dumpb):
+    return encode(board)[:-1] + b',"tasks":['
+
+
+def tasks_chunk(rows, first, encode=dumpb):
+    chunk = encode(task_dicts(rows))[1:-1]
+    return chunk if first else b',' + chunk
+
+
+def stream_board(board, query, chunk_size=1000):
+    """Yield the JSON of ``board`` with its ``tasks`` array encoded ``chunk_size`` rows at a time."""
+    yield board_head(board)
+    first = True
+    for rows in db.session.execute(query.execution_options(yield_per=chunk_size)).partitions():
+        yield tasks_chunk(rows, first)
+        first = False
+    yield BOARD_TAIL
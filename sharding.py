@@ -0,0 +1,219 @@
+from contextlib import contextmanager
+from hashlib import blake2b
+from threading import Lock
+from time import monotonic, sleep
+
+import click
+from flask import current_app, g, request
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.exceptions import ServiceUnavailable
+
+from models import db, ArchivedTask, Board, ChangeLog, IdSequence, Task, User, UserShard
+
+# Tables holding a user's data, in the order they are copied; they are
+# deleted from in reverse.
+USER_TABLES = ((User.__table__, User.id), (Board.__table__, Board.user_id),
+               (IdSequence.__table__, IdSequence.user_id), (ChangeLog.__table__, ChangeLog.user_id),
+               (Task.__table__, Task.board_user_id), (ArchivedTask.__table__, ArchivedTask.board_user_id))
+COPY_CHUNK = 1000
+
+
+def shard_key(index):
+    """Bind key of a shard's engine."""
+    return f'shard{index}'
+
+
+def hash_shard(user_id, count):
+    """Shard a user lands on by default: rendezvous hashing, so adding a shard only moves the users it wins."""
+    return max(range(count), key=lambda index: blake2b(f'{index}:{user_id}'.encode(), digest_size=8).digest())
+
+
+class Shards:
+    """The shard engines and where each user lives.
+
+    Users live on their hash_shard() unless the user_shard table of the
+    directory database places them elsewhere. Every process keeps a copy of
+    that table, refreshed with the rows changed since it last looked once the
+    copy is ``ttl`` seconds old.
+    """
+
+    def __init__(self, directory, engines, ttl=2.0):
+        self.directory = directory
+        self.engines = engines
+        self.ttl = ttl
+        self._placements = {}
+        self._revision = 0
+        self._fresh_until = 0.0
+        self._lock = Lock()
+
+    def refresh(self):
+        with self._lock:
+            with self.directory.connect().execution_options(skip_query_budget=True) as connection:
+                rows = connection.execute(
+                    select(UserShard.user_id, UserShard.shard, UserShard.moving, UserShard.revision)
+                    .where(UserShard.revision > self._revision).order_by(UserShard.revision)).all()
+            for user_id, shard, moving, revision in rows:
+                self._placements[user_id] = (shard, moving)
+                self._revision = revision
+            self._fresh_until = monotonic() + self.ttl
+
+    def locate(self, user_id):
+        """Return the index of the user's shard and whether the user is being moved off it."""
+        if monotonic() >= self._fresh_until:
+            self.refresh()
+        return self._placements.get(user_id, (hash_shard(user_id, len(self.engines)), False))
+
+    def place(self, placements, moving=False):
+        """Record ``placements``, a dict of user id to shard index, in the directory."""
+        insert = postgresql.insert if self.directory.dialect.name == 'postgresql' else sqlite.insert
+        with self.directory.begin() as connection:
+            revision = connection.execute(select(func.coalesce(func.max(UserShard.revision), 0))).scalar()
+            for number, (user_id, shard) in enumerate(placements.items(), revision + 1):
+                connection.execute(
+                    insert(UserShard).values(user_id=user_id, shard=shard, moving=moving, revision=number)
+                    .on_conflict_do_update(index_elements=['user_id'],
+                                           set_={'shard': shard, 'moving': moving, 'revision': number}))
+        self.refresh()
+
+    def wait(self):
+        """Sleep until every process routes by what place() just recorded, and requests routed before have ended."""
+        sleep(self.ttl + 1)
+
+    def move(self, targets):
+        """Move users to other shards, ``targets`` being a dict of user id to shard index.
+
+        The users are flagged as moving, which turns their writes away with
+        503, then copied, switched over and finally deleted from their old
+        shard; reads are served throughout.
+        """
+        sources = {user_id: self.locate(user_id)[0] for user_id in targets}
+        targets = {user_id: shard for user_id, shard in targets.items() if shard != sources[user_id]}
+        if not targets:
+            return 0
+        self.place({user_id: sources[user_id] for user_id in targets}, moving=True)
+        self.wait()
+        for user_id, shard in targets.items():
+            with self.engines[sources[user_id]].connect() as source, self.engines[shard].begin() as target:
+                delete_user(target, user_id)
+                copy_user(source, target, user_id)
+        self.place(targets)
+        self.wait()
+        for user_id in targets:
+            with self.engines[sources[user_id]].begin() as source:
+                delete_user(source, user_id)
+        return len(targets)
+
+    def rebalance(self):
+        """Move every user to their hash_shard(), after SHARDS changed; return how many moved.
+
+        A user found on a shard the map does not route to is either left
+        behind by an interrupted move, and deleted there, or was there before
+        that shard was known, and is recorded where it is before moving.
+        """
+        found = {}
+        for index, engine in enumerate(self.engines):
+            with engine.connect() as connection:
+                for user_id in connection.execute(select(User.id)).scalars():
+                    found.setdefault(user_id, []).append(index)
+        adopted, leftovers = {}, []
+        for user_id, indexes in found.items():
+            located = self.locate(user_id)[0]
+            if located not in indexes:
+                adopted[user_id] = indexes[0]
+            leftovers += [(user_id, index) for index in indexes if index != adopted.get(user_id, located)]
+        if adopted:
+            self.place(adopted)
+        for user_id, index in leftovers:
+            with self.engines[index].begin() as connection:
+                delete_user(connection, user_id)
+        return self.move({user_id: hash_shard(user_id, len(self.engines)) for user_id in found})
+
+
+def copy_user(source, target, user_id):
+    for table, owner in USER_TABLES:
+        query = select(table).where(owner == user_id)
+        if source.dialect.name == 'sqlite':
+            # Search breaks ties by rowid, so rows keep their relative order.
+            query = query.order_by(literal_column('rowid'))
+        rows = source.execute(query.execution_options(yield_per=COPY_CHUNK))
+        for chunk in rows.partitions():
+            target.execute(table.insert(), [row._asdict() for row in chunk])
+
+
+def delete_user(connection, user_id):
+    for table, owner in reversed(USER_TABLES):
+        connection.execute(table.delete().where(owner == user_id))
+
+
+def use_shard(user_id):
+    """Route the session to the shard of ``user_id``; a no-op without SHARDS."""
+    shards = current_app.extensions.get('shards')
+    if shards is not None:
+        g.shard = shards.engines[shards.locate(user_id)[0]]
+
+
+def shard_engines():
+    shards = current_app.extensions.get('shards')
+    return shards.engines if shards is not None else [db.engine]
+
+
+@contextmanager
+def on_shard(engine):
+    """Route the session to ``engine`` within the block; commit before leaving it."""
+    previous = g.get('shard')
+    g.shard = engine
+    try:
+        yield engine
+    finally:
+        g.shard = previous
+
+
+def each_shard():
+    """Route the session to every shard in turn, for jobs that cover all users."""
+    for engine in shard_engines():
+        with on_shard(engine):
+            yield engine
+
+
+def init_sharding(app):
+    """Route every request carrying a bearer token to its user's shard when SHARDS is set."""
+    if app.config['SHARDS']:
+        with app.app_context():
+            app.extensions['shards'] = Shards(db.engine, [db.engines[shard_key(index)]
+                                                          for index in range(len(app.config['SHARDS']))],
+                                              app.config['SHARD_MAP_TTL'])
+
+    @app.before_request
+    def route_to_shard():
+        shards = current_app.extensions.get('shards')
+        parts = request.headers.get('Authorization', '').split()
+        if shards is None or len(parts) != 2:
+            return
+        index, moving = shards.locate(parts[1])
+        if moving and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            raise ServiceUnavailable(description='The account is being moved', retry_after=1)
+        g.shard = shards.engines[index]
+
+    @app.cli.group('shards')
+    def shards_command():
+        """Place users on the databases listed in SHARDS."""
+
+    @shards_command.command('move')
+    @click.argument('user_id')
+    @click.argument('shard', type=int)
+    def move_command(user_id, shard):
+        """Move a user to shard number SHARD."""
+        shards = current_app.extensions.get('shards')
+        if shards is None or not 0 <= shard < len(shards.engines):
+            raise click.UsageError(f'SHARD must be below the {len(shard_engines())} configured shards')
+        moved = shards.move({user_id: shard})
+        click.echo(f'Moved {moved} users.')
+
+    @shards_command.command('rebalance')
+    def rebalance_command():
+        """Move every user to the shard their token hashes to."""
+        shards = current_app.extensions.get('shards')
+        if shards is None:
+            raise click.UsageError('SHARDS is not set')
+        click.echo(f'Moved {shards.rebalance()} users.')
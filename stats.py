@@ -0,0 +1,164 @@
+import click
+from flask import Blueprint
+from sqlalchemy import literal, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from auth import require_authorization
+from caching import cache_headers, etag, not_modified
+from models import db, Board, Task, TaskCount
+from purge import board_or_404
+from query_budget import query_budget
+from sharding import each_shard
+
+bp = Blueprint('stats', __name__)
+
+
+def status_counts(rows):
+    """Fold (status, count) rows into the stats of one board."""
+    statuses = {str(status): count for status, count in rows if status is not None}
+    return {'total': sum(statuses.values()), 'statuses': statuses}
+
+
+def recount():
+    """Query counting every board's tasks per status from the task table itself."""
+    return (db.select(Task.board_user_id, Task.board_id, Task.status, literal(0).label('stored'),
+                      db.func.count().label('actual'))
+            .group_by(Task.board_user_id, Task.board_id, Task.status))
+
+
+def check_counts(repair=False):
+    """Compare task_count with a full recount and return the differing (key, stored, actual) triples.
+
+    One statement reads both, so they come from the same snapshot on either
+    database. With ``repair`` each differing counter is moved by the
+    difference, which stays right when the triggers changed it meanwhile.
+    """
+    stored = db.select(TaskCount.board_user_id, TaskCount.board_id, TaskCount.status,
+                       TaskCount.count.label('stored'), literal(0).label('actual'))
+    both = union_all(stored, recount()).subquery()
+    key = (both.c.board_user_id, both.c.board_id, both.c.status)
+    rows = db.session.execute(
+        db.select(*key, db.func.sum(both.c.stored), db.func.sum(both.c.actual))
+        .group_by(*key).having(db.func.sum(both.c.stored) != db.func.sum(both.c.actual))
+        .order_by(*key)).all()
+    mismatches = [((user_id, board_id, status), stored, actual) for user_id, board_id, status, stored, actual in rows]
+    if repair and mismatches:
+        insert = (postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert)(TaskCount)
+        db.session.execute(
+            insert.on_conflict_do_update(index_elements=['board_user_id', 'board_id', 'status'],
+                                         set_={'count': TaskCount.count + insert.excluded.count}),
+            [{'board_user_id': user_id, 'board_id': board_id, 'status': status, 'count': actual - stored}
+             for (user_id, board_id, status), stored, actual in mismatches])
+    db.session.commit()
+    return mismatches
+
+
+def init_stats(app):
+    @app.cli.command('check-stats')
+    @click.option('--repair', is_flag=True, help='Rewrite the counters from the recount.')
+    def check_stats_command(repair):
+        """Verify the per-status task counters against a full recount."""
+        mismatches = []
+        for _ in each_shard():
+            mismatches += check_counts(repair=repair)
+        for (user_id, board_id, status), stored, actual in mismatches:
+            click.echo(f'user {user_id} board {board_id} status {status}: counted {stored}, actually {actual}')
+        if not mismatches:
+            click.echo('Task counters match the tasks.')
+        elif repair:
+            click.echo(f'Repaired {len(mismatches)} task counters.')
+        else:
+            raise click.exceptions.Exit(1)
+
+
+@bp.get('/api/boards/stats')
+@query_budget(2)
+def handle_boards_stats():
+    """Получить количество задач по статусам во всех досках
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+    responses:
+      200:
+        description: Статистика каждой доски пользователя, по возрастанию id
+        schema:
+            type: array
+            items:
+                type: object
+                properties:
+                    id:
+                        type: integer
+                    total:
+                        type: integer
+                    statuses:
+                        type: object
+                        description: статус -> количество задач, статусы без задач не указываются
+      401:
+        description: Неправильный токен
+    """
+    user_id = require_authorization()
+    rows = db.session.execute(
+        db.select(Board.id, TaskCount.status, TaskCount.count)
+        .outerjoin(TaskCount, (TaskCount.board_user_id == Board.user_id) & (TaskCount.board_id == Board.id))
+        .where(Board.user_id == user_id, Board.deleted.is_(False))
+        .order_by(Board.id, TaskCount.status))
+    boards = {}
+    for board_id, status, count in rows:
+        boards.setdefault(board_id, []).append((status, count))
+    return [{'id': board_id, **status_counts(counts)} for board_id, counts in boards.items()]
+
+
+@bp.get('/api/boards/<int:board_id>/stats')
+@query_budget(3)
+def handle_board_stats(board_id):
+    """Получить количество задач доски по статусам
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: board_id
+        in: path
+        type: integer
+        required: true
+      - name: If-None-Match
+        in: header
+        type: string
+        description: ETag из предыдущего ответа
+    responses:
+      200:
+        description: Статистика доски
+        schema:
+            type: object
+            properties:
+                id:
+                    type: integer
+                total:
+                    type: integer
+                statuses:
+                    type: object
+                    description: статус -> количество задач, статусы без задач не указываются
+      304:
+        description: Не изменилось с переданного ETag
+      401:
+        description: Неправильный токен
+      404:
+        description: Доски не существует
+    """
+    user_id = require_authorization()
+    board = board_or_404(user_id, board_id)
+    tag = etag(user_id, 'stats', board.id, board.version)
+    response = not_modified(tag)
+    if response:
+        return response
+    rows = db.session.execute(
+        db.select(TaskCount.status, TaskCount.count)
+        .where(TaskCount.board_user_id == user_id, TaskCount.board_id == board_id)
+        .order_by(TaskCount.status))
+    return {'id': board_id, **status_counts(rows)}, cache_headers(tag)
@@ -0,0 +1,12 @@
+def signup(client):
+    """Create a user and return the headers authorizing as them."""
+    return {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+
+
+def create_tasks(client, headers, board_id, statuses):
+    """Create one task per status in ``statuses`` with a batch and return them."""
+    response = client.post(f'/api/boards/{board_id}/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': f'task {number}', 'description': 'description', 'status': status}
+        for number, status in enumerate(statuses)]})
+    assert response.status_code == 200, response.data
+    return response.json
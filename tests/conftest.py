@@ -0,0 +1,75 @@
+"""Fixtures running every test once on SQLite and once on PostgreSQL.
+
+PostgreSQL is the server at POSTGRES_URL, an administrative URL as for
+benchmarks.backends, or a throwaway cluster when initdb is on PATH; without
+either its cases are skipped.
+"""
+import itertools
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from main import create_app
+from migrations import upgrade_all
+from tests import signup
+from tests.postgres import Postgres, postgres_server
+
+
+@pytest.fixture(scope='session')
+def postgres():
+    with TemporaryDirectory() as workdir, postgres_server(os.environ.get('POSTGRES_URL'), workdir) as admin_url:
+        if admin_url is None:
+            yield None
+            return
+        server = Postgres(admin_url)
+        try:
+            yield server
+        finally:
+            server.close()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def new_database(request, tmp_path, postgres):
+    """Return a factory of empty databases on the backend under test."""
+    if request.param == 'sqlite':
+        numbers = itertools.count()
+        return lambda: f'sqlite:///{tmp_path}/{next(numbers)}.db'
+    if postgres is None:
+        pytest.skip('no PostgreSQL server: set POSTGRES_URL or put initdb on PATH')
+    return postgres.database
+
+
+@pytest.fixture
+def make_config(new_database):
+    """Return a factory of app configs on fresh databases that fail any request over its query budget."""
+    def make(**config):
+        return {'SQLALCHEMY_DATABASE_URI': new_database(), 'SWAGGER_ENABLED': False, 'RATE_LIMIT_ENABLED': False,
+                'QUERY_BUDGET_ENFORCE': True, 'SYNC_COMPACT_INTERVAL': 10 ** 9, **config}
+    return make
+
+
+@pytest.fixture
+def make_app(make_config):
+    """Return a factory of apps on fresh, migrated databases; keyword arguments override the config."""
+    def make(**config):
+        app = create_app(make_config(**config))
+        with app.app_context():
+            upgrade_all()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def headers(client):
+    return signup(client)
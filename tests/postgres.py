@@ -0,0 +1,69 @@
+"""Scratch PostgreSQL databases for the tests and benchmarks.
+
+Needs the packages in requirements-postgres.txt.
+"""
+import os
+import shutil
+import socket
+import subprocess
+from contextlib import contextmanager
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_postgres(workdir):
+    """Start a scratch PostgreSQL cluster in ``workdir`` and yield its administrative URL, or None."""
+    initdb, pg_ctl = shutil.which('initdb'), shutil.which('pg_ctl')
+    if initdb is None or pg_ctl is None:
+        yield None
+        return
+    data, port = os.path.join(workdir, 'pgdata'), free_port()
+    subprocess.run([initdb, '-D', data, '-U', 'postgres', '--auth=trust', '-E', 'UTF8'],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, '-D', data, '-l', os.path.join(workdir, 'postgres.log'), '-w', 'start',
+                    '-o', f'-p {port} -k {workdir} -c listen_addresses=127.0.0.1'],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield f'postgresql+psycopg://postgres@127.0.0.1:{port}/postgres'
+    finally:
+        subprocess.run([pg_ctl, '-D', data, '-m', 'fast', 'stop'], stdout=subprocess.DEVNULL)
+
+
+@contextmanager
+def postgres_server(url, workdir):
+    if url is not None:
+        yield url
+    else:
+        with local_postgres(workdir) as url:
+            yield url
+
+
+class Postgres:
+    """Creates scratch databases on a PostgreSQL server and drops them on close()."""
+
+    def __init__(self, admin_url):
+        self.admin_url = make_url(admin_url).set(drivername='postgresql+psycopg')
+        self.engine = create_engine(self.admin_url, isolation_level='AUTOCOMMIT')
+        self.names = []
+
+    def database(self):
+        name = f'kanban_{uuid4().hex[:12]}'
+        with self.engine.connect() as connection:
+            connection.execute(text(f'CREATE DATABASE {name}'))
+        self.names.append(name)
+        return self.admin_url.set(database=name).render_as_string(hide_password=False)
+
+    def close(self):
+        with self.engine.connect() as connection:
+            for name in self.names:
+                connection.execute(text(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)'))
+        self.engine.dispose()
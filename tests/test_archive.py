@@ -0,0 +1,74 @@
+from time import monotonic, sleep
+
+import pytest
+
+from tests import create_tasks
+
+DONE = 2
+
+
+@pytest.fixture
+def tasks(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    return create_tasks(client, headers, 1, [DONE, 0, DONE, 1, DONE])
+
+
+def archive(client, headers, query=f'status={DONE}&older_than=0'):
+    return client.post(f'/api/boards/1/archive?{query}', headers=headers)
+
+
+def test_archive_moves_done_tasks_out_of_the_board(client, headers, tasks):
+    response = archive(client, headers)
+    assert response.status_code == 200 and response.json == {'archived': 3}
+    assert [task['id'] for task in client.get('/api/boards/1', headers=headers).json['tasks']] == [2, 4]
+    archived = client.get('/api/boards/1/archive', headers=headers).json
+    assert [{key: value for key, value in task.items() if key != 'archived_at'} for task in archived] == \
+        [task for task in tasks if task['status'] == DONE]
+    assert all(isinstance(task['archived_at'], int) for task in archived)
+    assert client.get('/api/boards/1/stats', headers=headers).json['statuses'] == {'0': 1, '1': 1}
+    assert {task['id'] for task in client.get('/api/tasks/search?q=task', headers=headers).json} == {2, 4}
+    assert archive(client, headers).json == {'archived': 0}
+
+
+def test_recent_tasks_stay(client, headers, tasks):
+    assert archive(client, headers, f'status={DONE}&older_than=3600').json == {'archived': 0}
+    assert len(client.get('/api/boards/1', headers=headers).json['tasks']) == 5
+
+
+def test_archive_pages(client, headers, tasks):
+    archive(client, headers)
+    first = client.get('/api/boards/1/archive?limit=2', headers=headers)
+    rest = client.get(f'/api/boards/1/archive?cursor={first.headers["X-Next-Cursor"]}', headers=headers)
+    assert [task['id'] for task in first.json + rest.json] == [1, 3, 5]
+
+
+def test_big_backlog_finishes_in_the_background(make_app):
+    app = make_app(ARCHIVE_CHUNK=2, ARCHIVE_PAUSE=0)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    create_tasks(client, headers, 1, [DONE] * 7)
+    response = archive(client, headers)
+    assert response.status_code == 202 and response.json == {'archived': 2}
+    deadline = monotonic() + 10
+    while client.get('/api/boards/1', headers=headers).json['tasks'] and monotonic() < deadline:
+        sleep(0.05)
+    assert len(client.get('/api/boards/1/archive', headers=headers).json) == 7
+
+
+def test_archive_needs_a_status(client, headers, tasks):
+    assert archive(client, headers, 'older_than=0').status_code == 400
+    assert archive(client, headers, f'status={DONE}&older_than=-1').status_code == 400
+
+
+@pytest.mark.parametrize('query', ['status=abc&older_than=0', f'status={DONE}&older_than=soon', 'status=&older_than=0'])
+def test_bad_integers_are_rejected(make_app, query):
+    app = make_app(ARCHIVE_STATUS=DONE, ARCHIVE_AFTER=0)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {client.post("/api/signup").json["token"]}'}
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    create_tasks(client, headers, 1, [DONE, 0])
+    assert archive(client, headers, query).status_code == 400
+    assert len(client.get('/api/boards/1', headers=headers).json['tasks']) == 2
+    assert archive(client, headers, '').json == {'archived': 1}
+    assert client.post('/api/boards/9/archive?status=2', headers=headers).status_code == 404
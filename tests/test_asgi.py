@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from main import create_app
+from migrations import upgrade_all
+
+# The ASGI mode needs the packages in requirements-asgi.txt.
+TestClient = pytest.importorskip('starlette.testclient').TestClient
+create_asgi_app = pytest.importorskip('asgi').create_asgi_app
+
+
+@pytest.fixture
+def make_asgi(make_config):
+    """Return a factory of ASGI apps on fresh, migrated databases."""
+    def make(**config):
+        return create_asgi_app(migrated_config(make_config(**config)))
+    return make
+
+
+def migrated_config(config):
+    app = create_app(config)
+    with app.app_context():
+        upgrade_all()
+    return config
+
+
+@pytest.fixture
+def asgi(make_asgi):
+    with TestClient(make_asgi()) as client:
+        yield client
+
+
+@pytest.fixture
+def headers(asgi):
+    return {'Authorization': f'Bearer {asgi.post("/api/signup").json()["token"]}'}
+
+
+@pytest.fixture
+def board(asgi, headers):
+    asgi.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    asgi.post('/api/boards/create', headers=headers, json={'name': 'b'})
+    return asgi.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': f'task {number}', 'description': 'd', 'status': number % 2}
+        for number in range(5)]}).json()
+
+
+def test_native_routes_answer_like_flask(asgi, headers, board):
+    user_id = headers['Authorization'].split()[1]
+    boards = asgi.get('/api/boards', headers=headers)
+    assert boards.json() == [{'id': 1, 'name': 'a', 'user_id': user_id}, {'id': 2, 'name': 'b', 'user_id': user_id}]
+    detail = asgi.get('/api/boards/1', headers=headers)
+    assert detail.json() == {'id': 1, 'name': 'a', 'user_id': user_id, 'tasks': board}
+    assert json.loads(asgi.get('/api/boards/1?stream=1', headers=headers).content) == detail.json()
+    page = asgi.get('/api/boards/1/tasks?status=1&limit=1', headers=headers)
+    assert page.json() == [board[1]] and page.headers['X-Next-Cursor']
+    rest = asgi.get(f'/api/boards/1/tasks?status=1&cursor={page.headers["X-Next-Cursor"]}', headers=headers)
+    assert rest.json() == [board[3]]
+
+
+def test_native_routes_revalidate(asgi, headers, board):
+    for path in ('/api/boards', '/api/boards/1'):
+        response = asgi.get(path, headers=headers)
+        assert response.headers['Vary'].startswith('Authorization')
+        assert asgi.get(path, headers={**headers, 'If-None-Match': response.headers['ETag']}).status_code == 304
+    asgi.post('/api/boards/1/tasks/1/edit', headers=headers, json={'title': 'edited'})
+    assert asgi.get('/api/boards/1', headers={**headers, 'If-None-Match': response.headers['ETag']}).status_code == 200
+
+
+def test_native_routes_reject_bad_requests(asgi, headers, board):
+    assert asgi.get('/api/boards').status_code == 401
+    assert asgi.get('/api/boards', headers={'Authorization': 'Bearer nobody'}).status_code == 401
+    assert asgi.get('/api/boards/9', headers=headers).status_code == 404
+    assert asgi.get('/api/boards/1/tasks?status=x', headers=headers).status_code == 400
+    assert asgi.get('/api/boards?limit=0', headers=headers).status_code == 400
+
+
+def test_native_routes_are_rate_limited_and_instrumented(make_asgi):
+    limits = {'signup': {'rate': 1, 'burst': 10}, 'read': {'rate': 0.001, 'burst': 2},
+              'write': {'rate': 1, 'burst': 10}}
+    with TestClient(make_asgi(RATE_LIMIT_ENABLED=True, RATE_LIMITS=limits, INSTRUMENTATION_ENABLED=True)) as asgi:
+        headers = {'Authorization': f'Bearer {asgi.post("/api/signup").json()["token"]}'}
+        responses = [asgi.get('/api/boards', headers=headers) for _ in range(3)]
+        assert [response.status_code for response in responses] == [200, 200, 429]
+        assert 'Retry-After' in responses[2].headers
+        assert responses[0].headers['Server-Timing'] and responses[0].headers['X-Query-Count']
+        metrics = asgi.get('/metrics').text
+        assert 'http_requests_total{endpoint="/api/boards",method="GET",status="200"} 2' in metrics
+        assert 'http_requests_total{endpoint="/api/boards",method="GET",status="429"} 1' in metrics
+
+
+@pytest.mark.parametrize('path, authorized', [
+    ('/api/boards', False),
+    ('/api/boards/1', False),
+    ('/api/boards?limit=0', True),
+    ('/api/boards?cursor=x', True),
+    ('/api/boards/9', True),
+    ('/api/boards/9/tasks', True),
+    ('/api/boards/1/tasks?status=x', True),
+    ('/api/boards/1/tasks?limit=5000', True),
+])
+def test_errors_match_flask(make_config, path, authorized):
+    config = migrated_config(make_config())
+    flask = create_app(config).test_client()
+    headers = {'Authorization': f'Bearer {flask.post("/api/signup").json["token"]}'}
+    flask.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    with TestClient(create_asgi_app(config)) as asgi:
+        expected = flask.get(path, headers=headers if authorized else {})
+        response = asgi.get(path, headers=headers if authorized else {})
+    assert response.status_code == expected.status_code >= 400
+    assert response.headers['Content-Type'] == expected.headers['Content-Type']
+    assert response.content == expected.data
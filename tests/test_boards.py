@@ -0,0 +1,118 @@
+from tests import create_tasks, signup
+
+
+def test_signup_returns_a_token(client):
+    response = client.post('/api/signup')
+    assert response.status_code == 200
+    assert set(response.json) == {'token'}
+
+
+def test_requests_without_a_valid_token_are_rejected(client):
+    assert client.get('/api/boards').status_code == 401
+    assert client.get('/api/boards', headers={'Authorization': 'Bearer nobody'}).status_code == 401
+    assert client.post('/api/boards/create', json={'name': 'a'}).status_code == 401
+
+
+def test_create_list_and_get_boards(client, headers):
+    user_id = headers['Authorization'].split()[1]
+    created = client.post('/api/boards/create', headers=headers, json={'name': 'first'})
+    assert created.json == {'id': 1, 'name': 'first', 'user_id': user_id, 'tasks': []}
+    client.post('/api/boards/create', headers=headers, json={'name': 'second'})
+    assert client.post('/api/boards/create', headers=headers, json={'name': 'first'}).status_code == 400
+
+    boards = client.get('/api/boards', headers=headers).json
+    assert boards == [{'id': 1, 'name': 'first', 'user_id': user_id},
+                      {'id': 2, 'name': 'second', 'user_id': user_id}]
+    task = client.post('/api/boards/1/tasks/create', headers=headers,
+                       json={'title': 'title', 'description': 'description', 'status': 0}).json
+    board = client.get('/api/boards/1', headers=headers).json
+    assert board == {'id': 1, 'name': 'first', 'user_id': user_id, 'tasks': [task]}
+    assert client.get('/api/boards/1?stream=1', headers=headers).json == board
+    assert client.get('/api/boards/3', headers=headers).status_code == 404
+
+
+def test_users_do_not_see_each_others_boards(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'mine'})
+    other = signup(client)
+    assert client.get('/api/boards', headers=other).json == []
+    assert client.get('/api/boards/1', headers=other).status_code == 404
+    assert client.post('/api/boards/1/tasks/create', headers=other,
+                       json={'title': 't', 'description': 'd', 'status': 0}).status_code == 404
+
+
+def test_etag_revalidation(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    board = client.get('/api/boards/1', headers=headers)
+    revalidated = client.get('/api/boards/1', headers={**headers, 'If-None-Match': board.headers['ETag']})
+    assert revalidated.status_code == 304
+    create_tasks(client, headers, 1, [0])
+    changed = client.get('/api/boards/1', headers={**headers, 'If-None-Match': board.headers['ETag']})
+    assert changed.status_code == 200 and len(changed.json['tasks']) == 1
+
+    boards = client.get('/api/boards', headers=headers)
+    client.post('/api/boards/1/edit', headers=headers, json={'name': 'renamed'})
+    renamed = client.get('/api/boards', headers={**headers, 'If-None-Match': boards.headers['ETag']})
+    assert renamed.status_code == 200 and renamed.json[0]['name'] == 'renamed'
+
+
+def test_board_and_task_pages(client, headers):
+    for number in range(5):
+        client.post('/api/boards/create', headers=headers, json={'name': f'board {number}'})
+    seen, cursor = [], None
+    while True:
+        response = client.get('/api/boards?limit=2' + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        seen += [board['id'] for board in response.json]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert seen == [1, 2, 3, 4, 5]
+
+    create_tasks(client, headers, 1, [0, 1, 0, 1, 0])
+    page = client.get('/api/boards/1/tasks?status=0&limit=2', headers=headers)
+    assert [task['id'] for task in page.json] == [1, 3]
+    rest = client.get(f'/api/boards/1/tasks?status=0&cursor={page.headers["X-Next-Cursor"]}', headers=headers)
+    assert [task['id'] for task in rest.json] == [5]
+    assert client.get('/api/boards?limit=0', headers=headers).status_code == 400
+
+
+def test_delete_board_returns_it_with_its_tasks(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    tasks = create_tasks(client, headers, 1, [0, 1])
+    deleted = client.post('/api/boards/1/delete', headers=headers).json
+    assert deleted['name'] == 'a' and deleted['tasks'] == tasks
+    assert client.get('/api/boards/1', headers=headers).status_code == 404
+    assert client.get('/api/boards', headers=headers).json == []
+
+
+def test_board_deleted_in_the_background_rejects_task_writes(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    create_tasks(client, headers, 1, [0, 0, 0])
+    response = client.post('/api/boards/1/delete?background=1', headers=headers)
+    assert response.status_code == 202 and 'tasks' not in response.json
+    assert client.post('/api/boards/1/tasks/1/edit', headers=headers, json={'title': 'x'}).status_code == 404
+    assert client.post('/api/boards/1/tasks/2/move', headers=headers, json={'status': 1}).status_code == 404
+    assert client.post('/api/boards/1/tasks/3/delete', headers=headers).status_code == 404
+    # The name is free again at once.
+    assert client.post('/api/boards/create', headers=headers, json={'name': 'a'}).status_code == 200
+
+
+def test_etags_differ_between_users(client, headers):
+    other = signup(client)
+    for user in (headers, other):
+        client.post('/api/boards/create', headers=user, json={'name': 'a'})
+    for path in ('/api/boards', '/api/boards/1', '/api/boards/1/stats'):
+        mine, theirs = client.get(path, headers=headers), client.get(path, headers=other)
+        assert mine.headers['ETag'] != theirs.headers['ETag']
+        assert mine.headers['Vary'] == 'Authorization'
+        assert client.get(path, headers={**other, 'If-None-Match': mine.headers['ETag']}).status_code == 200
+        revalidated = client.get(path, headers={**headers, 'If-None-Match': mine.headers['ETag']})
+        assert revalidated.status_code == 304 and revalidated.headers['Vary'] == 'Authorization'
+
+
+def test_rename_returns_the_board_with_its_tasks(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    tasks = create_tasks(client, headers, 1, [0, 1])
+    renamed = client.post('/api/boards/1/edit', headers=headers, json={'name': 'b'})
+    assert renamed.json == {**client.get('/api/boards/1', headers=headers).json, 'name': 'b', 'tasks': tasks}
+    assert client.post('/api/boards/1/edit', headers=headers, json={'name': 'b'}).status_code == 400
+    assert client.post('/api/boards/2/edit', headers=headers, json={'name': 'c'}).status_code == 404
@@ -0,0 +1,56 @@
+import json
+
+from tests import create_tasks
+
+
+def read_events(response):
+    """Parse a finished server-sent event stream into (id, event, data) triples."""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_stream_carries_board_changes_until_it_is_deleted(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    stream = client.get('/api/boards/1/events', headers=headers, buffered=False)
+    assert stream.status_code == 200 and stream.mimetype == 'text/event-stream'
+    created = create_tasks(client, headers, 1, [0, 1])
+    edited = client.post('/api/boards/1/tasks/1/edit', headers=headers, json={'title': 'edited'}).json
+    client.post('/api/boards/1/tasks/2/delete', headers=headers)
+    renamed = client.post('/api/boards/1/edit', headers=headers, json={'name': 'b'}).json
+    client.post('/api/boards/1/delete', headers=headers)
+
+    events = read_events(stream)
+    assert [event for _, event, _ in events] == ['task.created', 'task.created', 'task.updated', 'task.deleted',
+                                                 'board.updated', 'board.deleted']
+    assert [data for _, _, data in events[:4]] == [*created, edited, {'id': 2}]
+    assert events[4][2]['name'] == renamed['name']
+    ids = [event_id for event_id, _, _ in events]
+    assert ids == sorted(ids)
+
+
+def test_resume_after_last_event_id(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    first = client.get('/api/boards/1/events', headers=headers, buffered=False)
+    create_tasks(client, headers, 1, [0])
+    client.post('/api/boards/1/delete', headers=headers)
+    (created_id, _, _), _ = read_events(first)
+
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    resumed = client.get('/api/boards/2/events', headers={**headers, 'Last-Event-ID': str(created_id)},
+                         buffered=False)
+    client.post('/api/boards/2/delete', headers=headers)
+    assert [event for _, event, _ in read_events(resumed)] == ['board.deleted']
+
+
+def test_events_of_other_boards_are_not_sent(client, headers):
+    for name in ('a', 'b'):
+        client.post('/api/boards/create', headers=headers, json={'name': name})
+    stream = client.get('/api/boards/1/events', headers=headers, buffered=False)
+    create_tasks(client, headers, 2, [0])
+    client.post('/api/boards/1/delete', headers=headers)
+    assert [event for _, event, _ in read_events(stream)] == ['board.deleted']
+    assert client.get('/api/boards/9/events', headers=headers).status_code == 404
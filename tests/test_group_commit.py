@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+from werkzeug.exceptions import NotFound
+
+from purge import board_or_404, delete_board
+from tests import signup
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_WINDOW=0.05, WRITE_CONCURRENCY=16)
+
+
+def test_concurrent_writes_share_commits(app, client):
+    users = [signup(client) for _ in range(4)]
+    for headers in users:
+        client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    writer = app.extensions['group_commit'][None]
+    batches, requests = writer.batches, writer.requests
+
+    def create(job):
+        number, headers = job
+        return app.test_client().post('/api/boards/1/tasks/create', headers=headers,
+                                      json={'title': f'task {number}', 'description': 'd', 'status': 0}).status_code
+
+    with ThreadPoolExecutor(16) as pool:
+        statuses = list(pool.map(create, [(number, users[number % 4]) for number in range(40)]))
+    assert statuses == [200] * 40
+    assert writer.requests - requests == 40 and writer.batches - batches < 40
+    for headers in users:
+        tasks = client.get('/api/boards/1', headers=headers).json['tasks']
+        assert sorted(task['id'] for task in tasks) == list(range(1, 11))
+
+
+def test_failed_request_is_rolled_back_alone(app, client):
+    headers = signup(client)
+    client.post('/api/boards/create', headers=headers, json={'name': 'taken'})
+
+    def create(name):
+        return app.test_client().post('/api/boards/create', headers=headers, json={'name': name}).status_code
+
+    names = ['taken' if number % 3 == 0 else f'board {number}' for number in range(12)]
+    with ThreadPoolExecutor(12) as pool:
+        statuses = list(pool.map(create, names))
+    assert statuses == [400 if name == 'taken' else 200 for name in names]
+    boards = client.get('/api/boards', headers=headers).json
+    assert sorted(board['name'] for board in boards) == sorted(set(names))
+
+
+def test_events_go_out_after_the_batch_commits(app, client):
+    headers = signup(client)
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    stream = client.get('/api/boards/1/events', headers=headers, buffered=False)
+    client.post('/api/boards/1/tasks/create', headers=headers, json={'title': 't', 'description': 'd', 'status': 0})
+    client.post('/api/boards/1/delete', headers=headers)
+    body = stream.get_data(as_text=True)
+    assert body.index('event: task.created') < body.index('event: board.deleted')
+
+
+def test_jobs_in_a_batch_do_not_see_each_others_stale_objects(app, client):
+    user_id = signup(client)['Authorization'].split()[1]
+    client.post('/api/boards/create', headers={'Authorization': f'Bearer {user_id}'}, json={'name': 'a'})
+    writer = app.extensions['group_commit'][None]
+    loaded = []
+
+    def delete():
+        # The set-based delete leaves the loaded board in the session.
+        loaded.append(board_or_404(user_id, 1))
+        delete_board(user_id, 1)
+
+    # Hold the writer so that both jobs below run in the same batch.
+    release = Event()
+    jobs = [writer.submit(release.wait), writer.submit(delete), writer.submit(lambda: board_or_404(user_id, 1))]
+    release.set()
+    jobs[1].result()
+    with pytest.raises(NotFound):
+        jobs[2].result()
@@ -0,0 +1,38 @@
+from tests import signup
+
+
+def create(client, headers, key, name='a'):
+    return client.post('/api/boards/create', headers={**headers, 'Idempotency-Key': key}, json={'name': name})
+
+
+def test_repeated_key_replays_the_first_response(client, headers):
+    first = create(client, headers, 'one')
+    assert first.status_code == 200 and 'Idempotent-Replayed' not in first.headers
+    repeat = create(client, headers, 'one')
+    assert repeat.status_code == 200 and repeat.headers['Idempotent-Replayed'] == 'true'
+    assert repeat.json == first.json
+    assert len(client.get('/api/boards', headers=headers).json) == 1
+
+
+def test_key_reused_for_another_request_is_rejected(client, headers):
+    create(client, headers, 'one')
+    assert create(client, headers, 'one', name='b').status_code == 422
+    assert [board['name'] for board in client.get('/api/boards', headers=headers).json] == ['a']
+
+
+def test_keys_are_per_user_and_optional(client, headers):
+    create(client, headers, 'one')
+    other = signup(client)
+    replayed = create(client, other, 'one')
+    assert replayed.status_code == 200 and 'Idempotent-Replayed' not in replayed.headers
+    # Without a key the repeat is a new request, turned away as a duplicate name.
+    assert client.post('/api/boards/create', headers=headers, json={'name': 'a'}).status_code == 400
+
+
+def test_client_errors_are_kept(client, headers):
+    assert client.post('/api/boards/1/edit', headers={**headers, 'Idempotency-Key': 'edit'},
+                       json={'name': 'b'}).status_code == 404
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    retried = client.post('/api/boards/1/edit', headers={**headers, 'Idempotency-Key': 'edit'}, json={'name': 'b'})
+    assert retried.status_code == 404 and retried.headers['Idempotent-Replayed'] == 'true'
+    assert client.get('/api/boards/1', headers=headers).json['name'] == 'a'
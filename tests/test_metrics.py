@@ -0,0 +1,75 @@
+import cProfile
+import re
+
+import pytest
+
+import instrumentation
+from tests import signup
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(INSTRUMENTATION_ENABLED=True)
+
+
+def sample(metrics, name, **labels):
+    rendered = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}{{{re.escape(rendered)}}} (\S+)$', metrics, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_requests_are_counted_per_endpoint_and_status(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    for _ in range(3):
+        client.get('/api/boards/1', headers=headers)
+    client.get('/api/boards/2', headers=headers)
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    metrics = response.get_data(as_text=True)
+    board = '/api/boards/<int:board_id>'
+    assert sample(metrics, 'http_requests_total', endpoint=board, method='GET', status='200') == 3
+    assert sample(metrics, 'http_requests_total', endpoint=board, method='GET', status='404') == 1
+    assert sample(metrics, 'http_request_duration_seconds_count', endpoint=board, method='GET') == 4
+    assert sample(metrics, 'http_request_sql_statements_count', endpoint=board) == 4
+    assert sample(metrics, 'http_request_phase_seconds_count', endpoint=board, phase='sql') == 4
+    assert '# TYPE http_request_duration_seconds histogram' in metrics
+
+
+def test_server_timing_header(client):
+    headers = signup(client)
+    timing = client.get('/api/boards', headers=headers).headers['Server-Timing']
+    assert [part.split(';')[0] for part in timing.split(', ')] == ['auth', 'sql', 'serialization', 'commit', 'total']
+
+
+def test_429s_are_counted(make_app):
+    client = make_app(INSTRUMENTATION_ENABLED=True, RATE_LIMIT_ENABLED=True,
+                      RATE_LIMITS={'signup': {'rate': 0.001, 'burst': 1}}).test_client()
+    assert [client.post('/api/signup').status_code for _ in range(2)] == [200, 429]
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert sample(metrics, 'http_requests_total', endpoint='/api/signup', method='POST', status='429') == 1
+
+
+def test_slow_requests_are_profiled_one_at_a_time(make_app, tmp_path):
+    client = make_app(INSTRUMENTATION_ENABLED=True, PROFILE_SAMPLE_RATE=1.0, PROFILE_SLOW_REQUEST=0,
+                      PROFILE_DIR=str(tmp_path)).test_client()
+    headers = signup(client)
+    assert client.get('/api/boards', headers=headers).status_code == 200
+    profiles = len(list(tmp_path.glob('*.prof')))
+    assert profiles == 2
+
+    # A request sampled while another one is profiled runs without a profiler.
+    with instrumentation._profiling:
+        assert client.get('/api/boards', headers=headers).status_code == 200
+    assert len(list(tmp_path.glob('*.prof'))) == profiles
+
+
+def test_a_profiler_that_cannot_start_does_not_fail_the_request(make_app, tmp_path, monkeypatch):
+    client = make_app(INSTRUMENTATION_ENABLED=True, PROFILE_SAMPLE_RATE=1.0, PROFILE_SLOW_REQUEST=0,
+                      PROFILE_DIR=str(tmp_path)).test_client()
+
+    def busy(self):
+        raise ValueError('Another profiling tool is already active')
+    monkeypatch.setattr(cProfile.Profile, 'enable', busy)
+    assert client.post('/api/signup').status_code == 200
+    assert not list(tmp_path.glob('*.prof'))
+    assert not instrumentation._profiling.locked()
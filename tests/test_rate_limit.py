@@ -0,0 +1,42 @@
+import pytest
+
+from tests import signup
+
+LIMITS = {
+    'signup': {'rate': 0.001, 'burst': 3},
+    'read': {'rate': 0.001, 'burst': 2},
+    'write': {'rate': 0.001, 'burst': 2},
+}
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LIMITS)
+
+
+def test_reads_past_the_burst_get_429(client, headers):
+    assert [client.get('/api/boards', headers=headers).status_code for _ in range(3)] == [200, 200, 429]
+    limited = client.get('/api/boards', headers=headers)
+    assert limited.status_code == 429 and int(limited.headers['Retry-After']) > 0
+    # Writes have their own bucket.
+    assert client.post('/api/boards/create', headers=headers, json={'name': 'a'}).status_code == 200
+
+
+def test_buckets_are_per_user(client, headers):
+    for _ in range(2):
+        client.post('/api/boards/create', headers=headers, json={'name': str(_)})
+    assert client.post('/api/boards/create', headers=headers, json={'name': 'c'}).status_code == 429
+    other = signup(client)
+    assert client.post('/api/boards/create', headers=other, json={'name': 'c'}).status_code == 200
+
+
+def test_invalid_tokens_share_the_address_bucket(client):
+    statuses = [client.get('/api/boards', headers={'Authorization': f'Bearer made-up-{number}'}).status_code
+                for number in range(3)]
+    assert statuses == [401, 401, 429]
+
+
+def test_signups_are_limited_per_address(client, headers):
+    # The headers fixture signed up once already.
+    statuses = [client.post('/api/signup', headers=headers).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from tests import signup
+
+
+@pytest.fixture
+def tasks(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    client.post('/api/boards/create', headers=headers, json={'name': 'b'})
+    response = client.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': 'buy milk', 'description': 'and bread', 'status': 0},
+        {'op': 'create', 'title': 'call mum', 'description': 'about the milk', 'status': 1},
+        {'op': 'create', 'title': 'milkshake', 'description': 'strawberry', 'status': 0},
+    ]})
+    other = client.post('/api/boards/2/tasks/create', headers=headers,
+                        json={'title': 'fresh milk', 'description': 'from the farm', 'status': 0})
+    return response.json + [other.json]
+
+
+def search(client, headers, query):
+    response = client.get(f'/api/tasks/search?{query}', headers=headers)
+    assert response.status_code == 200, response.data
+    return response
+
+
+def ids(response):
+    return [(task['board_id'], task['id']) for task in response.json]
+
+
+def test_title_matches_rank_first(client, headers, tasks):
+    response = search(client, headers, 'q=milk')
+    assert sorted(ids(response)[:2]) == [(1, 1), (2, 1)]
+    assert ids(response)[2:] == [(1, 2)]
+    assert response.json[0] in tasks
+
+
+def test_every_word_must_match(client, headers, tasks):
+    assert ids(search(client, headers, 'q=milk bread')) == [(1, 1)]
+    assert ids(search(client, headers, 'q=bread mum')) == []
+
+
+def test_prefix_and_board_filter(client, headers, tasks):
+    assert sorted(ids(search(client, headers, 'q=milk*'))) == [(1, 1), (1, 2), (1, 3), (2, 1)]
+    assert sorted(ids(search(client, headers, 'q=milk*&board_id=1'))) == [(1, 1), (1, 2), (1, 3)]
+
+
+def test_search_sees_edits_and_deletes(client, headers, tasks):
+    client.post('/api/boards/1/tasks/1/edit', headers=headers, json={'title': 'buy oat drink'})
+    client.post('/api/boards/2/tasks/1/delete', headers=headers)
+    assert ids(search(client, headers, 'q=milk')) == [(1, 2)]
+    assert ids(search(client, headers, 'q=oat')) == [(1, 1)]
+    client.post('/api/boards/1/delete', headers=headers)
+    assert ids(search(client, headers, 'q=oat')) == []
+
+
+def test_users_only_find_their_own_tasks(client, headers, tasks):
+    other = signup(client)
+    assert search(client, other, 'q=milk').json == []
+
+
+def test_search_pages(client, headers, tasks):
+    first = search(client, headers, 'q=milk*&limit=3')
+    rest = search(client, headers, f'q=milk*&cursor={first.headers["X-Next-Cursor"]}')
+    assert 'X-Next-Cursor' not in rest.headers
+    assert sorted(ids(first) + ids(rest)) == [(1, 1), (1, 2), (1, 3), (2, 1)]
+
+
+def test_pages_do_not_shift_when_tasks_are_written(client, headers, tasks):
+    first = search(client, headers, 'q=milk*&limit=2')
+    client.post('/api/boards/1/tasks/create', headers=headers,
+                json={'title': 'milk milk', 'description': 'milk', 'status': 0})
+    rest = search(client, headers, f'q=milk*&cursor={first.headers["X-Next-Cursor"]}')
+    assert sorted(ids(first) + ids(rest)) == [(1, 1), (1, 2), (1, 3), (2, 1)]
+
+
+def test_every_match_is_ranked(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    client.post('/api/boards/1/tasks/create', headers=headers,
+                json={'title': 'milk', 'description': 'oldest', 'status': 0})
+    client.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': f'task {number}', 'description': 'milk', 'status': 0} for number in range(50)]})
+    assert ids(search(client, headers, 'q=milk&limit=1')) == [(1, 1)]
+
+
+def test_tasks_written_without_the_app_are_indexed(app, client, headers, tasks):
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite':
+        pytest.skip('PostgreSQL indexes in a generated column')
+    user_id = headers['Authorization'].split()[1]
+    with sqlite3.connect(url.database) as connection:
+        connection.execute("INSERT INTO task (id, title, description, status, board_id, board_user_id) "
+                           "VALUES (9, 'raw milk', 'from sqlite3', 0, 2, ?)", (user_id,))
+    assert (2, 9) in ids(search(client, headers, 'q=raw milk'))
+
+
+def test_query_without_words_is_rejected(client, headers, tasks):
+    assert client.get('/api/tasks/search?q=*', headers=headers).status_code == 400
+    assert client.get('/api/tasks/search', headers=headers).status_code == 400
+    assert client.get('/api/tasks/search?q=milk&board_id=x', headers=headers).status_code == 400
+    assert client.get('/api/tasks/search?q=milk&cursor=5', headers=headers).status_code == 400
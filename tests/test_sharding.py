@@ -0,0 +1,36 @@
+import pytest
+
+from tests import create_tasks, signup
+
+
+@pytest.fixture
+def app(make_app, new_database):
+    return make_app(SHARDS=[new_database() for _ in range(3)], SHARD_MAP_TTL=0)
+
+
+def snapshot(client, headers):
+    boards = client.get('/api/boards', headers=headers).json
+    return [client.get(f'/api/boards/{board["id"]}', headers=headers).json for board in boards]
+
+
+def test_move_keeps_the_users_data(app, client):
+    shards = app.extensions['shards']
+    users = [signup(client) for _ in range(2)]
+    for number, headers in enumerate(users):
+        client.post('/api/boards/create', headers=headers, json={'name': f'board {number}'})
+        create_tasks(client, headers, 1, [0, 1, number])
+    before = [snapshot(client, headers) for headers in users]
+
+    moving, staying = users
+    user_id = moving['Authorization'].split()[1]
+    source = shards.locate(user_id)[0]
+    target = (source + 1) % len(shards.engines)
+    assert shards.move({user_id: target}) == 1
+    assert shards.locate(user_id) == (target, False)
+    assert [snapshot(client, headers) for headers in users] == before
+
+    # Writes land on the new shard and sync sees them.
+    task = create_tasks(client, moving, 1, [2])[0]
+    assert client.get('/api/boards/1', headers=moving).json['tasks'][-1] == task
+    assert task in client.get('/api/sync?since=0', headers=moving).json['tasks']
+    assert shards.move({user_id: target}) == 0
@@ -0,0 +1,45 @@
+from models import db, TaskCount
+from tests import create_tasks
+
+
+def stats(client, headers, path='/api/boards/stats'):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.data
+    return response.json
+
+
+def test_counts_follow_every_kind_of_write(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    client.post('/api/boards/create', headers=headers, json={'name': 'b'})
+    create_tasks(client, headers, 1, [0, 0, 1, 2])
+    assert stats(client, headers) == [{'id': 1, 'total': 4, 'statuses': {'0': 2, '1': 1, '2': 1}},
+                                      {'id': 2, 'total': 0, 'statuses': {}}]
+
+    client.post('/api/boards/1/tasks/1/move', headers=headers, json={'status': 1})
+    client.post('/api/boards/1/tasks/4/edit', headers=headers, json={'status': 1})
+    client.post('/api/boards/1/tasks/3/delete', headers=headers)
+    client.post('/api/boards/1/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'status', 'id': 2, 'status': 2},
+        {'op': 'create', 'title': 'new', 'description': 'description', 'status': 0}]})
+    assert stats(client, headers, '/api/boards/1/stats') == {'id': 1, 'total': 4, 'statuses': {'1': 2, '2': 1, '0': 1}}
+
+    client.post('/api/boards/1/delete', headers=headers)
+    assert stats(client, headers) == [{'id': 2, 'total': 0, 'statuses': {}}]
+    assert client.get('/api/boards/1/stats', headers=headers).status_code == 404
+
+
+def test_check_stats_finds_and_repairs_drift(app, client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    create_tasks(client, headers, 1, [0, 1, 1])
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['check-stats']).exit_code == 0
+    with app.app_context():
+        db.session.execute(db.update(TaskCount).where(TaskCount.status == 1).values(count=5))
+        db.session.execute(db.delete(TaskCount).where(TaskCount.status == 0))
+        db.session.commit()
+    result = runner.invoke(args=['check-stats'])
+    assert result.exit_code == 1
+    assert 'status 0: counted 0, actually 1' in result.output and 'status 1: counted 5, actually 2' in result.output
+    assert runner.invoke(args=['check-stats', '--repair']).exit_code == 0
+    assert runner.invoke(args=['check-stats']).output == 'Task counters match the tasks.\n'
+    assert stats(client, headers, '/api/boards/1/stats')['statuses'] == {'0': 1, '1': 2}
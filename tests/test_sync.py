@@ -0,0 +1,66 @@
+from changes import compact_all
+from tests import create_tasks
+
+
+def sync(client, headers, since, limit=None):
+    response = client.get(f'/api/sync?since={since}' + (f'&limit={limit}' if limit else ''), headers=headers)
+    assert response.status_code == 200, response.data
+    return response.json
+
+
+def test_first_sync_resets_with_everything(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    tasks = create_tasks(client, headers, 1, [0, 1])
+    body = sync(client, headers, 0)
+    assert body['reset'] and not body['more']
+    assert [board['name'] for board in body['boards']] == ['a']
+    assert sorted(body['tasks'], key=lambda task: task['id']) == tasks
+    assert body['deleted'] == {'boards': [], 'tasks': []}
+    assert sync(client, headers, body['cursor']) == {**body, 'reset': False, 'boards': [], 'tasks': []}
+
+
+def test_delta_lists_changes_and_deletions(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    client.post('/api/boards/create', headers=headers, json={'name': 'b'})
+    create_tasks(client, headers, 1, [0, 0, 0])
+    create_tasks(client, headers, 2, [0])
+    cursor = sync(client, headers, 0)['cursor']
+
+    edited = client.post('/api/boards/1/tasks/1/edit', headers=headers, json={'title': 'edited'}).json
+    client.post('/api/boards/1/tasks/2/delete', headers=headers)
+    client.post('/api/boards/2/delete', headers=headers)
+    body = sync(client, headers, cursor)
+    assert not body['reset'] and body['cursor'] > cursor
+    assert body['boards'] == [] and body['tasks'] == [edited]
+    assert body['deleted'] == {'boards': [2], 'tasks': [{'board_id': 1, 'id': 2}]}
+
+
+def test_sync_pages(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    tasks = create_tasks(client, headers, 1, [0] * 5)
+    seen, cursor, reset = [], 0, None
+    while True:
+        body = sync(client, headers, cursor, limit=2)
+        reset = body['reset'] if reset is None else reset
+        seen += body['tasks']
+        cursor = body['cursor']
+        if not body['more']:
+            break
+    assert reset and sorted(seen, key=lambda task: task['id']) == tasks
+
+
+def test_stale_cursor_resets_after_compaction(app, client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    create_tasks(client, headers, 1, [0, 0])
+    cursor = sync(client, headers, 0)['cursor']
+    client.post('/api/boards/1/tasks/1/delete', headers=headers)
+    with app.app_context():
+        assert compact_all(-10) == 1
+    body = sync(client, headers, cursor)
+    assert body['reset'] and [task['id'] for task in body['tasks']] == [2]
+
+
+def test_bad_sync_arguments(client, headers):
+    assert client.get('/api/sync?since=-1', headers=headers).status_code == 400
+    assert client.get('/api/sync?since=x', headers=headers).status_code == 400
+    assert client.get('/api/sync?since=0&limit=0', headers=headers).status_code == 400
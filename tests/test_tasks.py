@@ -0,0 +1,124 @@
+import pytest
+
+from tests import create_tasks
+
+
+@pytest.fixture
+def board(client, headers):
+    return client.post('/api/boards/create', headers=headers, json={'name': 'board'}).json['id']
+
+
+def tasks_of(client, headers, board_id):
+    return client.get(f'/api/boards/{board_id}', headers=headers).json['tasks']
+
+
+def column(client, headers, board_id, status):
+    """Return the tasks of a status column in the order clients show them, by rank."""
+    tasks = client.get(f'/api/boards/{board_id}/tasks?status={status}', headers=headers).json
+    return sorted(tasks, key=lambda task: task['rank'])
+
+
+def test_create_edit_and_delete_a_task(client, headers, board):
+    user_id = headers['Authorization'].split()[1]
+    created = client.post(f'/api/boards/{board}/tasks/create', headers=headers,
+                          json={'title': 'title', 'description': 'description', 'status': 0})
+    assert created.json == {'id': 1, 'title': 'title', 'description': 'description', 'status': 0,
+                            'board_id': board, 'board_user_id': user_id, 'rank': 'V'}
+    assert client.post(f'/api/boards/{board}/tasks/create', headers=headers,
+                       json={'title': 'title', 'status': 0}).status_code == 400
+
+    edited = client.post(f'/api/boards/{board}/tasks/1/edit', headers=headers, json={'title': 'renamed'})
+    assert edited.json == {**created.json, 'title': 'renamed'}
+    assert tasks_of(client, headers, board) == [edited.json]
+    assert client.post(f'/api/boards/{board}/tasks/2/edit', headers=headers, json={'title': 'x'}).status_code == 404
+
+    assert client.post(f'/api/boards/{board}/tasks/1/delete', headers=headers).json == edited.json
+    assert tasks_of(client, headers, board) == []
+    assert client.post(f'/api/boards/{board}/tasks/1/delete', headers=headers).status_code == 404
+
+
+def test_a_status_change_puts_the_task_last_in_its_new_column(client, headers, board):
+    todo, doing, other = create_tasks(client, headers, board, [0, 1, 0])
+    edited = client.post(f'/api/boards/{board}/tasks/{todo["id"]}/edit', headers=headers, json={'status': 1}).json
+    assert edited['status'] == 1 and edited['rank'] > doing['rank']
+    moved = client.post(f'/api/boards/{board}/tasks/{other["id"]}/edit', headers=headers,
+                        json={'title': 'moved', 'status': 1}).json
+    assert moved['rank'] > edited['rank']
+    # An edit keeping the status keeps the rank.
+    kept = client.post(f'/api/boards/{board}/tasks/{other["id"]}/edit', headers=headers,
+                       json={'description': 'new', 'status': 1}).json
+    assert kept['rank'] == moved['rank']
+
+
+def test_move_between_neighbours(client, headers, board):
+    first, second, third = create_tasks(client, headers, board, [0, 0, 1])
+    moved = client.post(f'/api/boards/{board}/tasks/{third["id"]}/move', headers=headers,
+                        json={'status': 0, 'after_id': first['id'], 'before_id': second['id']})
+    assert moved.json['status'] == 0 and first['rank'] < moved.json['rank'] < second['rank']
+    assert [task['id'] for task in column(client, headers, board, 0)] == [first['id'], third['id'], second['id']]
+
+    to_front = client.post(f'/api/boards/{board}/tasks/{second["id"]}/move', headers=headers,
+                           json={'before_id': first['id']}).json
+    assert to_front['rank'] < first['rank']
+    assert client.post(f'/api/boards/{board}/tasks/{first["id"]}/move', headers=headers,
+                       json={'status': 1, 'after_id': second['id']}).status_code == 400
+
+
+def test_batch_applies_operations_in_order(client, headers, board):
+    first, second, third = create_tasks(client, headers, board, [0, 0, 0])
+    response = client.post(f'/api/boards/{board}/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': 'new', 'description': 'description', 'status': 1},
+        {'op': 'edit', 'id': first['id'], 'title': 'edited'},
+        {'op': 'status', 'id': second['id'], 'status': 1},
+        {'op': 'delete', 'id': third['id']},
+    ]})
+    assert response.status_code == 200
+    created, edited, moved, deleted = response.json
+    assert created['id'] == 4 and created['status'] == 1
+    assert edited == {**first, 'title': 'edited'}
+    assert moved['status'] == 1 and moved['rank'] > created['rank']
+    assert deleted == third
+    assert sorted(tasks_of(client, headers, board), key=lambda task: task['id']) == [edited, moved, created]
+
+
+def test_batch_ranks_every_task_entering_a_column(client, headers, board):
+    tasks = create_tasks(client, headers, board, [0, 1, 0, 1])
+    assert tasks[0]['rank'] < tasks[2]['rank'] and tasks[1]['rank'] < tasks[3]['rank']
+    response = client.post(f'/api/boards/{board}/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'status', 'id': tasks[0]['id'], 'status': 1},
+        {'op': 'edit', 'id': tasks[2]['id'], 'status': 1},
+        {'op': 'create', 'title': 'new', 'description': 'description', 'status': 1},
+    ]})
+    done = column(client, headers, board, 1)
+    assert [task['id'] for task in done] == [2, 4, 1, 3, 5]
+    assert len({task['rank'] for task in done}) == 5
+    assert response.json == done[2:]
+
+
+@pytest.mark.parametrize('operation, status', [
+    ({'op': 'rename', 'id': 1}, 400),
+    ({'op': 'edit'}, 400),
+    ({'op': 'status', 'id': 1, 'status': 'done'}, 400),
+    ({'op': 'create', 'title': 'no description', 'status': 0}, 400),
+    ({'op': 'delete', 'id': 1}, 400),
+    ({'op': 'edit', 'id': 99, 'title': 'missing'}, 404),
+])
+def test_batch_is_all_or_nothing(client, headers, board, operation, status):
+    before = create_tasks(client, headers, board, [0, 1])
+    response = client.post(f'/api/boards/{board}/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': 'new', 'description': 'description', 'status': 0},
+        {'op': 'edit', 'id': 1, 'title': 'edited'},
+        {'op': 'delete', 'id': 1},
+        operation,
+    ]})
+    assert response.status_code == status
+    assert tasks_of(client, headers, board) == before
+    # The failed batch allocated no ids either.
+    assert create_tasks(client, headers, board, [0])[0]['id'] == 3
+
+
+def test_batch_needs_operations_and_a_board(client, headers, board):
+    assert client.post(f'/api/boards/{board}/tasks/batch', headers=headers,
+                       json={'operations': []}).status_code == 400
+    assert client.post('/api/boards/2/tasks/batch', headers=headers, json={'operations': [
+        {'op': 'create', 'title': 'new', 'description': 'description', 'status': 0}]}).status_code == 404
@@ -0,0 +1,155 @@
+import json
+import tracemalloc
+from time import time
+
+import pytest
+from sqlalchemy import func
+
+import purge
+import workspace
+from models import db, Board, Task, User
+from tests import create_tasks, signup
+
+
+def export(client, headers):
+    response = client.get('/api/export', headers=headers)
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+def import_lines(client, headers, lines):
+    body = b''.join(json.dumps(line).encode() + b'\n' for line in lines)
+    return client.post('/api/import', headers=headers, data=body, content_type='application/x-ndjson')
+
+
+def test_export_lists_boards_then_tasks(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    tasks = create_tasks(client, headers, 1, [0, 1])
+    lines = export(client, headers)
+    assert lines[0] == {'type': 'board', 'id': 1, 'name': 'a'}
+    assert lines[1:] == [{'type': 'task', **{key: task[key] for key in
+                                             ('id', 'title', 'description', 'status', 'board_id', 'rank')}}
+                         for task in tasks]
+
+
+def test_round_trip_into_another_account(client, headers):
+    for name in ('a', 'b'):
+        client.post('/api/boards/create', headers=headers, json={'name': name})
+    create_tasks(client, headers, 1, [0, 1, 0])
+    create_tasks(client, headers, 2, [2])
+    client.post('/api/boards/1/tasks/2/delete', headers=headers)
+    other = signup(client)
+    client.post('/api/boards/create', headers=other, json={'name': 'existing'})
+
+    response = import_lines(client, other, export(client, headers))
+    assert response.json == {'boards': {'1': 2, '2': 3}, 'tasks': 3}
+    for old, new in response.json['boards'].items():
+        mine = client.get(f'/api/boards/{old}', headers=headers).json
+        theirs = client.get(f'/api/boards/{new}', headers=other).json
+        assert theirs['name'] == mine['name']
+        assert [{**task, 'board_id': mine['id'], 'board_user_id': mine['user_id']} for task in theirs['tasks']] == \
+            mine['tasks']
+    # Task ids carry on after the imported ones.
+    assert create_tasks(client, other, 2, [0])[0]['id'] == 4
+
+
+def test_rank_is_assigned_when_missing(client, headers):
+    response = import_lines(client, headers, [
+        {'type': 'board', 'id': 7, 'name': 'old'},
+        {'type': 'task', 'id': 1, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 7},
+        {'type': 'task', 'id': 2, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 7, 'rank': ''},
+    ])
+    assert response.status_code == 200
+    first, second = client.get('/api/boards/1', headers=headers).json['tasks']
+    assert first['rank'] < second['rank']
+
+
+def test_bad_import_changes_nothing(client, headers):
+    client.post('/api/boards/create', headers=headers, json={'name': 'a'})
+    board = {'type': 'board', 'id': 1, 'name': 'new'}
+    task = {'type': 'task', 'id': 1, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 1}
+    for lines in ([board, {**task, 'board_id': 2}],
+                  [board, task, task],
+                  [board, {**task, 'rank': 'not a rank!'}],
+                  [{**board, 'name': 'a'}],
+                  [board, {'type': 'comment'}]):
+        assert import_lines(client, headers, lines).status_code == 400
+    assert [board['name'] for board in client.get('/api/boards', headers=headers).json] == ['a']
+    assert client.post('/api/import', headers=headers, data=b'{not json\n').status_code == 400
+
+
+@pytest.mark.parametrize('line', [
+    {'type': 'task', 'id': 2 ** 70, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 1},
+    {'type': 'task', 'id': 0, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 1},
+    {'type': 'task', 'id': 1, 'title': 't', 'description': 'd', 'status': 2 ** 31, 'board_id': 1},
+    {'type': 'task', 'id': 1, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 1, 'archived_at': 2 ** 63},
+])
+def test_integers_out_of_column_range_are_rejected(client, headers, line):
+    response = import_lines(client, headers, [{'type': 'board', 'id': 1, 'name': 'a'}, line])
+    assert response.status_code == 400
+    assert client.get('/api/boards', headers=headers).json == []
+
+
+def test_failed_import_leaves_its_committed_chunks_to_the_purge(app, client, headers, monkeypatch):
+    monkeypatch.setattr(workspace, 'IMPORT_CHUNK', 2)
+    lines = [{'type': 'board', 'id': 1, 'name': 'a'}]
+    lines += [{'type': 'task', 'id': i, 'title': 't', 'description': 'd', 'status': 0, 'board_id': 1}
+              for i in (1, 2, 3, 4, 4)]
+    assert import_lines(client, headers, lines).status_code == 400
+    purge._purger.submit(lambda: None).result()
+    with app.app_context():
+        assert db.session.scalar(db.select(func.count()).select_from(Board)) == 0
+        assert db.session.scalar(db.select(func.count()).select_from(Task)) == 0
+    assert client.get('/api/boards', headers=headers).json == []
+    # The name is free for the next attempt.
+    assert import_lines(client, headers, lines[:-1]).json == {'boards': {'1': 2}, 'tasks': 4}
+
+
+def test_purge_spares_boards_being_imported(app):
+    user_id = 'importer'
+    with app.app_context():
+        db.session.add(User(id=user_id))
+        db.session.add_all([Board(id=1, name='current', user_id=user_id, deleted=True, importing_since=int(time())),
+                            Board(id=2, name='stalled', user_id=user_id, deleted=True, importing_since=0),
+                            Board(id=3, name='deleted', user_id=user_id, deleted=True)])
+        db.session.commit()
+        assert purge.purge_boards(100, import_timeout=3600) == 2
+        assert db.session.scalars(db.select(Board.name)).all() == ['current']
+
+
+def traced_peak(run):
+    tracemalloc.start()
+    try:
+        result = run()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_and_import_run_in_bounded_memory(client, headers, monkeypatch, tmp_path):
+    monkeypatch.setattr(workspace, 'EXPORT_CHUNK', 200)
+    monkeypatch.setattr(workspace, 'IMPORT_CHUNK', 200)
+    tasks, path = 20_000, tmp_path / 'workspace.ndjson'
+    with path.open('w') as file:
+        file.write(json.dumps({'type': 'board', 'id': 1, 'name': 'big'}) + '\n')
+        for i in range(1, tasks + 1):
+            file.write(json.dumps({'type': 'task', 'id': i, 'title': f'task {i}', 'description': 'x' * 100,
+                                   'status': i % 4, 'board_id': 1}) + '\n')
+
+    def import_():
+        with path.open('rb') as file:
+            return client.post('/api/import', headers=headers, input_stream=file,
+                               content_type='application/x-ndjson')
+
+    def export():
+        response = client.get('/api/export', headers=headers, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return size
+
+    # Neither holds the workspace in memory: the peaks stay far below its size.
+    response, peak = traced_peak(import_)
+    assert response.json == {'boards': {'1': 1}, 'tasks': tasks}
+    assert peak < path.stat().st_size / 4
+    size, peak = traced_peak(export)
+    assert size > path.stat().st_size and peak < size / 4
@@ -0,0 +1,195 @@
+from io import BufferedReader
+from time import time
+
+from flask import Blueprint, abort, current_app, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
+
+from auth import require_authorization
+from caching import touch_boards
+from changes import log_board_tasks, log_boards
+from ids import allocate_ids, start_sequence
+from models import db, ArchivedTask, Board, Task
+from purge import live_boards, purged_board_ids, schedule_purge
+from ranks import is_rank, rank_after
+from serialization import TASK_COLUMNS, dumpb
+
+bp = Blueprint('workspace', __name__)
+
+EXPORT_CHUNK = 1000
+IMPORT_CHUNK = 5000
+IMPORT_BUFFER = 64 * 1024
+
+
+def column_int(value, bits=32):
+    """Return ``int(value)``, raising ValueError unless it fits a signed integer column of ``bits`` bits."""
+    number = int(value)
+    if not -2 ** (bits - 1) <= number < 2 ** (bits - 1):
+        raise ValueError(value)
+    return number
+
+
+def export_lines(user_id):
+    """Yield the user's boards, tasks and archived tasks as NDJSON, EXPORT_CHUNK lines at a time."""
+    boards = live_boards(user_id).with_only_columns(Board.id, Board.name).order_by(Board.id)
+    tasks = (db.select(*TASK_COLUMNS[:5], Task.rank)
+             .where(Task.board_user_id == user_id, Task.board_id.not_in(purged_board_ids(user_id)))
+             .order_by(Task.board_id, Task.id))
+    archived = (db.select(ArchivedTask.id, ArchivedTask.title, ArchivedTask.description, ArchivedTask.status,
+                          ArchivedTask.board_id, ArchivedTask.rank, ArchivedTask.archived_at)
+                .where(ArchivedTask.board_user_id == user_id,
+                       ArchivedTask.board_id.not_in(purged_board_ids(user_id)))
+                .order_by(ArchivedTask.board_id, ArchivedTask.id))
+    for kind, query in (('board', boards), ('task', tasks), ('task', archived)):
+        for rows in db.session.execute(query.execution_options(yield_per=EXPORT_CHUNK)).partitions():
+            yield b''.join(dumpb({'type': kind, **row._asdict()}) + b'\n' for row in rows)
+
+
+@bp.get('/api/export')
+def handle_export():
+    """Выгрузить все доски и задачи пользователя
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+    produces:
+      - application/x-ndjson
+    responses:
+      200:
+        description: >
+            NDJSON: сначала строки {"type": "board", "id", "name"},
+            затем {"type": "task", "id", "title", "description", "status", "board_id", "rank"},
+            у архивных задач ещё "archived_at"
+      401:
+        description: Неправильный токен
+    """
+    user_id = require_authorization()
+    return current_app.response_class(stream_with_context(export_lines(user_id)),
+                                      mimetype='application/x-ndjson')
+
+
+@bp.post('/api/import')
+def handle_import():
+    """Загрузить доски и задачи из выгрузки /api/export
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        default: Bearer
+      - name: body
+        in: body
+        required: true
+        description: NDJSON в формате /api/export
+        schema:
+            type: string
+    consumes:
+      - application/x-ndjson
+    responses:
+      200:
+        description: >
+            Созданные доски получают новые id, id задач сохраняются.
+            Доски появляются только после загрузки последней строки
+        schema:
+            type: object
+            properties:
+                boards:
+                    type: object
+                    description: id доски в выгрузке -> id созданной доски
+                tasks:
+                    type: integer
+      401:
+        description: Неправильный токен
+      400:
+        description: Некорректная строка, задача неизвестной доски или доска с уже существующим именем
+    """
+    user_id = require_authorization()
+    names = set(db.session.execute(live_boards(user_id).with_only_columns(Board.name)).scalars())
+    board_ids, new_names, last_task_ids, last_ranks, chunk, archived, imported = {}, set(), {}, {}, [], [], 0
+
+    def importing():
+        return Board.user_id == user_id, Board.id.in_(list(board_ids.values()))
+
+    def flush():
+        try:
+            for model, rows in ((Task, chunk), (ArchivedTask, archived)):
+                if rows:
+                    db.session.execute(db.insert(model), rows)
+            db.session.execute(db.update(Board).where(*importing()).values(importing_since=int(time()))
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            abort(400, description='Duplicate task id in an imported board')
+        chunk.clear()
+        archived.clear()
+
+    # Every chunk is committed on its own so other writers get their turn; the
+    # boards stay deleted, hidden from everything, until the last commit.
+    try:
+        for number, line in enumerate(BufferedReader(request.stream, IMPORT_BUFFER), 1):
+            if not line.strip():
+                continue
+            try:
+                item = current_app.json.loads(line)
+                if item['type'] == 'board':
+                    if item['name'] in names or item['name'] in new_names or item['id'] in board_ids:
+                        abort(400, description=f'Line {number}: board already exists')
+                    board_id = board_ids[item['id']] = allocate_ids(user_id)
+                    new_names.add(item['name'])
+                    db.session.add(Board(id=board_id, name=item['name'], user_id=user_id, deleted=True,
+                                         importing_since=int(time())))
+                elif item['type'] == 'task':
+                    board_id = board_ids[item['board_id']]
+                    status = column_int(item['status'])
+                    # Exports made before ranks existed list tasks in id order, and tasks
+                    # written without a rank export the column default ''.
+                    rank = item.get('rank')
+                    if rank is None or rank == '':
+                        rank = last_ranks[board_id, status] = rank_after(last_ranks.get((board_id, status)))
+                    elif not is_rank(rank):
+                        raise ValueError(rank)
+                    else:
+                        last_ranks[board_id, status] = max(rank, last_ranks.get((board_id, status), rank))
+                    task = {'id': column_int(item['id']), 'title': item['title'], 'description': item['description'],
+                            'status': status, 'board_id': board_id, 'board_user_id': user_id, 'rank': rank}
+                    if task['id'] < 1:
+                        raise ValueError(task['id'])
+                    if item.get('archived_at') is None:
+                        chunk.append(task)
+                    else:
+                        archived.append({**task, 'archived_at': column_int(item['archived_at'], bits=64)})
+                    last_task_ids[board_id] = max(last_task_ids.get(board_id, 0), task['id'])
+                    imported += 1
+                else:
+                    raise ValueError(item['type'])
+            except (ValueError, KeyError, TypeError):
+                abort(400, description=f'Line {number} is not a board or a task of an exported board')
+            if len(chunk) + len(archived) >= IMPORT_CHUNK:
+                flush()
+        if chunk or archived:
+            flush()
+        if new_names & set(db.session.execute(live_boards(user_id).with_only_columns(Board.name)).scalars()):
+            abort(400, description='A board with an imported name was created meanwhile')
+    except Exception:
+        db.session.rollback()
+        if board_ids:
+            # Leaves what the import committed so far to the purge.
+            db.session.execute(db.update(Board).where(*importing()).values(importing_since=None)
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+            schedule_purge()
+        raise
+    for board_id in board_ids.values():
+        start_sequence(user_id, board_id, last_id=last_task_ids.get(board_id, 0))
+    if board_ids:
+        db.session.execute(db.update(Board).where(*importing()).values(deleted=False, importing_since=None)
+                           .execution_options(synchronize_session=False))
+        touch_boards(user_id)
+        log_boards(user_id, board_ids.values())
+        log_board_tasks(user_id, board_ids.values())
+    db.session.commit()
+    return {'boards': {str(old): new for old, new in board_ids.items()}, 'tasks': imported}